@@ -0,0 +1,86 @@
+"""Benchmark: date parsing of 100k ledger cells.
+
+Compares format_excel_date / month_key (DateParser: per-column format
+ranking + LRU cache) with the previous strptime loop over every format.
+
+    python benchmarks/bench_date_parsing.py
+"""
+import os
+import sys
+import time
+import random
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_utils import DATE_FORMATS, MONTH_KEY_FORMATS, format_excel_date, month_key
+
+CELLS = 100_000
+
+
+def reference_format(value):
+    """format_excel_date string branch before DateParser (one strptime per format)"""
+    value = value.strip()
+    if not value:
+        return ""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return value
+
+
+def reference_month(value):
+    """Month lookup of the previous reindex_excel loop (strings without '-')"""
+    for fmt in MONTH_KEY_FORMATS:
+        try:
+            return datetime.datetime.strptime(value.strip(), fmt).month
+        except ValueError:
+            continue
+    return value
+
+
+def ledger_cells(fmt, minority, n=CELLS):
+    """Two years of dates, mostly in `fmt` with some `minority` cells mixed in"""
+    random.seed(1)
+    start = datetime.date(2023, 1, 1)
+    cells = []
+    for _ in range(n):
+        day = start + datetime.timedelta(days=random.randrange(730))
+        cells.append(day.strftime(minority if random.random() < 0.05 else fmt))
+    return cells
+
+
+def timed(func, cells):
+    start = time.perf_counter()
+    for value in cells:
+        func(value)
+    return time.perf_counter() - start
+
+
+def main():
+    cases = [
+        ("発生日 YYYY-MM-DD", "%Y-%m-%d", "%Y/%m/%d"),
+        ("発生日 YYYY/MM/DD", "%Y/%m/%d", "%Y-%m-%d"),
+        ("発生日 MM/DD/YYYY", "%m/%d/%Y", "%Y/%m/%d"),
+        ("発生日 YYYY年MM月DD日", "%Y年%m月%d日", "%Y-%m-%d"),
+    ]
+    print(f"format_excel_date, {CELLS:,} string cells")
+    for label, fmt, minority in cases:
+        cells = ledger_cells(fmt, minority)
+        assert [format_excel_date(v, 3) for v in cells] == [reference_format(v) for v in cells]
+        old = timed(reference_format, cells)
+        new = timed(lambda v: format_excel_date(v, 3), cells)
+        print(f"  {label:<22} old {old:6.3f}s  new {new:6.3f}s  x{old / new:5.1f}")
+
+    print(f"month_key (renumbering), {CELLS:,} 発生月 cells")
+    cells = ledger_cells("%Y/%m/%d", "%d/%m/%Y")
+    assert [month_key(v) for v in cells] == [reference_month(v) for v in cells]
+    old = timed(reference_month, cells)
+    new = timed(month_key, cells)
+    print(f"  {'発生月 YYYY/MM/DD':<22} old {old:6.3f}s  new {new:6.3f}s  x{old / new:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: deleting many scattered rows of a ledger worksheet.
+
+Compares excel_utils.delete_sheet_rows (one pass, every cell moves once)
+with the previous loop of ws.delete_rows(row, 1) from the bottom up, which
+shifts all cells below each deleted row. Every 4th row of the sheet is
+deleted; the time per deleted row stays flat for delete_sheet_rows and grows
+with the sheet for delete_rows.
+
+    python benchmarks/bench_row_delete.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+from excel_utils import delete_sheet_rows, write_row_values
+
+SIZES = (1_000, 2_000, 4_000, 8_000)
+REFERENCE_LIMIT = 4_000  # delete_rows gets too slow beyond this
+
+
+def ledger_sheet(n):
+    wb = Workbook()
+    ws = wb.active
+    for row in range(4, n + 4):
+        write_row_values(ws, row, [
+            "2024-01-01", None, row, "2024-01-02", "外観不良", "事象", "", "",
+            f"HB-{row:05d}", "WAKO", f"/reports/{row}.pdf" if row % 3 == 0 else "",
+            f"F{row:06d}",
+        ])
+    return ws
+
+
+def reference_delete(ws, rows):
+    """delete_multiple_rows before delete_sheet_rows"""
+    for row in sorted(rows, reverse=True):
+        ws.delete_rows(row, 1)
+
+
+def timed(func, n):
+    ws = ledger_sheet(n)
+    rows = list(range(4, n + 4, 4))
+    start = time.perf_counter()
+    func(ws, rows)
+    return time.perf_counter() - start, len(rows)
+
+
+def main():
+    print("delete every 4th row of a 12-column ledger sheet")
+    for n in SIZES:
+        new, deleted = timed(delete_sheet_rows, n)
+        line = f"  {n:>6,} rows ({deleted:>5,} deleted)  new {new:7.3f}s ({new / deleted * 1e6:6.1f}us/row)"
+        if n <= REFERENCE_LIMIT:
+            old, _ = timed(reference_delete, n)
+            line += f"  old {old:7.3f}s ({old / deleted * 1e6:8.1f}us/row)  x{old / new:6.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
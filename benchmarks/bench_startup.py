@@ -0,0 +1,127 @@
+"""Benchmark: cold start of main.App.
+
+Every run starts a fresh interpreter (nothing is imported yet, like a real
+start) and measures, from the moment the process was started:
+
+    first window   the main window is mapped
+    interactive    the event loop is idle after that (clicks are handled)
+
+plus the import of main, the first activation of the entry tab (it is only
+built then) and whether openpyxl was imported before the app became
+interactive (it should not be: it is only needed to read or write a file).
+The configuration directory is a temporary one, so the history and journals
+of the user are not touched.
+
+    python benchmarks/bench_startup.py [runs] [--budget MS]
+
+With --budget, exits with status 1 when the median time to interactive is
+over MS milliseconds, so a slower start shows up. Needs a display (on a
+server: xvfb-run python benchmarks/bench_startup.py).
+"""
+import os
+import sys
+import time
+
+# The child process imports nothing else before main (json, subprocess ...
+# would make the import of main look faster than it is)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+
+def child(spawned):
+    """One start, run in the fresh interpreter; prints the marks as JSON.
+    `spawned` is perf_counter() of the parent when it started this process
+    (perf_counter is the system-wide monotonic clock)."""
+    sys.path.insert(0, ROOT)
+    marks = {"spawned": spawned, "start": time.perf_counter()}
+
+    import main
+
+    marks["imported"] = time.perf_counter()
+    app = main.App()
+    marks["built"] = time.perf_counter()
+
+    def on_map(event):
+        if event.widget is app and "window" not in marks:
+            marks["window"] = time.perf_counter()
+            app.after_idle(on_idle)
+
+    def on_idle():
+        marks["interactive"] = time.perf_counter()
+        marks["openpyxl"] = "openpyxl" in sys.modules
+        start = time.perf_counter()
+        app.tabControl.select(app.tab2)
+        app.update()
+        marks["entry_tab"] = time.perf_counter() - start
+        marks["entry_built"] = app.tab2_ui is not None
+        app.destroy()
+
+    app.bind("<Map>", on_map)
+    app.mainloop()
+
+    import json
+
+    print(json.dumps(marks))
+
+
+def run_once(config_dir):
+    import json
+    import subprocess
+
+    env = dict(os.environ, XDG_CONFIG_HOME=config_dir, APPDATA=config_dir)
+    spawned = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", repr(spawned)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "import main": marks["imported"] - marks["start"],
+        "first window": marks["window"] - marks["spawned"],
+        "interactive": marks["interactive"] - marks["spawned"],
+        "entry tab": marks["entry_tab"],
+        "openpyxl": marks["openpyxl"],
+        "entry_built": marks["entry_built"],
+    }
+
+
+def main():
+    import statistics
+    import tempfile
+
+    args = sys.argv[1:]
+    budget = None
+    if "--budget" in args:
+        at = args.index("--budget")
+        budget = float(args[at + 1])
+        del args[at : at + 2]
+    runs = int(args[0]) if args else RUNS
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        results = [run_once(config_dir) for _ in range(runs)]
+
+    print(f"cold start of main.App, {runs} runs (median / max)")
+    for name in ("import main", "first window", "interactive", "entry tab"):
+        times = [r[name] * 1000 for r in results]
+        print(f"  {name:<13} {statistics.median(times):7.1f}ms / {max(times):7.1f}ms")
+    print(f"  openpyxl imported before interactive: {any(r['openpyxl'] for r in results)}")
+    if not all(r["entry_built"] for r in results):
+        print("  entry tab was not built on activation")
+        return 1
+
+    interactive = statistics.median(r["interactive"] * 1000 for r in results)
+    if budget is not None and interactive > budget:
+        print(f"  over budget: {interactive:.1f}ms > {budget:.1f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(float(sys.argv[2]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,162 @@
+import os
+import csv
+import time
+import datetime
+import itertools
+import unicodedata
+from excel_utils import LEDGER_HEADERS, format_excel_date, row_has_data, to_real_path
+
+# Columns numbered by the ledger itself (never taken from the source)
+AUTO_COLUMNS = (1, 2)  # 累計 / №
+DATE_COLUMNS = (0, 3)  # 発生月 / 発生日
+PATH_COLUMN = 10  # 不良発生連絡書発行
+CSV_ENCODINGS = ("utf-8-sig", "cp932")  # Excel saves Japanese CSV as Shift_JIS
+HEADER_SCAN_ROWS = 20  # Rows searched for the header line of a source file
+PREVIEW_ROWS = 200  # Normalized rows kept for the dry-run preview
+
+
+def header_key(text):
+    """Header text compared loosely: full/half width, case and spaces ignored"""
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text))
+    return "".join(text.split()).lower()
+
+
+# ==============================
+# Source files (CSV / xlsx)
+# ==============================
+def read_csv_rows(path):
+    """Rows of a CSV file as lists of strings (UTF-8 or Shift_JIS)"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            with open(path, newline="", encoding=encoding) as f:
+                return list(csv.reader(f))
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"unsupported CSV encoding: {os.path.basename(path)}")
+
+
+def read_source(path, sheet=None):
+    """(headers, data rows, line of the first data row) of a CSV or xlsx
+    file. The header line is the row among the first HEADER_SCAN_ROWS that
+    names the most ledger columns (the first non-empty row when none does),
+    so both plain lists and files in the 不具合品一覧表 layout can be read."""
+    from openpyxl import load_workbook
+
+    if path.lower().endswith(".csv"):
+        rows = read_csv_rows(path)
+    else:
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            rows = [list(r) for r in ws.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+
+    known = {header_key(h) for h in LEDGER_HEADERS}
+    header_at, best = None, 0
+    for i, row in enumerate(rows[:HEADER_SCAN_ROWS]):
+        matches = sum(1 for v in row if header_key(v) in known)
+        if matches > best:
+            header_at, best = i, matches
+    if header_at is None:
+        header_at = next(
+            (i for i, row in enumerate(rows) if any(v not in (None, "") for v in row)),
+            0,
+        )
+    headers = [
+        str(v).strip() if v is not None else "" for v in (rows[header_at] if rows else [])
+    ]
+    return headers, rows[header_at + 1 :], header_at + 2
+
+
+def guess_mapping(source_headers):
+    """Source column index for every ledger column (None = not imported),
+    matching header names; 累計/№ are always numbered by the ledger"""
+    keys = {}
+    for index, header in enumerate(source_headers):
+        keys.setdefault(header_key(header), index)
+    return [
+        None if col in AUTO_COLUMNS else keys.get(header_key(header))
+        for col, header in enumerate(LEDGER_HEADERS)
+    ]
+
+
+# ==============================
+# Validation / normalization
+# ==============================
+def normalize_value(value, col):
+    """Ledger cell value for a source value, as the entry form would write
+    it; returns (value, error message or None)"""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        return "", None
+    if col in DATE_COLUMNS:
+        text = format_excel_date(value, col)
+        try:
+            datetime.datetime.strptime(text, "%Y-%m-%d")
+        except ValueError:
+            return str(value), f"{LEDGER_HEADERS[col]}: 日付ではありません ({value})"
+        return text, None
+    if col == PATH_COLUMN:
+        return to_real_path(str(value)), None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Numbers read from xlsx (品番, 不良発生№ ...)
+    return str(value), None
+
+
+class BulkImport:
+    """Validated rows of a source file, mapped onto the ledger columns.
+    check() is the dry run: it normalizes every row (dates through the
+    shared DateParser cache) and collects the errors, without touching the
+    ledger. `rows` then holds the values to append, in sheet column order
+    with 累計/№ left to the numbering."""
+
+    def __init__(self, path, sheet=None):
+        self.path = path
+        self.headers, self.source_rows, self.first_line = read_source(path, sheet)
+        self.mapping = guess_mapping(self.headers)
+        self.rows = []
+        self.errors = []  # (source line, message)
+        self.skipped = 0  # Rows without data
+        self.elapsed = 0.0
+
+    def check(self, mapping=None):
+        """Normalize and validate all source rows with `mapping`; returns
+        the number of rows that can be imported"""
+        if mapping is not None:
+            self.mapping = list(mapping)
+        start = time.perf_counter()
+        self.rows, self.errors, self.skipped = [], [], 0
+        for line, row in enumerate(self.source_rows, start=self.first_line):
+            values = [""] * len(LEDGER_HEADERS)
+            row_errors = []
+            for col, source_col in enumerate(self.mapping):
+                if source_col is None or col in AUTO_COLUMNS or source_col >= len(row):
+                    continue
+                values[col], error = normalize_value(row[source_col], col)
+                if error:
+                    row_errors.append(error)
+            values[1] = None
+            if not any(values) and not row_errors:
+                self.skipped += 1
+            elif not row_errors and not row_has_data(values):
+                # Would not be numbered (nor found by the key columns)
+                self.errors.append((line, "発生月・発生日・項目がすべて空です"))
+            elif row_errors:
+                self.errors.extend((line, error) for error in row_errors)
+            else:
+                self.rows.append(values)
+        self.elapsed = time.perf_counter() - start
+        return len(self.rows)
+
+    def preview(self, limit=PREVIEW_ROWS):
+        return list(itertools.islice(self.rows, limit))
+
+    def rate(self, count=None, elapsed=None):
+        """Rows per second (of check() when no figures are given)"""
+        count = len(self.rows) if count is None else count
+        elapsed = self.elapsed if elapsed is None else elapsed
+        return count / elapsed if elapsed > 0 else float(count)
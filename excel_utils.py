@@ -1,11 +1,27 @@
 import os
+import re
 import datetime
 import json
+import math
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import queue
+import zipfile
+import posixpath
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 from pathlib import Path
 from tkinter import filedialog
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from html import escape
+from xml.etree import ElementTree
+
+# openpyxl is imported inside the functions that use it: importing it takes
+# longer than building the whole window, and the app must show up first.
 
 TITLE = "不具合品一覧表"
 EXCEL_NAME = "不具合品一覧表.xlsx"
@@ -88,56 +104,119 @@ class ExcelHistoryManager:
             self.save()
 
 
+# Columns of the 不具合品一覧表 layout (header on row 3, data from row 4)
+LEDGER_HEADERS = [
+    "発生月",
+    "累計",
+    "№",
+    "発生日",
+    "項目",
+    "事象",
+    "事象（一次）",
+    "事象（二次）",
+    "品番",
+    "サプライヤー名",
+    "不良発生連絡書発行",
+    "不良発生№",
+]
+LEDGER_HEADER_ROW = 3
+LEDGER_DATA_ROW = 4
+
+
+def style_title_cell(cell):
+    from openpyxl.styles import Font, Alignment
+
+    cell.font = Font(size=16, bold=True)
+    cell.alignment = Alignment(horizontal="center", vertical="center")
+
+
+def style_header_cell(cell):
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
+    thin = Side(style="thin")
+    cell.alignment = Alignment(horizontal="center", vertical="center")
+    cell.fill = PatternFill("solid", fgColor="C0C0C0")
+    cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    cell.font = Font(bold=True)
+
+
+def new_ledger_workbook(period_text, creator_text):
+    """Workbook with the title, period/creator line and styled header"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+
+    # Title
+    ws.merge_cells("A1:L1")
+    ws["A1"] = TITLE
+    style_title_cell(ws["A1"])
+
+    # Date & creator
+    ws["A2"] = period_text
+    ws["C2"] = creator_text
+
+    # Header
+    ws.append(LEDGER_HEADERS)
+
+    # Styling header
+    for col in range(1, len(LEDGER_HEADERS) + 1):
+        style_header_cell(ws.cell(row=LEDGER_HEADER_ROW, column=col))
+    return wb
+
+
+def write_ledger_xlsx(path, rows, period_text=None, creator_text=None,
+                      headers=LEDGER_HEADERS, hyperlink_col=10):
+    """Write rows (sheet column order) as a new workbook in the layout of
+    new_ledger_workbook, with openpyxl's write-only mode: every row goes to
+    the file when it is appended, so memory stays flat however many rows
+    `rows` yields. Values in column `hyperlink_col` become hyperlinks like
+    write_row_values makes them. Returns the number of rows written."""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+
+    # Title (merged over the header width), date & creator
+    title = WriteOnlyCell(ws, TITLE)
+    style_title_cell(title)
+    ws.append([title])
+    ws.merged_cells.add(f"A1:{get_column_letter(max(len(headers), 1))}1")
+    ws.append([period_text, None, creator_text])
+
+    header_cells = []
+    for h in headers:
+        cell = WriteOnlyCell(ws, h)
+        style_header_cell(cell)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    link_font = Font(color="0000FF", underline="single")
+    count = 0
+    for values in rows:
+        values = list(values)
+        if hyperlink_col is not None and len(values) > hyperlink_col and values[hyperlink_col]:
+            link = WriteOnlyCell(ws, values[hyperlink_col])
+            link.hyperlink = values[hyperlink_col]
+            link.font = link_font
+            values[hyperlink_col] = link
+        ws.append(values)
+        count += 1
+    wb.save(path)
+    return count
+
+
 def create_excel_if_not_exists(folder, creator):
     filepath = os.path.join(folder, EXCEL_NAME)
     if not os.path.exists(filepath):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Sheet1"
-
-        # Title
-        ws.merge_cells("A1:L1")
-        ws["A1"] = TITLE
-        ws["A1"].font = Font(size=16, bold=True)
-        ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-
-        # Date & creator
         today = datetime.date.today()
-        ws["A2"] = f"月間期間: {today.year}-{today.month}"
-        ws["C2"] = f"作成者: {creator}"
-
-        # Header
-        headers = [
-            "発生月",
-            "累計",
-            "№",
-            "発生日",
-            "項目",
-            "事象",
-            "事象（一次）",
-            "事象（二次）",
-            "品番",
-            "サプライヤー名",
-            "不良発生連絡書発行",
-            "不良発生№",
-        ]
-        ws.append(headers)
-
-        # Styling header
-        header_fill = PatternFill("solid", fgColor="C0C0C0")
-        border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin"),
+        wb = new_ledger_workbook(
+            f"月間期間: {today.year}-{today.month}", f"作成者: {creator}"
         )
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=3, column=col)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.fill = header_fill
-            cell.border = border
-            cell.font = Font(bold=True)
-
         wb.save(filepath)
     return filepath
 
@@ -193,6 +272,122 @@ def is_valid_path(path: str) -> bool:
         return False
 
 
+# ==============================
+# Asynchronous path checks
+# ==============================
+PATH_CHECK_TTL = 30.0  # Seconds a check result is reused
+PATH_CHECK_WORKERS = 8  # Threads checking paths
+PATH_CHECKS_PER_HOST = 2  # In flight per file server, so one slow server cannot take every worker
+PATH_CACHE_SIZE = 4096  # Expired results are dropped beyond this many
+
+
+def path_host(real_path: str) -> str:
+    """File server of a UNC path (\\\\server\\share\\...), "" for local paths"""
+    if real_path.startswith("\\\\"):
+        return real_path[2:].split("\\", 1)[0].lower()
+    return ""
+
+
+class PathChecker:
+    """is_valid_path (or another `check` of a real path) on a pool of daemon
+    threads, with a TTL cache (ttl None: kept for the session).
+
+    Against a slow or unreachable file server a check can take seconds, so
+    it must not run on the UI thread. submit() returns a Future (already
+    done for a fresh cached result); the UI polls it with after(). Checks of
+    the same path share one Future, and at most `per_host` checks per server
+    run at a time while the others wait for a slot."""
+
+    def __init__(self, check=None, ttl=PATH_CHECK_TTL, workers=PATH_CHECK_WORKERS,
+                 per_host=PATH_CHECKS_PER_HOST):
+        self.check = check
+        self.ttl = ttl
+        self.workers = workers
+        self.per_host = per_host
+        self.lock = threading.Lock()
+        self.results = {}  # real path -> (valid, time.monotonic() of the check)
+        self.futures = {}  # real path -> Future of a check waiting or running
+        self.running = {}  # host -> checks in flight
+        self.waiting = {}  # host -> deque of real paths waiting for a slot
+        self.jobs = None  # queue.Queue of the worker threads, started on first use
+
+    def cached(self, path):
+        """Result of a check that is still fresh, or None"""
+        real_path = to_real_path(path)
+        with self.lock:
+            hit = self.results.get(real_path)
+        return hit[0] if self.fresh(hit) else None
+
+    def fresh(self, hit, now=None):
+        if hit is None:
+            return False
+        return self.ttl is None or (now or time.monotonic()) - hit[1] < self.ttl
+
+    def submit(self, path):
+        """Future with the is_valid_path result of `path` (display or real)"""
+        real_path = to_real_path(path)
+        with self.lock:
+            hit = self.results.get(real_path)
+            if not real_path or self.fresh(hit):
+                future = Future()
+                future.set_result(bool(real_path) and hit[0])
+                return future
+            future = self.futures.get(real_path)
+            if future is not None:
+                return future
+            future = self.futures[real_path] = Future()
+            host = path_host(real_path)
+            if self.running.get(host, 0) < self.per_host:
+                self.running[host] = self.running.get(host, 0) + 1
+                self._start(real_path, host)
+            else:
+                self.waiting.setdefault(host, deque()).append(real_path)
+        return future
+
+    def invalidate(self, path=None):
+        """Forget the result of one path (all when None), e.g. after a save"""
+        with self.lock:
+            if path is None:
+                self.results.clear()
+            else:
+                self.results.pop(to_real_path(path), None)
+
+    def _start(self, real_path, host):
+        # Called with the lock held
+        if self.jobs is None:
+            self.jobs = queue.Queue()
+            for _ in range(self.workers):
+                threading.Thread(target=self._work, daemon=True).start()
+        self.jobs.put((real_path, host))
+
+    def _work(self):
+        while True:
+            real_path, host = self.jobs.get()
+            try:
+                valid = bool((self.check or is_valid_path)(real_path))
+            except Exception:
+                valid = False
+            with self.lock:
+                now = time.monotonic()
+                self.results[real_path] = (valid, now)
+                if len(self.results) > PATH_CACHE_SIZE:
+                    self.results = {
+                        p: r for p, r in self.results.items() if self.fresh(r, now)
+                    }
+                future = self.futures.pop(real_path)
+                waiting = self.waiting.get(host)
+                if waiting:
+                    self._start(waiting.popleft(), host)  # The slot goes to the next path
+                else:
+                    self.running[host] -= 1
+            future.set_result(valid)
+
+
+path_checker = PathChecker()
+# Existence of the files in the Excel history, probed once per session
+history_probe = PathChecker(check=os.path.exists, ttl=None)
+
+
 def get_filename_from_path(path: str) -> str:
     """Extract filename from path (works with both ¥ and \\ separators)"""
     if not path:
@@ -222,8 +417,121 @@ def format_number(value):
         return str(value)
 
 
-def format_excel_date(value):
-    """Format Excel date value for display"""
+# ==============================
+# Date parsing engine
+# ==============================
+# String date formats accepted for display, in order of precedence
+DATE_FORMATS = [
+    "%Y-%m-%d",    # 2024-01-15
+    "%Y/%m/%d",    # 2024/01/15
+    "%d-%m-%Y",    # 15-01-2024
+    "%d/%m/%Y",    # 15/01/2024
+    "%m-%d-%Y",    # 01-15-2024
+    "%m/%d/%Y",    # 01/15/2024
+    "%Y年%m月%d日", # Japanese format
+]
+# Lengths of the strings DATE_FORMATS can match: %Y is 4 digits, %m/%d 1 or 2
+# ("2024/1/5" to "2024年01月15日"); other strings are never dates
+DATE_TEXT_LENGTHS = range(8, 12)
+# Formats used to find the month of 発生月 for № numbering
+MONTH_KEY_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y"]
+
+DATE_CACHE_SIZE = 4096  # Distinct strings remembered per parser
+DATE_SAMPLE_SIZE = 200  # Parses between re-ranking the formats of a column
+
+
+class DateParser:
+    """strptime over a list of formats with the same result as trying them in
+    order, but faster for ledger columns:
+    - the formats that matched most often in this column are tried first
+      (re-ranked every DATE_SAMPLE_SIZE parses);
+    - results are kept in a bounded LRU cache, since the same dates repeat
+      thousands of times.
+    A string can match two formats only if they have the same separators
+    (15/01 vs 01/15); a match is then checked against the earlier formats of
+    that kind, so precedence never changes."""
+
+    def __init__(self, formats, cache_size=DATE_CACHE_SIZE, sample_size=DATE_SAMPLE_SIZE):
+        self.formats = list(formats)
+        self.cache_size = cache_size
+        self.sample_size = sample_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.order = list(range(len(self.formats)))  # Try order (format indices)
+        self.hits = [0] * len(self.formats)
+        self.parsed = 0
+
+        separators = [re.sub(r"%.|\w", "", fmt) for fmt in self.formats]
+        self.earlier = [
+            [j for j in range(i) if separators[j] == separators[i]]
+            for i in range(len(self.formats))
+        ]
+
+    def parse(self, text):
+        """datetime for `text`, or None when no format matches"""
+        with self.lock:
+            try:
+                result = self.cache[text]
+                self.cache.move_to_end(text)
+                return result
+            except KeyError:
+                pass
+
+        result = self._parse(text)
+        with self.lock:
+            self.cache[text] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def _parse(self, text):
+        for i in self.order:
+            try:
+                parsed = datetime.datetime.strptime(text, self.formats[i])
+            except ValueError:
+                continue
+            # An earlier format that also matches takes precedence
+            for j in self.earlier[i]:
+                try:
+                    parsed = datetime.datetime.strptime(text, self.formats[j])
+                    i = j
+                    break
+                except ValueError:
+                    continue
+            self.count(i)
+            return parsed
+        self.count(None)
+        return None
+
+    def count(self, index):
+        if index is not None:
+            self.hits[index] += 1
+        self.parsed += 1
+        if self.parsed % self.sample_size == 0:
+            # Dominant formats first; halve the counts so the ranking can adapt
+            self.order = sorted(self.order, key=lambda k: -self.hits[k])
+            self.hits = [n // 2 for n in self.hits]
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+DATE_PARSERS = {}  # column index (None = no column) -> DateParser
+MONTH_KEY_PARSER = DateParser(MONTH_KEY_FORMATS)
+
+
+def date_parser(column=None):
+    """Shared DateParser of a sheet column (its format ranking is per column)"""
+    parser = DATE_PARSERS.get(column)
+    if parser is None:
+        parser = DATE_PARSERS.setdefault(column, DateParser(DATE_FORMATS))
+    return parser
+
+
+def format_excel_date(value, column=None):
+    """Format Excel date value for display.
+    `column` selects the parser whose format ranking and cache are used."""
     if value is None:
         return ""
 
@@ -255,29 +563,15 @@ def format_excel_date(value):
     elif isinstance(value, datetime.date):
         return value.strftime("%Y-%m-%d")
 
-    # Handle string dates - try to parse common formats
+    # Handle string dates - try to parse common formats (see DATE_FORMATS)
     elif isinstance(value, str):
         value = value.strip()
         if not value:
             return ""
 
-        # Try to parse various date formats
-        date_formats = [
-            "%Y-%m-%d",    # 2024-01-15
-            "%Y/%m/%d",    # 2024/01/15
-            "%d-%m-%Y",    # 15-01-2024
-            "%d/%m/%Y",    # 15/01/2024
-            "%m-%d-%Y",    # 01-15-2024
-            "%m/%d/%Y",    # 01/15/2024
-            "%Y年%m月%d日", # Japanese format
-        ]
-
-        for fmt in date_formats:
-            try:
-                parsed_date = datetime.datetime.strptime(value, fmt)
-                return parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                continue
+        parsed_date = date_parser(column).parse(value)
+        if parsed_date is not None:
+            return parsed_date.strftime("%Y-%m-%d")
 
         # If no format matches, return original string
         return value
@@ -288,9 +582,734 @@ def format_excel_date(value):
 
 
 def append_excel(folder, rowdata, creator):
+    from openpyxl import load_workbook
+
     filepath = create_excel_if_not_exists(folder, creator)
     wb = load_workbook(filepath)
     ws = wb.active
     ws.append(rowdata)
     wb.save(filepath)
     return filepath
+
+
+# ==============================
+# 累計 / № numbering
+# ==============================
+# Kolom yang menentukan apakah baris berisi data: 発生月, №, 発生日, 項目
+NUMBERING_KEY_COLUMNS = (0, 2, 3, 4)
+
+
+def format_cell(value, column_index=None):
+    """Display string of a sheet cell (column index 0 = 発生月)"""
+    if value is None:
+        return ""
+
+    # Column indices: 0=発生月, 1=累計, 2=№, 3=発生日, 4=項目, etc.
+    if column_index is not None:
+        if column_index in [1, 2]:  # 累計 and № columns
+            return format_number(value)
+        elif column_index in [0, 3]:  # 発生月 and 発生日 columns
+            return format_excel_date(value, column_index)
+        else:
+            return str(value)
+
+    # Unknown column: Excel serial dates, datetime/date objects and string
+    # dates are shown as dates, anything else as is
+    return format_excel_date(value)
+
+
+def month_key(value):
+    """Month used to reset № (from the raw 発生月 cell value).
+    Returns the month number, the original string when it is not a known date
+    format, or None when the value cannot be used."""
+    if not value:
+        return None
+
+    if isinstance(value, (int, float)):
+        # Excel serial date
+        try:
+            if 1 <= value <= 73050:
+                if value > 59:
+                    excel_date = datetime.datetime(1899, 12, 30) + datetime.timedelta(days=value)
+                else:
+                    excel_date = datetime.datetime(1899, 12, 31) + datetime.timedelta(days=value-1)
+                return excel_date.month
+            return None
+        except (ValueError, TypeError, OverflowError):
+            return None
+    elif isinstance(value, str):
+        try:
+            # Handle YYYY-MM-DD format
+            if '-' in value:
+                parts = value.split('-')
+                if len(parts) >= 2:
+                    return int(parts[1])
+            # Handle other formats
+            else:
+                parsed = MONTH_KEY_PARSER.parse(value.strip())
+                if parsed is not None:
+                    return parsed.month
+        except (ValueError, TypeError):
+            return None
+        return value
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.month
+    return value
+
+
+def row_has_data(values):
+    """True when one of the key columns of a row (raw cell values) is filled"""
+    for col_idx in NUMBERING_KEY_COLUMNS:
+        if col_idx < len(values):
+            value = values[col_idx]
+            if value is not None and str(value).strip() != "":
+                return True
+    return False
+
+
+def new_numbering():
+    """Running state of the 累計 / № numbering at the top of the data"""
+    return {"total": 0, "monthly": 0, "month": None}
+
+
+def advance_numbering(state, values):
+    """Number the next row (raw cell values) and update `state` in place.
+    Returns (累計, №), or None for a row without data (both cells are cleared)."""
+    if not row_has_data(values):
+        return None
+    month = month_key(values[0]) if values else None
+    # Reset № when the month changes
+    if month is not None and month != state["month"]:
+        state["month"] = month
+        state["monthly"] = 0
+    state["total"] += 1
+    state["monthly"] += 1
+    return state["total"], state["monthly"]
+
+
+class NumberingIndex:
+    """累計/№ state after every row of a sheet, from `start_row` down.
+    Lets renumber_sheet restart at a changed row instead of the top. `stat` is
+    the (mtime_ns, size) of the file `path` the states describe; `consistent` is False
+    when some stored 累計/№ differ from the computed ones (a full pass is then
+    needed to give the same result as always)."""
+
+    def __init__(self, path, sheet, start_row):
+        self.path = os.path.abspath(path)
+        self.sheet = sheet
+        self.stat = None
+        self.reset(start_row)
+
+    def reset(self, start_row):
+        self.start_row = start_row
+        self.totals = array("q")
+        self.monthly = array("q")
+        self.months = []
+        self.consistent = True
+
+    def __len__(self):
+        return len(self.totals)
+
+    def append(self, state):
+        self.totals.append(state["total"])
+        self.monthly.append(state["monthly"])
+        self.months.append(state["month"])
+
+    def set(self, row, state):
+        i = row - self.start_row
+        self.totals[i] = state["total"]
+        self.monthly[i] = state["monthly"]
+        self.months[i] = state["month"]
+
+    def truncate(self, row):
+        """Forget the states of `row` and every row below it"""
+        i = max(row - self.start_row, 0)
+        del self.totals[i:]
+        del self.monthly[i:]
+        del self.months[i:]
+
+    def state_after(self, row):
+        """Numbering state after `row` (fresh state above the data)"""
+        i = row - self.start_row
+        if i < 0:
+            return new_numbering()
+        return {"total": self.totals[i], "monthly": self.monthly[i], "month": self.months[i]}
+
+    def check_stored(self, values, numbers):
+        """Note whether a row's stored 累計/№ match what numbering gives it"""
+        total, monthly = numbers if numbers else (None, None)
+        if len(values) > 1 and values[1] != total:
+            self.consistent = False
+        elif len(values) > 2 and values[2] != monthly:
+            self.consistent = False
+
+    def matches(self, path):
+        """True when the file still is the one the states were computed from"""
+        if os.path.abspath(path) != self.path:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == self.stat
+
+    def mark_saved(self, path):
+        stat = os.stat(path)
+        self.stat = (stat.st_mtime_ns, stat.st_size)
+
+    def to_state(self):
+        """States as plain builtins (marshal-able), see from_state. None when
+        a 発生月 key is some other cell type (time, bool...)."""
+        if not all(m is None or type(m) in (int, float, str) for m in self.months):
+            return None
+        return {
+            "path": self.path,
+            "sheet": self.sheet,
+            "start_row": self.start_row,
+            "stat": self.stat,
+            "totals": self.totals.tobytes(),
+            "monthly": self.monthly.tobytes(),
+            "months": list(self.months),
+            "consistent": self.consistent,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls(state["path"], state["sheet"], state["start_row"])
+        index.stat = tuple(state["stat"]) if state["stat"] else None
+        index.totals.frombytes(state["totals"])
+        index.monthly.frombytes(state["monthly"])
+        index.months = list(state["months"])
+        index.consistent = state["consistent"]
+        return index
+
+
+def renumber_sheet(ws, start_row, index=None, from_row=None, last_changed=None):
+    """Set ulang 累計 (col 2) dan № (col 3) untuk baris mulai `start_row`.
+    Baris tanpa data dikosongkan 累計 dan №-nya.
+    With the NumberingIndex of the sheet before the change only rows from
+    `from_row` down are renumbered (rows above it must be unchanged). When no
+    row moved (updates/appends) pass `last_changed` as well: the pass then stops
+    below that row as soon as the numbering is back in step with the index.
+    The index is updated to the new numbering; without `from_row` (or when
+    the index cannot be used) every row is renumbered and the index rebuilt."""
+    resume = (
+        index is not None
+        and index.consistent
+        and from_row is not None
+        and index.start_row == start_row
+        and start_row <= from_row <= start_row + len(index)
+    )
+    if index is not None:
+        index.stat = None  # Describes the file again once the caller saved it
+    if resume:
+        numbering = index.state_after(from_row - 1)
+        if last_changed is None:
+            index.truncate(from_row)  # Rows below moved; recompute all of them
+    else:
+        numbering = new_numbering()
+        from_row, last_changed = start_row, None
+        if index is not None:
+            index.reset(start_row)
+
+    row_number = from_row - 1
+    for row_number, row in enumerate(
+        ws.iter_rows(min_row=from_row, values_only=False), start=from_row
+    ):
+        values = [cell.value for cell in row[:5]]
+        numbers = advance_numbering(numbering, values)
+
+        # Jika baris berisi data, update 累計 dan №; jika kosong, kosongkan
+        total_count, monthly_count = numbers if numbers else (None, None)
+        if len(row) > 1:  # 累計 (B column, index 1)
+            row[1].value = total_count
+        if len(row) > 2:  # № (C column, index 2)
+            row[2].value = monthly_count
+
+        if index is None:
+            continue
+        if row_number - start_row < len(index):
+            # Unchanged rows below this one keep their (stored) numbers
+            if (
+                last_changed is not None
+                and row_number > last_changed
+                and index.state_after(row_number) == numbering
+            ):
+                return
+            index.set(row_number, numbering)
+        else:
+            index.append(numbering)
+
+    if index is not None:
+        # Empty rows past the end of the sheet (dimension) keep the last state
+        for row in range(max(row_number + 1, start_row), start_row + len(index)):
+            index.set(row, numbering)
+        index.consistent = True
+
+
+def write_row_values(ws, row, values):
+    """Write form values (sheet column order) to one worksheet row.
+    累計 (index 1) is left to renumber_sheet; column 11 gets a hyperlink."""
+    from openpyxl.styles import Font
+
+    for col_idx, value in enumerate(values):
+        if col_idx != 1:
+            ws.cell(row=row, column=col_idx + 1).value = value
+
+    # Save path as hyperlink in column 11
+    actual_path = values[10] if len(values) > 10 else ""
+    if actual_path:  # Only create hyperlink if path exists
+        path_cell = ws.cell(row=row, column=11)
+        path_cell.hyperlink = actual_path
+        path_cell.font = Font(color="0000FF", underline="single")
+    elif ws.cell(row=row, column=11).hyperlink is not None:
+        # A cleared path drops its link too (openpyxl would otherwise put the
+        # link target back as the value the next time the file is loaded)
+        ws.cell(row=row, column=11).hyperlink = None
+
+
+def write_cell_values(ws, row, cells):
+    """Write some columns of one worksheet row ({column index: value}, indices
+    as in write_row_values); the other cells keep their value and type."""
+    from openpyxl.styles import Font
+
+    for col_idx, value in cells.items():
+        cell = ws.cell(row=row, column=col_idx + 1)
+        cell.value = value
+        if col_idx == 10:
+            if value:
+                cell.hyperlink = value
+                cell.font = Font(color="0000FF", underline="single")
+            else:
+                cell.hyperlink = None
+
+
+def delete_sheet_rows(ws, rows):
+    """Delete worksheet rows (any order) in a single pass over the cells.
+    ws.delete_rows shifts every cell below the deleted row, so deleting rows
+    one by one costs (rows deleted) x (cells below); here every cell below the
+    first deleted row moves once, straight to its final row. Cells keep their
+    value and style, and hyperlinks are moved with their cell (delete_rows
+    leaves them on the old coordinate). Works on ws._cells like openpyxl's own
+    row moves. Returns the first deleted row, or None."""
+    doomed = sorted(set(rows))
+    if not doomed:
+        return None
+    first = doomed[0]
+    doomed_set = set(doomed)
+    below = [key for key in ws._cells if key[0] >= first]
+    moved = [(key, ws._cells.pop(key)) for key in below]
+    for (row, col), cell in moved:
+        if row in doomed_set:
+            continue
+        # Rows above it that are deleted
+        cell.row = row - bisect_left(doomed, row)
+        ws._cells[cell.row, col] = cell
+        if cell.hyperlink is not None:
+            cell.hyperlink.ref = cell.coordinate
+    ws._current_row = ws.max_row if ws._cells else 0
+    return first
+
+
+def changes_numbering(columns):
+    """True when editing these columns can change 累計/№ (see row_has_data)"""
+    return any(col in NUMBERING_KEY_COLUMNS for col in columns)
+
+
+# ==============================
+# Parsed sheet cache
+# ==============================
+SHEET_CACHE_BUDGET = 256 * 1024 * 1024  # Bytes of parsed data kept in memory
+
+
+def file_stat(path):
+    """(mtime_ns, size) of a file, the version used for cache keys"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SheetCache:
+    """Parsed sheet data kept in memory, keyed by (real path, sheet, mtime, size).
+    A file that was saved since it was parsed gets a new key, so its old entry
+    is never served again and is evicted in time. Least recently used entries
+    are dropped once the sizes given to put() exceed `budget` bytes."""
+
+    def __init__(self, budget=SHEET_CACHE_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()  # key -> (data, size), oldest first
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path, sheet, stat):
+        return (os.path.normcase(os.path.realpath(path)), sheet) + tuple(stat)
+
+    def get(self, path, sheet):
+        """Data of an unchanged sheet, or None"""
+        try:
+            key = self.key(path, sheet, file_stat(path))
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, path, sheet, stat, data, size):
+        """Remember data parsed from the file version `stat`"""
+        key = self.key(path, sheet, stat)
+        with self.lock:
+            self._remove(key)
+            if size > self.budget:
+                return  # Would evict everything else and still not fit
+            # Older versions of the same sheet cannot be served any more
+            for old in [k for k in self.entries if k[:2] == key[:2]]:
+                self._remove(old)
+            self.entries[key] = (data, size)
+            self.used += size
+            while self.used > self.budget:
+                self._remove(next(iter(self.entries)))
+
+    def discard(self, path, sheet=None):
+        """Forget every entry of a file (or of one of its sheets)"""
+        real = os.path.normcase(os.path.realpath(path))
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == real]:
+                if sheet is None or key[1] == sheet:
+                    self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used -= entry[1]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# ==============================
+# In-place row append (xlsx package)
+# ==============================
+class XlsxPatchError(Exception):
+    """The workbook layout is not supported by the in-place append"""
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+HYPERLINK_REL = REL_NS + "/hyperlink"
+HYPERLINK_FONT = '<font><color rgb="000000FF" /><u val="single" /></font>'
+CUSTOM_PROPS_PART = "docProps/custom.xml"
+CUSTOM_PROPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/custom-properties"
+
+# Elements that come after <hyperlinks> in a worksheet (schema order)
+AFTER_HYPERLINKS = (
+    "printOptions", "pageMargins", "pageSetup", "headerFooter", "rowBreaks",
+    "colBreaks", "customProperties", "cellWatches", "ignoredErrors", "smartTags",
+    "drawing", "legacyDrawing", "legacyDrawingHF", "drawingHF", "picture",
+    "oleObjects", "controls", "webPublishItems", "tableParts", "extLst",
+)
+
+LAST_ROW_RE = re.compile(rb'<row\b[^>]*?\sr="(\d+)"')
+DIMENSION_RE = re.compile(rb'<dimension ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+FONT_RE = re.compile(r"<font\b[^>]*?(?:/>|>.*?</font>)", re.S)
+XF_RE = re.compile(r"<xf\b([^>]*?)(?:/>|>.*?</xf>)", re.S)
+
+
+def sheet_part_name(zf, sheet_name):
+    """Zip member of a worksheet, resolved through workbook.xml and its rels"""
+    workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    rel_id = None
+    for sheet in workbook.iter(f"{{{MAIN_NS}}}sheet"):
+        if sheet.get("name") == sheet_name:
+            rel_id = sheet.get(f"{{{REL_NS}}}id")
+            break
+    if rel_id is None:
+        raise XlsxPatchError(f"sheet not found: {sheet_name}")
+
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target[1:]
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise XlsxPatchError(f"relationship not found: {rel_id}")
+
+
+def read_sheet_names(source):
+    """Sheet names in workbook order, streamed from xl/workbook.xml only
+    (styles, shared strings and worksheets are not read, unlike load_workbook).
+    `source` is a path or a binary file object, which is left open."""
+    sheet_tag = f"{{{MAIN_NS}}}sheet"
+    sheets_tag = f"{{{MAIN_NS}}}sheets"
+    names = []
+    with zipfile.ZipFile(source) as zf:
+        with zf.open("xl/workbook.xml") as part:
+            for _, elem in ElementTree.iterparse(part, events=("end",)):
+                if elem.tag == sheet_tag:
+                    names.append(elem.get("name"))
+                elif elem.tag == sheets_tag:
+                    break  # Defined names, calc settings etc. are not needed
+    return names
+
+
+def cell_xml(ref, value, style=None):
+    """One <c> element; strings are written inline (no sharedStrings change)"""
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    attrs = f' r="{ref}"' + (f' s="{style}"' if style is not None else "")
+    if isinstance(value, bool):
+        return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            # <v>nan</v> / <v>inf</v> make the worksheet unreadable
+            raise XlsxPatchError("non-finite number in cell value")
+        return f"<c{attrs}><v>{value}</v></c>"
+    text = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise XlsxPatchError("illegal character in cell value")
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c{attrs} t="inlineStr"><is><t{space}>{escape(text, quote=False)}</t></is></c>'
+
+
+def hyperlink_style(styles):
+    """Index of a cellXfs entry with the blue underlined hyperlink font.
+    Reuses an existing one; otherwise the font/xf are added to `styles`.
+    Returns (style index, styles xml)."""
+    fonts_start, fonts_end = styles.find("<fonts"), styles.find("</fonts>")
+    xfs_start, xfs_end = styles.find("<cellXfs"), styles.find("</cellXfs>")
+    if min(fonts_start, fonts_end, xfs_start, xfs_end) < 0:
+        raise XlsxPatchError("unsupported styles.xml")
+
+    normalized = re.sub(r"\s+/>", "/>", HYPERLINK_FONT)
+    fonts = FONT_RE.findall(styles, fonts_start, fonts_end)
+    font_id = None
+    for i, font in enumerate(fonts):
+        if re.sub(r"\s+/>", "/>", font) == normalized:
+            font_id = i
+            break
+
+    if font_id is not None:
+        xfs = XF_RE.finditer(styles, xfs_start, xfs_end)
+        for i, xf in enumerate(xfs):
+            found = dict(re.findall(r'(\w+)="([^"]*)"', xf.group(1)))
+            if (
+                found.get("fontId") == str(font_id)
+                and found.get("numFmtId", "0") == "0"
+                and found.get("fillId", "0") == "0"
+                and found.get("borderId", "0") == "0"
+                and "<alignment" not in xf.group(0)
+            ):
+                return i, styles
+    else:
+        font_id = len(fonts)
+        styles = (
+            styles[:fonts_end] + HYPERLINK_FONT + styles[fonts_end:]
+        ).replace(f'<fonts count="{font_id}"', f'<fonts count="{font_id + 1}"', 1)
+
+    xfs_start, xfs_end = styles.find("<cellXfs"), styles.find("</cellXfs>")
+    xf_id = len(XF_RE.findall(styles, xfs_start, xfs_end))
+    xf = f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" applyFont="1" xfId="0" />'
+    styles = (styles[:xfs_end] + xf + styles[xfs_end:]).replace(
+        f'<cellXfs count="{xf_id}"', f'<cellXfs count="{xf_id + 1}"', 1
+    )
+    return xf_id, styles
+
+
+def add_hyperlink_rel(rels, target):
+    """Add an external hyperlink relationship. Returns (rel id, rels xml)."""
+    if rels is None:
+        rels = f'<Relationships xmlns="{PKG_REL_NS}"></Relationships>'
+    end = rels.rfind("</Relationships>")
+    if end < 0:
+        raise XlsxPatchError("unsupported sheet relationships")
+    used = [int(n) for n in re.findall(r'Id="rId(\d+)"', rels)]
+    rel_id = f"rId{max(used, default=0) + 1}"
+    target = escape(target)
+    rel = (
+        f'<Relationship Type="{HYPERLINK_REL}" Target="{target}" '
+        f'TargetMode="External" Id="{rel_id}" />'
+    )
+    return rel_id, rels[:end] + rel + rels[end:]
+
+
+def insert_hyperlink(sheet, ref, rel_id):
+    """Add <hyperlink> to the worksheet xml, creating <hyperlinks> if needed"""
+    link = f'<hyperlink xmlns:r="{REL_NS}" ref="{ref}" r:id="{rel_id}" />'.encode()
+    end = sheet.rfind(b"</hyperlinks>")
+    if end >= 0:
+        return sheet[:end] + link + sheet[end:]
+
+    tail = sheet.rfind(b"</sheetData>")
+    positions = [
+        m.start()
+        for tag in AFTER_HYPERLINKS
+        for m in [re.compile(rb"<%s[\s/>]" % tag.encode()).search(sheet, tail)]
+        if m
+    ]
+    at = min(positions) if positions else sheet.rfind(b"</worksheet>")
+    if at < 0:
+        raise XlsxPatchError("unsupported worksheet xml")
+    return sheet[:at] + b"<hyperlinks>" + link + b"</hyperlinks>" + sheet[at:]
+
+
+def read_custom_properties(source):
+    """Custom document properties of a workbook as {name: text}, read from
+    docProps/custom.xml only"""
+    with zipfile.ZipFile(source) as zf:
+        if CUSTOM_PROPS_PART not in zf.namelist():
+            return {}
+        root = ElementTree.fromstring(zf.read(CUSTOM_PROPS_PART))
+    return {
+        prop.get("name"): "".join(prop.itertext())
+        for prop in root.iter(f"{{{CUSTOM_PROPS_NS}}}property")
+    }
+
+
+def set_custom_property(custom, name, text):
+    """Replace the value of an existing string property in custom.xml"""
+    match = re.search(
+        r'(<property\b[^>]*\bname="%s"[^>]*>\s*<vt:lpwstr>)[^<]*(</vt:lpwstr>)'
+        % re.escape(escape(name)),
+        custom,
+    )
+    if not match:
+        raise XlsxPatchError(f"custom property not found: {name}")
+    return custom[: match.end(1)] + escape(text, quote=False) + custom[match.start(2) :]
+
+
+def append_sheet_row(filepath, sheet_name, row_number, values, hyperlink_col=None):
+    """Write one new row at `row_number` without loading the workbook
+    (see append_sheet_rows)"""
+    append_sheet_rows(filepath, sheet_name, row_number, [values], hyperlink_col)
+
+
+def append_sheet_rows(filepath, sheet_name, row_number, rows, hyperlink_col=None,
+                      properties=None):
+    """Write new rows from `row_number` down without loading the workbook.
+    Only the worksheet part (plus its rels/styles for hyperlinks) is changed:
+    the row xml is inserted before </sheetData> and the dimension extended.
+    None/"" cells are left out, like openpyxl does. `properties` ({name:
+    text}) sets custom document properties in the same write; they must
+    already exist. Raises XlsxPatchError when the package is not laid out as
+    expected (the caller then falls back to openpyxl) or when `row_number`
+    is not below every existing row."""
+    from openpyxl.utils import get_column_letter, column_index_from_string
+
+    with zipfile.ZipFile(filepath) as zin:
+        part = sheet_part_name(zin, sheet_name)
+        sheet = zin.read(part)
+
+        end = sheet.rfind(b"</sheetData>")
+        if end < 0:
+            empty = sheet.rfind(b"<sheetData/>")
+            if empty < 0:
+                raise XlsxPatchError("unsupported worksheet xml")
+            sheet = sheet[:empty] + b"<sheetData></sheetData>" + sheet[empty + 12 :]
+            end = empty + len(b"<sheetData>")
+        last_row = sheet.rfind(b"<row", 0, end)
+        if last_row >= 0:
+            match = LAST_ROW_RE.match(sheet, last_row)
+            if not match:
+                raise XlsxPatchError("row without r attribute")
+            if int(match.group(1)) >= row_number:
+                raise XlsxPatchError("sheet has rows below the target row")
+
+        changed = {}
+        if properties:
+            if CUSTOM_PROPS_PART not in zin.namelist():
+                raise XlsxPatchError("no custom properties")
+            custom = zin.read(CUSTOM_PROPS_PART).decode("utf-8")
+            for name, text in properties.items():
+                custom = set_custom_property(custom, name, text)
+            changed[CUSTOM_PROPS_PART] = custom.encode("utf-8")
+
+        links = []  # (cell ref, target)
+        style = None
+        rels_name = rels = None
+        if hyperlink_col is not None and any(
+            len(values) > hyperlink_col and values[hyperlink_col] for values in rows
+        ):
+            style, changed["xl/styles.xml"] = hyperlink_style(
+                zin.read("xl/styles.xml").decode("utf-8")
+            )
+            rels_name = posixpath.join(
+                posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels"
+            )
+            rels = (
+                zin.read(rels_name).decode("utf-8")
+                if rels_name in zin.namelist()
+                else None
+            )
+
+        rows_xml = []
+        last_col = 0
+        for row, values in enumerate(rows, start=row_number):
+            link_ref = None
+            if style is not None and len(values) > hyperlink_col and values[hyperlink_col]:
+                link_ref = f"{get_column_letter(hyperlink_col + 1)}{row}"
+                rel_id, rels = add_hyperlink_rel(rels, values[hyperlink_col])
+                links.append((link_ref, rel_id))
+            cells = []
+            for col, value in enumerate(values):
+                if value is None or value == "":
+                    continue
+                ref = f"{get_column_letter(col + 1)}{row}"
+                cells.append(cell_xml(ref, value, style if ref == link_ref else None))
+                last_col = max(last_col, col + 1)
+            rows_xml.append(f'<row r="{row}">{"".join(cells)}</row>')
+        sheet = sheet[:end] + "".join(rows_xml).encode("utf-8") + sheet[end:]
+        last = row_number + len(rows) - 1
+
+        # Extend the dimension (read-only mode relies on it for max_row)
+        dim = DIMENSION_RE.search(sheet)
+        if dim:
+            start_col, start_row = dim.group(1), dim.group(2)
+            end_col = dim.group(3) or start_col
+            end_row = int(dim.group(4) or start_row)
+            end_col = get_column_letter(
+                max(column_index_from_string(end_col.decode()), last_col, 1)
+            )
+            ref = b"%s%s:%s%d" % (start_col, start_row, end_col.encode(), max(end_row, last))
+            sheet = sheet[: dim.start()] + b'<dimension ref="' + ref + b'"' + sheet[dim.end() :]
+
+        for link_ref, rel_id in links:
+            sheet = insert_hyperlink(sheet, link_ref, rel_id)
+        if links:
+            changed[rels_name] = rels
+        changed[part] = sheet
+
+        # Write the new package next to the original and swap it in
+        folder = os.path.dirname(os.path.abspath(filepath))
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=folder)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    data = changed.pop(info.filename, None)
+                    if data is None:
+                        data = zin.read(info.filename)
+                    zout.writestr(info, data)
+                for name, data in changed.items():  # New parts (sheet rels)
+                    zout.writestr(name, data)
+            shutil.copymode(filepath, tmp_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    try:
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,314 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from excel_utils import get_config_dir, renumber_sheet, write_row_values, write_cell_values
+from excel_utils import delete_sheet_rows, advance_numbering, append_sheet_rows
+from excel_utils import read_custom_properties, XlsxPatchError
+from ledger_lock import RebaseConflict, rebase_rows, free_row
+
+JOURNAL_DIRNAME = "journal"
+# Custom document property that records the last entry applied from a journal,
+# so replaying after a crash between save and truncate does not apply it twice.
+# The journal id stays the same for a workbook on this PC, so there is one
+# property per user and workbook; its value is overwritten by every flush.
+APPLIED_PROPERTY = "mini_erp_applied_{id}"
+# Properties of earlier versions, which used a new journal id (and so added
+# a new property) for every flush; removed when a flush saves the workbook
+LEGACY_PROPERTY_PREFIX = "mini_erp_journal_"
+
+
+def journal_dir():
+    return get_config_dir() / JOURNAL_DIRNAME
+
+
+def journal_path(workbook_path, directory=None):
+    """Journal file of a workbook (one per absolute path)"""
+    key = os.path.normcase(os.path.abspath(workbook_path))
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".jsonl"
+    return os.path.join(directory or journal_dir(), name)
+
+
+# ==============================
+# Write-behind journal
+# ==============================
+class WriteJournal:
+    """Append-only local journal of sheet mutations not yet saved to a workbook.
+
+    The first line is a header ({"journal": id, "workbook": path}); every other
+    line is one entry with a sequence number:
+        {"seq": 1, "op": "add", "sheet": ..., "start": 4, "row": 12, "values": [...]}
+        {"seq": 2, "op": "update", "sheet": ..., "start": 4, "row": 7, "values": [...]}
+        {"seq": 3, "op": "delete", "sheet": ..., "start": 4, "rows": [9, 8]}
+        {"seq": 4, "op": "edit", "sheet": ..., "start": 4, "rows": [5, 9],
+         "cells": [[9, "WAKO"]], "renumber": false}
+    Updates, deletes and edits also keep "base": the rows as they were shown
+    (display strings), which finds them again when someone else moved them.
+    Entries are fsync'd before append() returns. Once every entry has been
+    saved to the workbook only the header is kept: the journal id and the
+    sequence carry on, so the workbook keeps a single APPLIED_PROPERTY for
+    this journal."""
+
+    def __init__(self, workbook_path, directory=None):
+        self.workbook_path = os.path.abspath(workbook_path)
+        self.path = journal_path(self.workbook_path, directory)
+        self.lock = threading.Lock()
+        self.journal_id = None
+        self.entries = []
+        self.next_seq = 1
+        self._load()
+
+    def _load(self):
+        """Read a journal left on disk (entries not flushed before a crash)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn last line of an interrupted write
+            if "journal" in record:
+                self.journal_id = record["journal"]
+                self.next_seq = record.get("next_seq", 1)
+            elif "seq" in record:
+                self.entries.append(record)
+                self.next_seq = max(self.next_seq, record["seq"] + 1)
+        if self.journal_id is None or not text.endswith("\n"):
+            # Damaged header or an interrupted write: rewrite the readable part
+            self.journal_id = self.journal_id or uuid.uuid4().hex
+            self._rewrite()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, entry):
+        """Write one entry durably; returns its sequence number"""
+        with self.lock:
+            record = dict(entry, seq=self.next_seq)
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            if self.journal_id is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.journal_id = uuid.uuid4().hex
+                line = self._header() + line
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries.append(record)
+            self.next_seq += 1
+            return record["seq"]
+
+    def pending(self):
+        with self.lock:
+            return list(self.entries)
+
+    def drop(self, upto_seq):
+        """Forget entries up to `upto_seq` after they were saved to the workbook"""
+        with self.lock:
+            self.entries = [e for e in self.entries if e["seq"] > upto_seq]
+            self._rewrite()
+
+    def _rewrite(self):
+        """Replace the journal file with the header and the current entries"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._header())
+            for record in self.entries:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _header(self):
+        header = {
+            "journal": self.journal_id,
+            "workbook": self.workbook_path,
+            "next_seq": self.next_seq,
+        }
+        return json.dumps(header, ensure_ascii=False) + "\n"
+
+    @classmethod
+    def leftovers(cls, directory=None):
+        """Journals on disk that still have entries (app closed before a flush)"""
+        directory = directory or journal_dir()
+        if not os.path.isdir(directory):
+            return []
+        journals = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".jsonl"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    header = json.loads(f.readline())
+                journal = cls(header["workbook"], directory)
+            except (OSError, ValueError, KeyError):
+                continue
+            if journal.entries:
+                journals.append(journal)
+        return journals
+
+
+def entry_rows(ws, entry):
+    """Rows of the sheet an entry applies to now. Rows with a "base" are
+    found by their data (rebased when someone else inserted or deleted rows
+    above them); an add goes after the data when its row was taken."""
+    if entry["op"] == "add":
+        return [free_row(ws, entry["row"])]
+    rows = entry["rows"] if entry["op"] in ("delete", "edit") else [entry["row"]]
+    if "base" not in entry:
+        return rows  # Journal written before rows kept their data
+    return rebase_rows(
+        ws, entry["start"], list(zip(rows, entry["base"])), missing_ok=entry["op"] == "delete"
+    )
+
+
+def apply_entries(workbook_path, entries, journal_id, numbering_index=None, conflicts=None):
+    """Apply journal entries to the workbook with a single load/save.
+    Entries already recorded as applied in the workbook are skipped. Every
+    touched sheet is renumbered once at the end; with the NumberingIndex of a
+    sheet, only from its first changed row down. Entries whose rows were
+    changed or deleted by someone else are not applied but added to
+    `conflicts`. Returns the number of entries applied."""
+    from openpyxl import load_workbook
+    from openpyxl.packaging.custom import StringProperty
+
+    if not entries:
+        return 0
+    # The index only helps if it describes the file as it is on disk now
+    same_file = (
+        numbering_index is not None
+        and numbering_index.path == os.path.abspath(workbook_path)
+    )
+    index_valid = same_file and numbering_index.matches(workbook_path)
+    wb = load_workbook(workbook_path)
+    props = wb.custom_doc_props
+    prop_name = APPLIED_PROPERTY.format(id=journal_id)
+    applied_seq = 0
+    # A journal left by an earlier version is recorded under the legacy name
+    for name in (prop_name, LEGACY_PROPERTY_PREFIX + journal_id):
+        if name in props.names:
+            applied_seq = max(applied_seq, int(props[name].value))
+
+    starts = {}
+    changed = {}  # sheet -> [first changed row, last changed row, rows moved]
+    count = 0
+    for entry in entries:
+        if entry["seq"] <= applied_seq:
+            continue
+        ws = wb[entry["sheet"]]
+        try:
+            rows = entry_rows(ws, entry)
+        except RebaseConflict:
+            if conflicts is not None:
+                conflicts.append(entry)
+            continue
+        count += 1
+        if not rows:
+            continue  # Rows to delete were already deleted
+        starts[entry["sheet"]] = entry["start"]
+        first, last, moved = changed.get(entry["sheet"], (min(rows), max(rows), False))
+        changed[entry["sheet"]] = (
+            min(first, min(rows)),
+            max(last, max(rows)),
+            moved or entry["op"] == "delete",
+        )
+        if entry["op"] in ("add", "update"):
+            # "row" of an add is the row after the data as shown when it was made
+            write_row_values(ws, rows[0], entry["values"])
+        elif entry["op"] == "delete":
+            # Rows are numbered as shown before this delete
+            delete_sheet_rows(ws, rows)
+        elif entry["op"] == "edit":
+            # The same cells set on many rows (batch edit)
+            cells = dict(entry["cells"])
+            for row in rows:
+                write_cell_values(ws, row, cells)
+    if not count:
+        return 0
+
+    for sheet_name, start_row in starts.items():
+        if same_file and numbering_index.sheet == sheet_name:
+            # From the first changed row down when the index is current,
+            # otherwise a full pass that rebuilds the index
+            first, last, moved = changed[sheet_name]
+            renumber_sheet(
+                wb[sheet_name],
+                start_row,
+                numbering_index,
+                from_row=first if index_valid else None,
+                last_changed=None if moved else last,
+            )
+        else:
+            renumber_sheet(wb[sheet_name], start_row)
+
+    last_seq = str(entries[-1]["seq"])
+    for name in props.names:
+        if name.startswith(LEGACY_PROPERTY_PREFIX):
+            del props[name]
+    if prop_name in props.names:
+        props[prop_name].value = last_seq
+    else:
+        props.append(StringProperty(name=prop_name, value=last_seq))
+    wb.save(workbook_path)
+    if index_valid or (same_file and numbering_index.sheet in starts):
+        numbering_index.mark_saved(workbook_path)
+    return count
+
+
+def append_entries(workbook_path, entries, journal_id, numbering_index):
+    """Save a batch of adds without loading the workbook: the rows are
+    written after the data by append_sheet_rows, numbered from the state of
+    the last row in `numbering_index`, and the applied property is set in
+    the same write. Gives the same file content as apply_entries. Returns
+    the number of entries applied, or None when the batch needs
+    apply_entries (other changes than adds, file saved since the index was
+    computed, rows not right after the data, property not in the file yet)."""
+    if not entries or any(e["op"] != "add" for e in entries):
+        return None
+    index = numbering_index
+    if (
+        index is None
+        or not index.consistent
+        or any(e["sheet"] != index.sheet for e in entries)
+        or not index.matches(workbook_path)
+    ):
+        return None
+    prop_name = APPLIED_PROPERTY.format(id=journal_id)
+    props = read_custom_properties(workbook_path)
+    if prop_name not in props or any(n.startswith(LEGACY_PROPERTY_PREFIX) for n in props):
+        return None  # apply_entries adds it (and removes the legacy ones)
+    entries = [e for e in entries if e["seq"] > int(props[prop_name])]
+    if not entries:
+        return 0
+    first = index.start_row + len(index)
+    if [e["row"] for e in entries] != list(range(first, first + len(entries))):
+        return None
+
+    state = index.state_after(first - 1)
+    rows = []
+    states = []
+    for entry in entries:
+        values = list(entry["values"])
+        values += [None] * (3 - len(values))
+        numbers = advance_numbering(state, values)
+        values[1], values[2] = numbers if numbers else (None, None)
+        rows.append(values)
+        states.append(dict(state))
+    try:
+        append_sheet_rows(
+            workbook_path,
+            index.sheet,
+            first,
+            rows,
+            hyperlink_col=10,
+            properties={prop_name: str(entries[-1]["seq"])},
+        )
+    except XlsxPatchError:
+        return None
+    for state in states:
+        index.append(state)
+    index.mark_saved(workbook_path)
+    return len(entries)
@@ -0,0 +1,357 @@
+import os
+import sys
+import sqlite3
+import datetime
+from array import array
+from excel_utils import month_key, new_numbering, advance_numbering, write_ledger_xlsx
+from excel_utils import changes_numbering
+
+LEDGER_DB_SUFFIX = ".sqlite"
+LEDGER_SHEET = "Sheet1"  # The one sheet a database ledger shows (and exports)
+SCHEMA_VERSION = 1
+
+# Sheet columns in order (same as LEDGER_HEADERS)
+FIELDS = (
+    "hassei_month",  # 発生月
+    "ruikei",  # 累計
+    "no",  # №
+    "hassei_date",  # 発生日
+    "koumoku",  # 項目
+    "jishou",  # 事象
+    "ichiji",  # 事象（一次）
+    "niji",  # 事象（二次）
+    "hinban",  # 品番
+    "supplier",  # サプライヤー名
+    "renrakusho",  # 不良発生連絡書発行
+    "furyo_no",  # 不良発生№
+)
+INDEXED_FIELDS = ("hassei_date", "hinban", "supplier", "furyo_no")
+DATE_FIELDS = (0, 3)  # 発生月 / 発生日
+# File systems of network shares: SQLite's own locking is not reliable there
+NETWORK_FILESYSTEMS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afpfs", "fuse.sshfs"}
+DRIVE_REMOTE = 4  # GetDriveTypeW of a mapped network drive
+
+
+class LedgerDBNetworkPath(Exception):
+    """A database ledger was opened from a network share (they are local only)"""
+
+
+class LedgerDBInUse(Exception):
+    """The database ledger is open in another instance of the app"""
+
+
+def is_ledger_db(path):
+    return bool(path) and path.lower().endswith(LEDGER_DB_SUFFIX)
+
+
+def is_network_path(path):
+    """True for a path on a network share: UNC paths, mapped network drives
+    (Windows) and network file systems in /proc/self/mounts (Linux)"""
+    path = os.path.abspath(path)
+    if path.startswith(("\\\\", "//")):
+        return True
+    if sys.platform.startswith("win"):
+        import ctypes
+
+        drive = os.path.splitdrive(path)[0]
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+    try:
+        with open("/proc/self/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    best, fstype = "", None
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, fstype = mount_point, mount_type
+    return fstype in NETWORK_FILESYSTEMS
+
+
+def db_value(value, col):
+    """Raw cell value as stored in the database. Empty cells are NULL and
+    dates of 発生月/発生日 are kept as YYYY-MM-DD (how they are shown)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime("%Y-%m-%d") if col in DATE_FIELDS else str(value)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+# ==============================
+# SQLite ledger
+# ==============================
+class LedgerDB:
+    """A ledger kept in SQLite instead of xlsx.
+
+    Records are stored in insertion order (id). Like sheet rows, they are
+    addressed by position: `ids` holds the record id of every position after
+    records() was read. 累計/№ are stored and kept numbered: data rows always
+    have a 累計, other rows never, which lets a change renumber from its own
+    row instead of the top. The xlsx layout is only produced by export_xlsx.
+
+    A database ledger is single-user and local: it cannot be opened from a
+    network share (LedgerDBNetworkPath), and the connection keeps an
+    exclusive lock until close(), so a second app instance gets
+    LedgerDBInUse. Ledgers shared between users stay xlsx (see LedgerLock)."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        if is_network_path(self.path):
+            raise LedgerDBNetworkPath(self.path)
+        self.conn = sqlite3.connect(self.path, timeout=0.5)
+        self.ids = array("q")
+        try:
+            # The lock of the first write is kept until the connection closes
+            self.conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+            self.conn.execute("BEGIN EXCLUSIVE")
+            self.conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            if "locked" in str(e):
+                raise LedgerDBInUse(self.path) from e
+            raise
+        self._create()
+
+    def _create(self):
+        columns = ", ".join(FIELDS)
+        with self.conn:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, {columns})"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)"
+            )
+            for field in INDEXED_FIELDS:
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS records_{field} ON records ({field})"
+                )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)",
+                (SCHEMA_VERSION,),
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def records(self):
+        """Values of every record (sheet column order); also refreshes `ids`"""
+        self.ids = array("q")
+        cursor = self.conn.execute(f"SELECT id, {', '.join(FIELDS)} FROM records ORDER BY id")
+        for row in cursor:
+            self.ids.append(row[0])
+            yield list(row[1:])
+
+    def end_state(self):
+        """Numbering state after the last record"""
+        return self._state_before(len(self.ids))
+
+    def _state_before(self, position):
+        """Numbering state after the data rows above `position`"""
+        sql = "SELECT ruikei, no, hassei_month FROM records WHERE ruikei IS NOT NULL"
+        args = ()
+        if position < len(self.ids):
+            sql += " AND id < ?"
+            args = (self.ids[position],)
+        cursor = self.conn.execute(sql + " ORDER BY id DESC", args)
+        state = new_numbering()
+        first = True
+        for total, monthly, month in cursor:
+            if first:
+                state["total"], state["monthly"] = total, monthly
+                first = False
+            # A row without 発生月 keeps the month of the rows above it
+            month = month_key(month)
+            if month is not None:
+                state["month"] = month
+                break
+        cursor.close()
+        return state
+
+    # ------------------------------
+    # Changes (each one is a single transaction)
+    # ------------------------------
+    def add(self, values):
+        """Append a record; returns its (累計, №) or None for an empty row"""
+        values = [db_value(v, col) for col, v in enumerate(values[: len(FIELDS)])]
+        values += [None] * (len(FIELDS) - len(values))
+        state = self.end_state()
+        numbers = advance_numbering(state, values)
+        values[1], values[2] = numbers if numbers else (None, None)
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO records ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                values,
+            )
+        self.ids.append(cursor.lastrowid)
+        return numbers
+
+    def add_many(self, rows):
+        """Append records in one transaction, numbered like add();
+        returns the number of records added"""
+        width = len(FIELDS)
+        state = self.end_state()
+        records = []
+        for values in rows:
+            values = [db_value(v, col) for col, v in enumerate(values[:width])]
+            values += [None] * (width - len(values))
+            numbers = advance_numbering(state, values)
+            values[1], values[2] = numbers if numbers else (None, None)
+            records.append(values)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO records ({', '.join(FIELDS)}) VALUES ({', '.join('?' * width)})",
+                records,
+            )
+        # Re-read the ids of the new records (executemany gives no lastrowid)
+        self.ids.extend(
+            row[0]
+            for row in self.conn.execute(
+                "SELECT id FROM records WHERE id > ? ORDER BY id",
+                (self.ids[-1] if self.ids else 0,),
+            )
+        )
+        return len(records)
+
+    def update(self, position, values):
+        """Replace a record (累計 is ignored); returns the renumbered rows as
+        [(position, 累計, №)], always including the updated row"""
+        values = [db_value(v, col) for col, v in enumerate(values[: len(FIELDS)])]
+        values += [None] * (len(FIELDS) - len(values))
+        fields = [f for col, f in enumerate(FIELDS) if col != 1]
+        args = [v for col, v in enumerate(values) if col != 1]
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE records SET {', '.join(f + ' = ?' for f in fields)} WHERE id = ?",
+                args + [self.ids[position]],
+            )
+            return self._renumber(position, last_changed=position)
+
+    def update_many(self, positions, cells):
+        """Set the same columns ({column index: value}; 累計/№ are ignored) on
+        several records; returns the renumbered rows like update(), nothing
+        when no column that decides numbering changed"""
+        positions = sorted(set(positions))
+        cells = {col: db_value(v, col) for col, v in cells.items() if col not in (1, 2)}
+        if not positions or not cells:
+            return []
+        columns = list(cells)
+        values = [cells[col] for col in columns]
+        with self.conn:
+            self.conn.executemany(
+                f"UPDATE records SET {', '.join(FIELDS[c] + ' = ?' for c in columns)} WHERE id = ?",
+                [values + [self.ids[p]] for p in positions],
+            )
+            if not changes_numbering(columns):
+                return []
+            return self._renumber(positions[0], last_changed=positions[-1])
+
+    def delete(self, positions):
+        """Remove records; returns the renumbered rows below them as
+        [(position after the delete, 累計, №)]"""
+        doomed = sorted(set(positions))
+        if not doomed:
+            return []
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM records WHERE id = ?", [(self.ids[p],) for p in doomed]
+            )
+            doomed_set = set(doomed)
+            old_ids = self.ids
+            self.ids = array("q", (i for p, i in enumerate(old_ids) if p not in doomed_set))
+            try:
+                return self._renumber(doomed[0])
+            except Exception:
+                self.ids = old_ids  # Rolled back with the transaction
+                raise
+
+    def _renumber(self, from_position, last_changed=None):
+        """Set 累計/№ from `from_position` down (inside a transaction).
+        Without `last_changed` every row below is checked; with it, numbering
+        stops at the first data row after it that keeps its numbers and month,
+        since the rows below it were already numbered from the same state."""
+        if from_position >= len(self.ids):
+            return []
+        state = self._state_before(from_position)
+        cursor = self.conn.execute(
+            "SELECT id, hassei_month, ruikei, no, hassei_date, koumoku FROM records"
+            " WHERE id >= ? ORDER BY id",
+            (self.ids[from_position],),
+        )
+        changed = []
+        updates = []
+        for position, (record_id, *values) in enumerate(cursor, start=from_position):
+            stored = (values[1], values[2])
+            numbers = advance_numbering(state, values) or (None, None)
+            after_change = last_changed is not None and position > last_changed
+            if numbers != stored:
+                updates.append((numbers[0], numbers[1], record_id))
+                changed.append((position, numbers[0], numbers[1]))
+            elif not after_change:
+                changed.append((position, numbers[0], numbers[1]))
+            elif numbers[0] is not None and month_key(values[0]) is not None:
+                break
+        cursor.close()
+        self.conn.executemany("UPDATE records SET ruikei = ?, no = ? WHERE id = ?", updates)
+        return changed
+
+    # ------------------------------
+    # Import / export
+    # ------------------------------
+    def import_rows(self, rows, period_text=None, creator_text=None):
+        """Replace all records by raw sheet rows (extra columns are dropped)
+        and number them; returns the number of records"""
+        width = len(FIELDS)
+        state = new_numbering()
+
+        def numbered():
+            for row in rows:
+                values = [db_value(v, col) for col, v in enumerate(row[:width])]
+                values += [None] * (width - len(values))
+                numbers = advance_numbering(state, values)
+                values[1], values[2] = numbers if numbers else (None, None)
+                yield values
+
+        with self.conn:
+            self.conn.execute("DELETE FROM records")
+            self.conn.executemany(
+                f"INSERT INTO records ({', '.join(FIELDS)}) VALUES ({', '.join('?' * width)})",
+                numbered(),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('period', ?), ('creator', ?)",
+                (period_text, creator_text),
+            )
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def export_xlsx(self, path):
+        """Write the records in the 不具合品一覧表 layout, streamed straight
+        from the query (see excel_utils.write_ledger_xlsx)"""
+        today = datetime.date.today()
+        cursor = self.conn.execute(f"SELECT {', '.join(FIELDS)} FROM records ORDER BY id")
+        try:
+            return write_ledger_xlsx(
+                path,
+                cursor,
+                self.meta("period") or f"月間期間: {today.year}-{today.month}",
+                self.meta("creator") or "",
+            )
+        finally:
+            cursor.close()
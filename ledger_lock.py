@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import uuid
+import socket
+import getpass
+import hashlib
+import zipfile
+import datetime
+import threading
+from excel_utils import format_cell
+
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 30.0  # Seconds a save waits for the save of another user
+LOCK_STALE_SECONDS = 300  # Older locks were left by an app that died while saving
+LOCK_REFRESH_SECONDS = 30  # A held lock is touched this often, so it never looks stale
+LOCK_RETRY_DELAYS = (0.05, 0.1, 0.2, 0.5, 1.0)  # Between attempts (last one repeats)
+NUMBER_COLUMNS = (1, 2)  # 累計/№, renumbered by every save
+
+
+class LockTimeout(Exception):
+    """The ledger stayed locked by another user for LOCK_TIMEOUT (the message
+    names who holds the lock)"""
+
+
+class RebaseConflict(Exception):
+    """A row a change was made on was changed or deleted by someone else"""
+
+
+def lock_path(workbook_path):
+    return workbook_path + LOCK_SUFFIX
+
+
+# ==============================
+# Save counters
+# ==============================
+class LockStats:
+    """Lock wait time and conflict counters of this session (all ledgers).
+    A save is a conflict when the file was saved by someone else after the
+    preview read it; rejected conflicts could not be rebased."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.saves = 0
+        self.conflicts = 0
+        self.rejected = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.locks += 1
+                self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_save(self, conflict=False, rejected=False):
+        with self.lock:
+            self.saves += 1
+            self.conflicts += bool(conflict)
+            self.rejected += bool(rejected)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "locks": self.locks,
+                "wait_avg": self.wait_total / self.locks if self.locks else 0.0,
+                "wait_max": self.wait_max,
+                "timeouts": self.timeouts,
+                "saves": self.saves,
+                "conflicts": self.conflicts,
+                "rejected": self.rejected,
+                "conflict_rate": self.conflicts / self.saves if self.saves else 0.0,
+            }
+
+
+lock_stats = LockStats()
+
+
+# ==============================
+# Lock file
+# ==============================
+class LedgerLock:
+    """Lock file next to a workbook, held only while one app instance loads,
+    changes and saves it:
+
+        with LedgerLock(path):
+            wb = load_workbook(path) ... wb.save(path)
+
+    The file is created with O_EXCL, which is atomic on local disks and SMB
+    shares alike. It holds who took it; a lock older than LOCK_STALE_SECONDS
+    is removed (its app died while saving); while held, the lock is touched
+    every LOCK_REFRESH_SECONDS so a long load/save is never taken for one.
+    Raises LockTimeout when the lock stays taken for `timeout` seconds."""
+
+    def __init__(self, workbook_path, timeout=LOCK_TIMEOUT, stats=lock_stats):
+        self.path = lock_path(os.path.abspath(workbook_path))
+        self.timeout = timeout
+        self.stats = stats
+        self.token = None
+        self._refresh = None  # Set to stop the refresh thread
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def acquire(self):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.remove_stale():
+                    continue
+                waited = time.monotonic() - start
+                if waited >= self.timeout:
+                    self.stats.record_wait(waited, timed_out=True)
+                    raise LockTimeout(self.holder())
+                delay = LOCK_RETRY_DELAYS[min(attempt, len(LOCK_RETRY_DELAYS) - 1)]
+                time.sleep(min(delay, self.timeout - waited))
+                attempt += 1
+                continue
+            self.token = uuid.uuid4().hex
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "token": self.token,
+                        "user": getpass.getuser(),
+                        "host": socket.gethostname(),
+                        "pid": os.getpid(),
+                        "since": datetime.datetime.now().isoformat(timespec="seconds"),
+                    },
+                    f,
+                )
+            self.stats.record_wait(time.monotonic() - start)
+            self._refresh = threading.Event()
+            threading.Thread(
+                target=self._keep_fresh, args=(self.token, self._refresh), daemon=True
+            ).start()
+            return
+
+    def release(self):
+        if self._refresh is not None:
+            self._refresh.set()
+            self._refresh = None
+        # Only our own lock (it may have been removed as stale and retaken)
+        if self.token is not None and self.read().get("token") == self.token:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.token = None
+
+    def _keep_fresh(self, token, stop):
+        """Touch the lock until released (runs on its own thread)"""
+        while not stop.wait(LOCK_REFRESH_SECONDS):
+            if self.read().get("token") != token:
+                return  # Not ours any more
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return owner if isinstance(owner, dict) else {}
+
+    def holder(self):
+        owner = self.read()
+        return f"{owner.get('user', '?')}@{owner.get('host', '?')} ({owner.get('since', '?')})"
+
+    def remove_stale(self):
+        """Remove a lock left behind by a crashed save; True when removed
+        (or released meanwhile). Two waiters can see the same stale lock:
+        it is renamed away first, which only one of them manages, and only
+        deleted when the renamed file is still that old lock. A fresh lock
+        taken in between is put back."""
+        stale_token = self.read().get("token")
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return True  # Released meanwhile
+        if age < LOCK_STALE_SECONDS:
+            return False
+        broken = f"{self.path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(self.path, broken)
+        except OSError:
+            return True  # Broken or released by someone else
+        renamed_token = lock_token(broken)
+        try:
+            still_stale = time.time() - os.path.getmtime(broken) >= LOCK_STALE_SECONDS
+        except OSError:
+            still_stale = False
+        if renamed_token == stale_token and still_stale:
+            try:
+                os.remove(broken)
+            except OSError:
+                pass
+            return True
+        restore_lock(broken, self.path)
+        return False
+
+
+def lock_token(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            owner = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return owner.get("token") if isinstance(owner, dict) else None
+
+
+def restore_lock(broken, path):
+    """Put a lock renamed away by remove_stale back, unless a new lock was
+    taken meanwhile (os.link fails on an existing file; os.rename on POSIX
+    would replace it)"""
+    try:
+        os.link(broken, path)
+    except FileExistsError:
+        pass
+    except OSError:
+        # No hard links (some network shares): rename, checked beforehand
+        if not os.path.exists(path):
+            try:
+                os.rename(broken, path)
+            except OSError:
+                pass
+            return
+    try:
+        os.remove(broken)
+    except OSError:
+        pass
+
+
+# ==============================
+# Stale view detection / rebase
+# ==============================
+def workbook_fingerprint(source):
+    """Digest of the parts of an xlsx file (name, CRC-32 and size from the zip
+    directory, so only the end of the file is read). Catches a save that kept
+    the mtime and size (coarse mtimes of network shares); None when the file
+    is not a zip."""
+    try:
+        with zipfile.ZipFile(source) as zf:
+            digest = hashlib.sha1()
+            for info in zf.infolist():
+                digest.update(f"{info.filename}\0{info.CRC:08x}\0{info.file_size}\n".encode())
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return digest.hexdigest()
+
+
+def row_key(values):
+    """What identifies a row for rebasing: its display strings without
+    累計/№ (those change whenever rows above it change)"""
+    key = [v for col, v in enumerate(values) if col not in NUMBER_COLUMNS]
+    while key and key[-1] == "":
+        key.pop()
+    return tuple(key)
+
+
+def sheet_row_key(ws, row, width):
+    cells = ws._cells  # Reading must not create cells (ws.cell would)
+    return row_key(
+        [format_cell(getattr(cells.get((row, col)), "value", None), col - 1) for col in range(1, width + 1)]
+    )
+
+
+def find_row(ws, row, values, start_row):
+    """Row of the sheet that now shows `values` (display strings), searched
+    outwards from `row`; None when no row does"""
+    key = row_key(values)
+    width = len(values)
+    last = ws.max_row
+    for distance in range(0, max(row - start_row, last - row) + 1):
+        for candidate in (row - distance, row + distance) if distance else (row,):
+            if start_row <= candidate <= last and sheet_row_key(ws, candidate, width) == key:
+                return candidate
+    return None
+
+
+def rebase_rows(ws, start_row, expected, missing_ok=False):
+    """Current rows of the rows a change was made on. `expected` is
+    [(row, display values as shown then)]; a row whose data moved (rows
+    inserted or deleted above it by someone else) is found by its data.
+    Raises RebaseConflict when a row's data is gone, or with `missing_ok`
+    (deletes) leaves it out."""
+    rows = []
+    taken = set()
+    for row, values in expected:
+        found = find_row(ws, row, values, start_row)
+        if found in taken:
+            found = None  # Two identical rows; the other one was already matched
+            for candidate in range(start_row, ws.max_row + 1):
+                if candidate not in taken and sheet_row_key(ws, candidate, len(values)) == row_key(values):
+                    found = candidate
+                    break
+        if found is None:
+            if missing_ok:
+                continue
+            raise RebaseConflict(f"row {row} was changed or deleted by another user")
+        taken.add(found)
+        rows.append(found)
+    return rows
+
+
+def free_row(ws, row):
+    """Row an append made on `row` goes to: the same row while it is still
+    empty, else the row after the sheet's data (someone else appended)"""
+    last = ws.max_row
+    if row <= last and any(
+        getattr(ws._cells.get((row, col)), "value", None) not in (None, "")
+        for col in range(1, ws.max_column + 1)
+    ):
+        return last + 1
+    return min(row, last + 1)
@@ -2,7 +2,9 @@ import os, sys
 import tkinter as tk
 from tkinter import ttk
 from tabs.tab1_template import Tab1Template
-from tabs.tab2_entry import Tab2Entry
+
+# tabs.tab2_entry (and openpyxl, sqlite3 ... behind it) is imported when the
+# entry tab is first shown, so the window appears without waiting for it.
 
 
 def resource_path(relative_path: str) -> str:
@@ -40,9 +42,47 @@ class App(tk.Tk):
         tabControl.add(tab1, text="テンプレート生成")
         tabControl.add(tab2, text="不良品データ入力")
         tabControl.pack(expand=1, fill="both")
+        self.tabControl = tabControl
+        self.tab2 = tab2
 
         self.tab1_ui = Tab1Template(tab1, self)
-        self.tab2_ui = Tab2Entry(tab2, self)
+        self.tab2_ui = None  # Dibuat saat tab pertama kali dibuka (build_tab2)
+        tabControl.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        # Save changes left in journals by a previous session that did not exit cleanly
+        self.after_idle(self.replay_journals)
+
+        # Simpan data yang masih menunggu di journal sebelum keluar
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_tab_changed(self, event):
+        if self.tab2_ui is None and self.tabControl.select() == str(self.tab2):
+            self.build_tab2()
+
+    def build_tab2(self):
+        """Import and build the entry tab (the first time it is shown)"""
+        self.config(cursor="watch")
+        self.update_idletasks()
+        try:
+            from tabs.tab2_entry import Tab2Entry
+
+            self.tab2_ui = Tab2Entry(self.tab2, self)
+        finally:
+            self.config(cursor="")
+
+    def replay_journals(self):
+        # Journals are rare: the entry tab module is only imported when one is left
+        from journal import WriteJournal
+
+        journals = WriteJournal.leftovers()
+        if journals:
+            from tabs.tab2_entry import Tab2Entry
+
+            Tab2Entry.replay_journals(journals)
+
+    def on_close(self):
+        if self.tab2_ui is None or self.tab2_ui.close():
+            self.destroy()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,655 @@
+import re
+import sys
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+# Column indices: 0=発生月, 1=累計, 2=№, 3=発生日 (same layout as the Excel sheet)
+DATE_COLUMNS = (0, 3)  # Stored as date ordinals
+INT_COLUMNS = (1, 2)  # Stored as integers
+
+EMPTY_DATE = 0  # date.toordinal() is always >= 1
+EMPTY_INT = -(2**63)
+
+NGRAM_SIZE = 2  # Bigrams work well for Japanese text
+
+# Year-month-day with any of - / . 年月日 as separators, time part ignored
+LOOSE_DATE_RE = re.compile(r"\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})")
+
+
+def date_to_ordinal(text):
+    """Return the ordinal of a YYYY-MM-DD string, or None if it is not one"""
+    if len(text) != 10:
+        return None
+    try:
+        d = datetime.date.fromisoformat(text)
+    except ValueError:
+        return None
+    # fromisoformat also accepts other ISO forms; only keep exact round trips
+    return d.toordinal() if d.isoformat() == text else None
+
+
+def parse_loose_date(text):
+    """Ordinal of a date written year first in any common separator style
+    (2024-01-05, 2024/1/5, 2024.01.05, 2024年1月5日, with or without a time).
+    Returns None if no valid date is found."""
+    if not text:
+        return None
+    match = LOOSE_DATE_RE.match(text)
+    if not match:
+        return None
+    try:
+        return datetime.date(*map(int, match.groups())).toordinal()
+    except ValueError:
+        return None
+
+
+def text_to_int(text):
+    """Return the int value of a canonical integer string, or None"""
+    if not text or not text.lstrip("-").isdigit():
+        return None
+    try:
+        value = int(text)
+    except ValueError:
+        return None
+    if str(value) != text or not EMPTY_INT < value < 2**63:
+        return None
+    return value
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """Character n-grams of a text; texts shorter than n are their own gram"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def pack_array(values):
+    """array -> (typecode, itemsize, bytes), storable with marshal"""
+    return (values.typecode, values.itemsize, values.tobytes())
+
+
+def unpack_array(packed):
+    """Inverse of pack_array; ValueError when written on a platform with
+    another item size (the "l" typecode differs between Windows and Linux)"""
+    typecode, itemsize, data = packed
+    values = array(typecode)
+    if values.itemsize != itemsize:
+        raise ValueError(f"array item size {itemsize} != {values.itemsize}")
+    values.frombytes(data)
+    return values
+
+
+# ==============================
+# N-gram Index
+# ==============================
+class NgramIndex:
+    """Inverted n-gram index over the distinct values of each column.
+
+    Posting lists map a gram to the set of column values whose lowercase
+    display text contains it; a reference count per value keeps the index
+    correct when rows are added, changed or removed. Rows holding a matching
+    value are then found with a scan of that one column."""
+
+    __slots__ = ("counts", "postings")
+
+    def __init__(self):
+        self.counts = []  # per column: {value: number of rows}
+        self.postings = []  # per column: {gram: set of values}
+
+    def ensure_width(self, width):
+        while len(self.counts) < width:
+            self.counts.append({})
+            self.postings.append({})
+
+    def add(self, col, value, text, count=1):
+        counts = self.counts[col]
+        if value in counts:
+            counts[value] += count
+            return
+        counts[value] = count
+        postings = self.postings[col]
+        for gram in ngrams(text):
+            postings.setdefault(gram, set()).add(value)
+
+    def remove(self, col, value, text):
+        counts = self.counts[col]
+        if value not in counts:
+            return
+        counts[value] -= 1
+        if counts[value] > 0:
+            return
+        del counts[value]
+        postings = self.postings[col]
+        for gram in ngrams(text):
+            values = postings.get(gram)
+            if values is not None:
+                values.discard(value)
+                if not values:
+                    del postings[gram]
+
+    def candidates(self, col, term):
+        """Values of a column that may contain `term` (must still be verified)"""
+        if col >= len(self.counts):
+            return set()
+        postings = self.postings[col]
+        if len(term) < NGRAM_SIZE:
+            # Every value containing the term has a gram containing it
+            result = set()
+            for gram, values in postings.items():
+                if term in gram:
+                    result |= values
+            return result
+        lists = []
+        for gram in ngrams(term):
+            values = postings.get(gram)
+            if not values:
+                return set()
+            lists.append(values)
+        lists.sort(key=len)
+        result = set(lists[0])
+        for values in lists[1:]:
+            result &= values
+            if not result:
+                break
+        return result
+
+
+# ==============================
+# Date Index
+# ==============================
+class DateIndex:
+    """Row positions sorted by date ordinal, for bisect range queries"""
+
+    __slots__ = ("ordinals", "rows")
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.ordinals = array("l", (ordinal for ordinal, _ in pairs))
+        self.rows = array("l", (row for _, row in pairs))
+
+    def add(self, ordinal, row):
+        """Insert a row; appended rows with the latest date stay O(1)"""
+        position = bisect_right(self.ordinals, ordinal)
+        self.ordinals.insert(position, ordinal)
+        self.rows.insert(position, row)
+
+    def range(self, lo=None, hi=None):
+        """Rows with lo <= date <= hi (either bound may be None)"""
+        start = bisect_left(self.ordinals, lo) if lo is not None else 0
+        end = bisect_right(self.ordinals, hi) if hi is not None else len(self.ordinals)
+        return self.rows[start:end]
+
+
+# ==============================
+# Columnar Record Store
+# ==============================
+class RecordStore:
+    """Column-oriented storage for the formatted rows of a sheet.
+
+    発生月/発生日 are kept as date ordinals and 累計/№ as integers in
+    `array` columns; every other column is a list of interned strings.
+    Values that do not fit the column type are kept as text in a small
+    per-column fallback dict, so `store[i]` always returns exactly the display
+    strings the row was built from."""
+
+    __slots__ = (
+        "columns",
+        "kinds",
+        "fallback",
+        "lengths",
+        "lower_cache",
+        "index",
+        "version",
+        "date_indexes",
+    )
+
+    def __init__(self, rows=()):
+        self.columns = []
+        self.kinds = []
+        self.fallback = []  # per column: {row index: display text}
+        self.lengths = array("H")  # number of cells in each row
+        self.lower_cache = {}  # display text -> lowercase text
+        self.index = None  # NgramIndex, built on the first free-word search
+        self.version = 0  # Incremented on every change
+        self.date_indexes = {}  # column -> DateIndex, built on first date query
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, index):
+        """Display strings of one row (list, like the old all_data rows)"""
+        return [self.cell(index, col) for col in range(self.lengths[index])]
+
+    def __iter__(self):
+        for index in range(len(self.lengths)):
+            yield self[index]
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def memory_size(self):
+        """Approximate bytes held by the rows (the n-gram index not included)"""
+        size = self.lengths.itemsize * len(self.lengths)
+        for col, column in enumerate(self.columns):
+            if isinstance(column, array):
+                size += column.itemsize * len(column)
+            else:
+                # Interned strings are shared, so count every distinct one once
+                size += 8 * len(column) + sum(sys.getsizeof(t) for t in set(column))
+            size += sum(100 + sys.getsizeof(t) for t in self.fallback[col].values())
+        return size
+
+    # ------------------------------
+    # Building
+    # ------------------------------
+    def ensure_width(self, width):
+        """Add empty columns so that the store has at least `width` columns"""
+        count = len(self.lengths)
+        for col in range(len(self.columns), width):
+            if col in DATE_COLUMNS:
+                self.kinds.append("date")
+                self.columns.append(array("l", [EMPTY_DATE]) * count)
+            elif col in INT_COLUMNS:
+                self.kinds.append("int")
+                self.columns.append(array("q", [EMPTY_INT]) * count)
+            else:
+                self.kinds.append("text")
+                self.columns.append([""] * count)
+            self.fallback.append({})
+
+    def append(self, row):
+        """Append one row of display strings"""
+        index = len(self.lengths)
+        self.version += 1
+        self.ensure_width(len(row))
+        self.lengths.append(len(row))
+        for col, column in enumerate(self.columns):
+            text = str(row[col]) if col < len(row) and row[col] is not None else ""
+            self.store_value(col, column, index, text, append=True)
+        self.index_row(index)
+        for col, date_index in self.date_indexes.items():
+            ordinal = self.date_ordinal(index, col)
+            if ordinal is not None:
+                date_index.add(ordinal, index)
+
+    def extend(self, other):
+        """Append every row of another RecordStore"""
+        offset = len(self.lengths)
+        self.version += 1
+        self.date_indexes.clear()
+        self.ensure_width(other.width)
+        other.ensure_width(self.width)
+        for col, column in enumerate(self.columns):
+            column.extend(other.columns[col])
+            for index, text in other.fallback[col].items():
+                self.fallback[col][index + offset] = text
+        self.lengths.extend(other.lengths)
+        if self.index is not None:
+            for index in range(offset, len(self.lengths)):
+                self.index_row(index)
+
+    def set_row(self, index, row):
+        """Replace the display strings of one row"""
+        self.version += 1
+        self.date_indexes.clear()
+        self.index_row(index, remove=True)
+        self.ensure_width(len(row))
+        self.lengths[index] = len(row)
+        for col, column in enumerate(self.columns):
+            text = str(row[col]) if col < len(row) and row[col] is not None else ""
+            self.store_value(col, column, index, text)
+        self.index_row(index)
+
+    def delete_rows(self, indices):
+        """Remove rows; later rows move up like they do in the sheet"""
+        doomed = sorted(set(indices))
+        if not doomed:
+            return
+        self.version += 1
+        self.date_indexes.clear()
+        for index in doomed:
+            self.index_row(index, remove=True)
+
+        doomed_set = set(doomed)
+        many = len(doomed) > 64
+        for col, column in enumerate(self.columns):
+            if many:
+                kept = (v for i, v in enumerate(column) if i not in doomed_set)
+                column[:] = type(column)(column.typecode, kept) if isinstance(
+                    column, array
+                ) else list(kept)
+            else:
+                for index in reversed(doomed):
+                    del column[index]
+            self.fallback[col] = {
+                index - bisect_left(doomed, index): text
+                for index, text in self.fallback[col].items()
+                if index not in doomed_set
+            }
+        for index in reversed(doomed):
+            del self.lengths[index]
+
+    def insert_rows(self, index, rows):
+        """Insert rows of display strings before `index` (later rows move down)"""
+        rows = list(rows)
+        count = len(rows)
+        if not count:
+            return
+        self.version += 1
+        self.date_indexes.clear()
+        self.ensure_width(max(len(row) for row in rows))
+        # Empty rows first (not in the n-gram index), then filled by set_row
+        for col, column in enumerate(self.columns):
+            if isinstance(column, array):
+                empty = EMPTY_DATE if self.kinds[col] == "date" else EMPTY_INT
+                column[index:index] = array(column.typecode, [empty]) * count
+            else:
+                column[index:index] = [""] * count
+            self.fallback[col] = {
+                i + count if i >= index else i: text for i, text in self.fallback[col].items()
+            }
+        self.lengths[index:index] = array("H", [0]) * count
+        for offset, row in enumerate(rows):
+            self.set_row(index + offset, row)
+
+    def store_value(self, col, column, index, text, append=False):
+        kind = self.kinds[col]
+        self.fallback[col].pop(index, None)
+        if kind == "text":
+            value = sys.intern(text)
+        else:
+            if kind == "date":
+                value = date_to_ordinal(text) if text else None
+                empty = EMPTY_DATE
+            else:
+                value = text_to_int(text)
+                empty = EMPTY_INT
+            if value is None:
+                value = empty
+                if text:
+                    self.fallback[col][index] = sys.intern(text)
+        if append:
+            column.append(value)
+        else:
+            column[index] = value
+
+    # ------------------------------
+    # Serialization
+    # ------------------------------
+    def to_state(self):
+        """Rows as plain builtins (marshal-able), see from_state"""
+        return {
+            "kinds": list(self.kinds),
+            "columns": [
+                pack_array(column) if isinstance(column, array) else list(column)
+                for column in self.columns
+            ],
+            "fallback": [dict(fallback) for fallback in self.fallback],
+            "lengths": pack_array(self.lengths),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        store = cls()
+        store.kinds = list(state["kinds"])
+        store.columns = [
+            unpack_array(column) if kind != "text" else list(column)
+            for kind, column in zip(store.kinds, state["columns"])
+        ]
+        store.fallback = [dict(fallback) for fallback in state["fallback"]]
+        store.lengths = unpack_array(state["lengths"])
+        return store
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def cell(self, index, col):
+        """Display text of one cell"""
+        value = self.columns[col][index]
+        kind = self.kinds[col]
+        if kind == "text":
+            return value
+        if kind == "date" and value != EMPTY_DATE:
+            return datetime.date.fromordinal(value).isoformat()
+        if kind == "int" and value != EMPTY_INT:
+            return str(value)
+        return self.fallback[col].get(index, "")
+
+    def has_cell(self, index, col):
+        return col < self.lengths[index]
+
+    def lower(self, text):
+        lowered = self.lower_cache.get(text)
+        if lowered is None:
+            lowered = self.lower_cache[text] = text.lower()
+        return lowered
+
+    def value_text(self, col, value):
+        """Display text of a stored (typed) column value"""
+        kind = self.kinds[col]
+        if kind == "text":
+            return value
+        if kind == "date":
+            return datetime.date.fromordinal(value).isoformat() if value != EMPTY_DATE else ""
+        return str(value) if value != EMPTY_INT else ""
+
+    def build_index(self, attach=True):
+        """Build the n-gram index over all rows (kept up to date afterwards).
+        With attach=False the index is only returned; a worker thread can build
+        it and the owner thread hands it back through attach_index()."""
+        index = NgramIndex()
+        index.ensure_width(self.width)
+        for col, column in enumerate(self.columns):
+            for value, count in Counter(column).items():
+                text = self.value_text(col, value)
+                if text:
+                    index.add(col, value, self.lower(text), count)
+        if attach:
+            self.index = index
+        return index
+
+    def attach_index(self, index, version):
+        """Use an index built for `version`, unless the rows changed since"""
+        if self.index is None and self.version == version:
+            self.index = index
+
+    def index_row(self, index, remove=False):
+        if self.index is None:
+            return
+        self.index.ensure_width(self.width)
+        for col, column in enumerate(self.columns):
+            value = column[index]
+            text = self.value_text(col, value)
+            if not text:
+                continue
+            if remove:
+                self.index.remove(col, value, self.lower(text))
+            else:
+                self.index.add(col, value, self.lower(text))
+
+    def matching_values(self, col, term):
+        """Column values whose display text contains `term` (lowercase)"""
+        index = self.index if self.index is not None else self.build_index()
+        return {
+            value
+            for value in index.candidates(col, term)
+            if term in self.lower(self.value_text(col, value))
+        }
+
+    def distinct_text(self, col):
+        """Unique non-empty (stripped) values of a column"""
+        if col >= self.width:
+            return set()
+        if self.kinds[col] == "text":
+            values = set(self.columns[col])
+        else:
+            values = {self.cell(index, col) for index in range(len(self))}
+        return {value.strip() for value in values if value.strip()}
+
+    def display_len(self, col, indices):
+        """Longest display text of a column over the given rows"""
+        if col >= self.width:
+            return 0
+        column = self.columns[col]
+        fallback = self.fallback[col]
+        seen = set()
+        longest = 0
+        for index in indices:
+            if not self.has_cell(index, col):
+                continue
+            if index in fallback:
+                longest = max(longest, len(fallback[index]))
+            elif column[index] not in seen:
+                seen.add(column[index])
+                longest = max(longest, len(self.cell(index, col)))
+        return longest
+
+    # ------------------------------
+    # Filtering (each returns the subset of `indices` that matches)
+    # ------------------------------
+    def filter_contains(self, col, term, indices):
+        """Rows whose cell contains `term` (case-insensitive).
+        Rows that do not have this column at all are not excluded."""
+        return self.rows_containing([col], term, indices, keep_short_rows=True)
+
+    def filter_contains_any(self, term, indices):
+        """Rows where any cell contains `term` (case-insensitive)"""
+        return self.rows_containing(range(self.width), term, indices)
+
+    def rows_containing(self, cols, term, indices, keep_short_rows=False):
+        """Rows of `indices` where one of `cols` contains `term`.
+        Candidate values come from the n-gram index; only columns that hold a
+        matching value are scanned."""
+        term = term.lower()
+        if not term:
+            return list(indices)
+        matched = set()
+        for col in cols:
+            if col >= self.width:
+                if keep_short_rows:
+                    return list(indices)
+                continue
+            column = self.columns[col]
+            values = self.matching_values(col, term)
+            if values:
+                matched.update(i for i in indices if column[i] in values)
+            for index, text in self.fallback[col].items():
+                if term in self.lower(text):
+                    matched.add(index)
+            if keep_short_rows and min(self.lengths, default=col + 1) <= col:
+                matched.update(i for i in indices if self.lengths[i] <= col)
+        return [index for index in indices if index in matched]
+
+    def date_ordinal(self, index, col):
+        """Date of a cell as an ordinal; text dates in other formats are parsed"""
+        if not self.has_cell(index, col):
+            return None
+        value = self.columns[col][index]
+        if self.kinds[col] == "date" and value != EMPTY_DATE:
+            return value
+        return parse_loose_date(self.cell(index, col))
+
+    def date_index(self, col):
+        date_index = self.date_indexes.get(col)
+        if date_index is None:
+            pairs = []
+            if col < self.width:
+                for index in range(len(self)):
+                    ordinal = self.date_ordinal(index, col)
+                    if ordinal is not None:
+                        pairs.append((ordinal, index))
+            date_index = self.date_indexes[col] = DateIndex(pairs)
+        return date_index
+
+    def filter_date_range(self, col, date_from, date_to, indices):
+        """Rows whose date is within [date_from, date_to].
+        Resolved with a binary search on the sorted date index; rows without a
+        readable date never match a date range. If a bound itself is not a
+        date, fall back to comparing display text like before."""
+        lo = parse_loose_date(date_from) if date_from else None
+        hi = parse_loose_date(date_to) if date_to else None
+        if (date_from and lo is None) or (date_to and hi is None):
+            return self.filter_date_text(col, date_from, date_to, indices)
+
+        rows = self.date_index(col).range(lo, hi)
+        if isinstance(indices, range) and len(indices) == len(self):
+            return sorted(rows)
+        rows = set(rows)
+        return [index for index in indices if index in rows]
+
+    def filter_date_text(self, col, date_from, date_to, indices):
+        """Compare display strings of a date column with text bounds"""
+        result = []
+        for index in indices:
+            text = self.cell(index, col) if col < self.width and self.has_cell(index, col) else ""
+            if date_from and text < date_from:
+                continue
+            if date_to and text > date_to:
+                continue
+            result.append(index)
+        return result
+
+
+def diff_rows(old, new, key=None):
+    """Changes that turn the rows of `old` into those of `new` (both indexable
+    row lists, e.g. RecordStores), as a list of
+        ("set", index, row), ("insert", index, rows), ("delete", index, count)
+    to apply in order. Unchanged rows at both ends are skipped; the rows at the
+    end are matched by `key(row)` (e.g. without running numbers, so that a row
+    inserted by someone else is one insert plus renumbered rows below it, not
+    a rewrite of every row)."""
+    key = key or tuple
+    old_len, new_len = len(old), len(new)
+    shortest = min(old_len, new_len)
+    start = 0
+    while start < shortest and old[start] == new[start]:
+        start += 1
+    tail = 0
+    while tail < shortest - start and key(old[old_len - 1 - tail]) == key(new[new_len - 1 - tail]):
+        tail += 1
+
+    changes = []
+    old_mid, new_mid = old_len - tail - start, new_len - tail - start
+    common = min(old_mid, new_mid)
+    for index in range(start, start + common):
+        row = new[index]
+        if old[index] != row:
+            changes.append(("set", index, row))
+    if new_mid > common:
+        changes.append(("insert", start + common, [new[i] for i in range(start + common, start + new_mid)]))
+    elif old_mid > common:
+        changes.append(("delete", start + common, old_mid - common))
+    # Rows at the end matched by key may still differ (running numbers)
+    for offset in range(tail):
+        row = new[new_len - tail + offset]
+        if old[old_len - tail + offset] != row:
+            changes.append(("set", new_len - tail + offset, row))
+    return changes
+
+
+class RecordView:
+    """Read-only view of selected rows of a RecordStore (e.g. filter results)"""
+
+    __slots__ = ("store", "indices")
+
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, position):
+        return self.store[self.indices[position]]
+
+    def __iter__(self):
+        for index in self.indices:
+            yield self.store[index]
+
+    def display_len(self, col):
+        return self.store.display_len(col, self.indices)
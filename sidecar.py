@@ -0,0 +1,164 @@
+import os
+import marshal
+import hashlib
+import threading
+from excel_utils import get_config_dir, file_stat, NumberingIndex
+from record_store import RecordStore
+
+SIDECAR_DIRNAME = "sheet_cache"
+# Stored with every file; bump when parse_sheet output changes (formatting,
+# header detection...) so that older sidecars are parsed again
+SIDECAR_VERSION = 2
+SIDECAR_MAX_FILES = 64  # Oldest sidecars are removed beyond this
+
+_write_lock = threading.Lock()
+
+
+def sidecar_dir():
+    return get_config_dir() / SIDECAR_DIRNAME
+
+
+def sidecar_path(workbook_path, sheet, directory=None):
+    """Sidecar file of one sheet of a workbook; sheet None holds the names of
+    its sheets (so a reopened file finds its first sheet)"""
+    key = os.path.normcase(os.path.abspath(workbook_path)) + "\0"
+    key += sheet if sheet is not None else "\0"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".cache"
+    return os.path.join(directory or sidecar_dir(), name)
+
+
+# ==============================
+# Sidecar row cache
+# ==============================
+def encode_sidecar(workbook_path, sheet_data):
+    """Serialize a parse_sheet result for write_sidecar.
+    Returns [(sidecar path, bytes)] for the sheet and the sheet names, or []
+    when the data cannot be stored. Runs on the UI thread because the rows are
+    shared with the preview; writing can then happen anywhere."""
+    numbering = sheet_data["numbering"]
+    if numbering is not None and numbering["month"] is not None:
+        if type(numbering["month"]) not in (int, float, str):
+            numbering = None  # Adding a row then takes the full save path
+    index = sheet_data["numbering_index"]
+    index_state = index.to_state() if index is not None else None
+    stat = list(sheet_data["stat"])
+    record = {
+        "version": SIDECAR_VERSION,
+        "stat": stat,
+        "fingerprint": sheet_data.get("fingerprint"),
+        "sheet": sheet_data["sheet"],
+        "sheet_names": list(sheet_data["sheet_names"]),
+        "headers": list(sheet_data["headers"]),
+        "header_row": sheet_data["header_row"],
+        "data_start_row": sheet_data["data_start_row"],
+        "total_rows": sheet_data["total_rows"],
+        "widths": list(sheet_data["widths"]),
+        "rows": sheet_data["rows"].to_state(),
+        "numbering": dict(numbering) if numbering is not None else None,
+        "numbering_index": index_state,
+    }
+    names = {
+        "version": SIDECAR_VERSION,
+        "stat": stat,
+        "sheet_names": list(sheet_data["sheet_names"]),
+    }
+    try:
+        return [
+            (sidecar_path(workbook_path, sheet_data["sheet"]), marshal.dumps(record)),
+            (sidecar_path(workbook_path, None), marshal.dumps(names)),
+        ]
+    except ValueError:
+        return []  # A header or cell of a type marshal does not support
+
+
+def write_sidecar(encoded):
+    """Write the files made by encode_sidecar (safe on a worker thread)"""
+    with _write_lock:
+        for path, data in encoded:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        if encoded:
+            prune_sidecars(os.path.dirname(encoded[0][0]))
+
+
+def prune_sidecars(directory, max_files=SIDECAR_MAX_FILES):
+    """Remove the least recently written sidecars beyond `max_files`"""
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(".cache"):
+            path = os.path.join(directory, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    files.sort(reverse=True)
+    for _, path in files[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_sidecar(workbook_path, sheet, directory=None):
+    """Stored record of a sheet (or the sheet names, sheet None) when the
+    workbook still has the mtime and size it was parsed with; else None"""
+    path = sidecar_path(workbook_path, sheet, directory)
+    try:
+        stat = file_stat(workbook_path)
+        with open(path, "rb") as f:
+            record = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (
+        not isinstance(record, dict)
+        or record.get("version") != SIDECAR_VERSION
+        or tuple(record.get("stat") or ()) != stat
+    ):
+        # Workbook saved since, or written by another version of the app
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return record
+
+
+def load_sidecar(workbook_path, sheet, directory=None):
+    """parse_sheet result of an unchanged workbook from its sidecar, or None.
+    With sheet None the first sheet is looked up."""
+    if sheet is None:
+        names = read_sidecar(workbook_path, None, directory)
+        if names is None or not names["sheet_names"]:
+            return None
+        sheet = names["sheet_names"][0]
+    record = read_sidecar(workbook_path, sheet, directory)
+    if record is None:
+        return None
+    try:
+        rows = RecordStore.from_state(record["rows"])
+        index = record["numbering_index"]
+        if index is not None:
+            index = NumberingIndex.from_state(index)
+            if index.path != os.path.abspath(workbook_path):
+                index = None
+    except (KeyError, TypeError, ValueError):
+        return None
+    stat = tuple(record["stat"])
+    return {
+        "sheet": record["sheet"],
+        "sheet_names": record["sheet_names"],
+        "headers": record["headers"],
+        "header_row": record["header_row"],
+        "data_start_row": record["data_start_row"],
+        "total_rows": record["total_rows"],
+        "widths": record["widths"],
+        "rows": rows,
+        "cancelled": False,
+        "numbering": record["numbering"],
+        "stat": stat,
+        "fingerprint": record.get("fingerprint"),
+        "numbering_index": index,
+    }
@@ -1,8 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-import os, datetime, calendar, subprocess
-from openpyxl import load_workbook
-from excel_utils import ExcelHistoryManager, to_display_path, to_real_path, normalize_path, is_valid_path, format_excel_date, format_number
+import os, datetime, itertools, queue, threading, time
+from tabs.virtual_tree import VirtualTreeview, ROW_SELECT_EVENT
+from record_store import RecordStore, RecordView, parse_loose_date, text_to_int, diff_rows
+from excel_utils import ExcelHistoryManager, to_display_path, to_real_path, normalize_path, is_valid_path, format_excel_date, format_cell
+from excel_utils import path_checker, history_probe
+from excel_utils import new_numbering, advance_numbering, append_sheet_row, XlsxPatchError
+from excel_utils import renumber_sheet, write_row_values, NumberingIndex, SheetCache
+from excel_utils import read_sheet_names, LEDGER_HEADERS, LEDGER_HEADER_ROW, LEDGER_DATA_ROW
+from excel_utils import write_ledger_xlsx, write_cell_values, changes_numbering, file_stat
+from excel_utils import delete_sheet_rows, month_key, DATE_TEXT_LENGTHS
+from ledger_lock import LedgerLock, LockTimeout, RebaseConflict, lock_stats, rebase_rows, workbook_fingerprint
+from ledger_lock import row_key
+from journal import WriteJournal, apply_entries, append_entries
+from sidecar import load_sidecar, encode_sidecar, write_sidecar
+from ledger_db import LedgerDB, LEDGER_DB_SUFFIX, LEDGER_SHEET, is_ledger_db
+from ledger_db import LedgerDBNetworkPath, LedgerDBInUse, is_network_path
+from bulk_import import BulkImport, AUTO_COLUMNS
 
 
 # ==============================
@@ -80,8 +94,83 @@ JP_LABELS = {
     "weekday_sun": "日",
     "filter_data": "データフィルタ",
     "date_range": "発生日:",
+    "loading": "読み込み中... {count} 行",
+    "load_cancel": "中止",
+    "load_cancelled": "読み込みを中止しました ({count} 行)",
+    "live_filter": "ライブフィルタ（入力中に適用）",
+    "filter_result_count": "フィルタ結果 ({count} 件)",
+    "pending_writes": "保存待ち {count} 件",
+    "pending_failed": "保存待ち {count} 件（保存失敗・再試行します）",
+    "flush_failed": "保存待ちのデータを保存できませんでした:",
+    "changes_conflicted": "{count} 件の変更は、対象の行が他のユーザーに変更・削除されていたため保存されませんでした。\n最新のデータを再読み込みしました。",
+    "ledger_locked": "他のユーザーが保存中です: {holder}\nしばらくしてから再試行してください。",
+    "row_conflict": "この行は他のユーザーに変更・削除されています。最新のデータを再読み込みしました。",
+    "watch_patched": "他のユーザーの保存を反映しました（{count} 行）",
+    "lock_stats": "保存 {saves} 回・ロック待ち 平均 {wait_avg:.0f}ms / 最大 {wait_max:.0f}ms・競合 {conflicts} 件 ({rate:.0%})",
+    "journal_replayed": "前回保存されなかった {count} 件のデータをExcelに保存しました。",
+    "exit_unsaved": "{count} 件のデータをExcelに保存できませんでした。\n次回起動時に保存を再試行します。終了しますか？",
+    "import_db": "DBに変換",
+    "export_excel": "Excel出力",
+    "ledger_files": "Excel / 台帳DB",
+    "ledger_db_files": "台帳DB",
+    "imported_ok": "{count} 件のデータを台帳DBに変換しました:\n{path}",
+    "exported_ok": "Excelファイルを出力しました:\n{path}",
+    "error_import_db": "台帳DBへの変換エラー:",
+    "error_export_excel": "Excel出力エラー:",
+    "db_network_path": "台帳DBはこのPCのローカルディスク専用です。共有ドライブ上の台帳DBは開けません:\n{path}\n共有する場合はExcel台帳を使用してください。",
+    "db_in_use": "この台帳DBは他のアプリで開かれています（台帳DBは1人専用です）:\n{path}",
+    "no_data_export": "出力するデータがありません。",
+    "export_same_file": "開いている台帳と同じファイルには出力できません。",
+    "bulk_import": "一括取込",
+    "bulk_import_title": "一括取込: {name}",
+    "import_files": "CSV / Excel",
+    "column_mapping": "列の対応",
+    "not_imported": "(取込なし)",
+    "dry_run": "確認（ドライラン）",
+    "run_import": "取込実行",
+    "import_summary": "取込可能 {ok} 件 / エラー {errors} 件 / 空行 {skipped} 件 ({rate:,.0f} 行/秒)",
+    "import_errors": "エラー行（取込されません）",
+    "import_line": "{line}行目: {message}",
+    "confirm_import": "{count} 件のデータを追加しますか？",
+    "bulk_imported_ok": "{count} 件のデータを追加しました ({seconds:.1f} 秒, {rate:,.0f} 行/秒)。",
+    "error_bulk_import": "一括取込エラー:",
+    "batch_edit": "一括編集",
+    "batch_edit_title": "一括編集 ({count} 件)",
+    "batch_edit_hint": "チェックした項目を選択中の全行に設定します（空欄はクリア）。",
+    "apply": "適用",
+    "pick_field_first": "変更する項目をチェックしてください。",
+    "batch_updated_ok": "{count} 件のデータを更新しました。",
 }
 
+# Background loading: rows per batch handed to the UI, poll interval (ms)
+# and batches inserted per poll
+LOAD_BATCH_SIZE = 500
+LOAD_POLL_MS = 30
+LOAD_BATCHES_PER_TICK = 4
+INDEX_POLL_MS = 200
+
+# Write-behind: save journaled changes after this much idle time (ms), but no
+# later than FLUSH_MAX_DELAY_MS after the oldest unsaved change
+FLUSH_IDLE_MS = 3000
+FLUSH_MAX_DELAY_MS = 15000
+FLUSH_POLL_MS = 100
+
+# Watcher: how often the shown file is checked for saves by other users (ms;
+# one os.stat, cheap on network shares too) and how often a re-read is polled
+WATCH_INTERVAL_MS = 5000
+WATCH_POLL_MS = 100
+
+# How often a running 不良発生連絡書発行 path check is polled (ms)
+PATH_CHECK_POLL_MS = 50
+
+# Excel history: files whose existence is not known after this long (ms) are
+# marked as not responding (the mark is replaced when the answer comes)
+HISTORY_PROBE_TIMEOUT_MS = 3000
+HISTORY_POLL_MS = 100
+
+# Live filter: wait this long (ms) after the last keystroke before filtering
+LIVE_FILTER_DELAY_MS = 250
+
 
 # ==============================
 # Simple DatePicker
@@ -130,6 +219,8 @@ class DatePicker(tk.Toplevel):
         self.update_cal()
 
     def update_cal(self):
+        import calendar
+
         self.lbl.config(text=f"{self.current_year}-{self.current_month:02d}")
         for r in range(6):
             for c in range(7):
@@ -260,6 +351,8 @@ class FilterDialog(tk.Toplevel):
         super().__init__(parent)
         self.callback = callback
         self.unique_data = unique_data
+        self.live_var = tk.BooleanVar(value=True)  # Filter while typing
+        self._live_job = None
         self.title(JP_LABELS["filter_data"])
         self.geometry("700x600")
         self.transient(parent)
@@ -380,6 +473,33 @@ class FilterDialog(tk.Toplevel):
         self.entry_free_search = tk.Entry(scrollable_frame, width=30)
         self.entry_free_search.grid(row=9, column=1, sticky="ew", pady=5)
 
+        # Live filter: apply (debounced) while the fields are edited
+        tk.Checkbutton(
+            scrollable_frame, text=JP_LABELS["live_filter"], variable=self.live_var
+        ).grid(row=10, column=0, columnspan=2, sticky="w", pady=(10, 0))
+
+        for widget in (
+            self.entry_date_from,
+            self.entry_date_to,
+            self.cbo_koumoku,
+            self.cbo_jishou,
+            self.cbo_ichiji,
+            self.cbo_niji,
+            self.entry_hinban,
+            self.cbo_supplier,
+            self.entry_furyo_no,
+            self.entry_free_search,
+        ):
+            widget.bind("<KeyRelease>", self.schedule_live_filter, add="+")
+        for cbo in (
+            self.cbo_koumoku,
+            self.cbo_jishou,
+            self.cbo_ichiji,
+            self.cbo_niji,
+            self.cbo_supplier,
+        ):
+            cbo.bind("<<ComboboxSelected>>", self.schedule_live_filter, add="+")
+
         scrollable_frame.grid_columnconfigure(1, weight=1)
 
         # Pack canvas and scrollbar
@@ -426,9 +546,29 @@ class FilterDialog(tk.Toplevel):
         def cb(val):
             entry.delete(0, tk.END)
             entry.insert(0, val)
+            self.schedule_live_filter()
 
         return cb
 
+    def schedule_live_filter(self, event=None):
+        """Apply the filter shortly after the last edit (live mode only)"""
+        self.cancel_live_filter()
+        if self.live_var.get():
+            self._live_job = self.after(LIVE_FILTER_DELAY_MS, self.apply_live_filter)
+
+    def cancel_live_filter(self):
+        if self._live_job is not None:
+            self.after_cancel(self._live_job)
+            self._live_job = None
+
+    def apply_live_filter(self):
+        self._live_job = None
+        self.callback(self.get_filters(), live=True)
+
+    def destroy(self):
+        self.cancel_live_filter()
+        super().destroy()
+
     def clear_filter(self):
         self.entry_date_from.delete(0, tk.END)
         self.entry_date_to.delete(0, tk.END)
@@ -440,9 +580,10 @@ class FilterDialog(tk.Toplevel):
         self.cbo_supplier.set("")
         self.entry_furyo_no.delete(0, tk.END)
         self.entry_free_search.delete(0, tk.END)
+        self.schedule_live_filter()
 
-    def apply_filter(self):
-        filters = {
+    def get_filters(self):
+        return {
             "date_from": self.entry_date_from.get().strip(),
             "date_to": self.entry_date_to.get().strip(),
             "koumoku": self.cbo_koumoku.get().strip(),
@@ -454,7 +595,10 @@ class FilterDialog(tk.Toplevel):
             "furyo_no": self.entry_furyo_no.get().strip(),
             "free_search": self.entry_free_search.get().strip(),
         }
-        self.callback(filters)
+
+    def apply_filter(self):
+        self.cancel_live_filter()
+        self.callback(self.get_filters())
         self.destroy()
 
 
@@ -528,28 +672,57 @@ class ExcelHistoryDialog(tk.Toplevel):
         self.geometry(f"+{x}+{y}")
 
     def load_history(self):
-        """Load history items into listbox"""
+        """Load history items into listbox. Whether each file exists is
+        probed on history_probe's threads (an offline share can take long to
+        answer); the marks are filled in by update_marks as answers come."""
         self.listbox.delete(0, tk.END)
         items = self.history_manager.items()
+        self.probes = []
 
         if not items:
             self.listbox.insert(tk.END, "（履歴がありません）")
             return
 
+        self.probe_deadline = time.monotonic() + HISTORY_PROBE_TIMEOUT_MS / 1000
         for i, path in enumerate(items):
-            # Show filename and path
-            filename = os.path.basename(path)
-            display_text = f"{i+1}. {filename}"
-
-            # Check if file exists
-            if not os.path.exists(path):
-                display_text += " (ファイルが見つかりません)"
-
-            self.listbox.insert(tk.END, display_text)
+            probe = history_probe.submit(path)
+            self.probes.append(probe)
+            self.listbox.insert(tk.END, self.history_text(i, path, probe))
 
             # Store full path as data
             self.listbox.insert(tk.END, f"   📁 {path}")
 
+        if not all(probe.done() for probe in self.probes):
+            self.after(HISTORY_POLL_MS, self.update_marks, self.probes)
+
+    def history_text(self, i, path, probe):
+        # Show filename and whether it exists
+        display_text = f"{i+1}. {os.path.basename(path)}"
+        if not probe.done():
+            if time.monotonic() < self.probe_deadline:
+                display_text += " (確認中...)"
+            else:
+                display_text += " (応答がありません)"
+        elif not probe.result():
+            display_text += " (ファイルが見つかりません)"
+        return display_text
+
+    def update_marks(self, probes):
+        """Refresh the marks of the history lines whose probe answered"""
+        if probes is not self.probes or not self.winfo_exists():
+            return  # List reloaded or dialog closed
+        items = self.history_manager.items()
+        selected = set(self.listbox.curselection())
+        for i, (path, probe) in enumerate(zip(items, probes)):
+            text = self.history_text(i, path, probe)
+            if self.listbox.get(2 * i) != text:
+                self.listbox.delete(2 * i)
+                self.listbox.insert(2 * i, text)
+                if 2 * i in selected:
+                    self.listbox.selection_set(2 * i)
+        if not all(probe.done() for probe in probes):
+            self.after(HISTORY_POLL_MS, self.update_marks, probes)
+
     def on_double_click(self, event):
         """Handle double click on listbox item"""
         self.open_selected()
@@ -576,8 +749,8 @@ class ExcelHistoryDialog(tk.Toplevel):
 
         file_path = items[file_idx]
 
-        # Check if file exists
-        if not os.path.exists(file_path):
+        # Check if file exists (again, unless the probe found it)
+        if history_probe.cached(file_path) is not True and not os.path.exists(file_path):
             response = messagebox.askyesno(
                 "ファイルが見つかりません",
                 f"ファイルが見つかりません：\n{file_path}\n\n履歴から削除しますか？",
@@ -624,6 +797,223 @@ class ExcelHistoryDialog(tk.Toplevel):
             self.load_history()
 
 
+# ==============================
+# Bulk Import Dialog
+# ==============================
+class BulkImportDialog(tk.Toplevel):
+    """Column mapping and dry run of a BulkImport; `callback` gets the
+    checked BulkImport when the import is confirmed"""
+
+    def __init__(self, parent, callback, bulk):
+        super().__init__(parent)
+        self.callback = callback
+        self.bulk = bulk
+        self.title(JP_LABELS["bulk_import_title"].format(name=os.path.basename(bulk.path)))
+        self.geometry("900x600")
+        self.transient(parent)
+        self.grab_set()
+        self.build_ui()
+        self.dry_run()
+
+    def build_ui(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        # Ledger column -> source column
+        sec_map = tk.LabelFrame(main_frame, text=JP_LABELS["column_mapping"], padx=8, pady=8)
+        sec_map.pack(fill="x")
+        self.choices = [JP_LABELS["not_imported"]] + [
+            f"{i + 1}: {h}" for i, h in enumerate(self.bulk.headers)
+        ]
+        self.cbo_mapping = []
+        for col, header in enumerate(LEDGER_HEADERS):
+            r, c = divmod(col, 3)
+            tk.Label(sec_map, text=header, anchor="w", width=16).grid(
+                row=r, column=c * 2, sticky="w", pady=2
+            )
+            cbo = ttk.Combobox(sec_map, values=self.choices, width=22, state="readonly")
+            source_col = self.bulk.mapping[col]
+            if col in AUTO_COLUMNS:
+                cbo.set(JP_LABELS["auto"])
+                cbo.config(state="disabled")
+            else:
+                cbo.current(0 if source_col is None else source_col + 1)
+            cbo.grid(row=r, column=c * 2 + 1, sticky="w", padx=(0, 12), pady=2)
+            self.cbo_mapping.append(cbo)
+
+        self.lbl_summary = tk.Label(main_frame, text="", anchor="w", font=("Arial", 9, "bold"))
+        self.lbl_summary.pack(fill="x", pady=(8, 4))
+
+        # Normalized rows as they will be appended
+        preview_frame = tk.Frame(main_frame)
+        preview_frame.pack(fill="both", expand=True)
+        self.preview = ttk.Treeview(
+            preview_frame, columns=LEDGER_HEADERS, show="headings", height=10
+        )
+        for header in LEDGER_HEADERS:
+            self.preview.heading(header, text=header)
+            self.preview.column(header, width=90, stretch=False)
+        yscroll = ttk.Scrollbar(preview_frame, orient="vertical", command=self.preview.yview)
+        xscroll = ttk.Scrollbar(preview_frame, orient="horizontal", command=self.preview.xview)
+        self.preview.configure(yscrollcommand=yscroll.set, xscrollcommand=xscroll.set)
+        self.preview.grid(row=0, column=0, sticky="nsew")
+        yscroll.grid(row=0, column=1, sticky="ns")
+        xscroll.grid(row=1, column=0, sticky="ew")
+        preview_frame.rowconfigure(0, weight=1)
+        preview_frame.columnconfigure(0, weight=1)
+
+        tk.Label(main_frame, text=JP_LABELS["import_errors"], anchor="w").pack(
+            fill="x", pady=(8, 0)
+        )
+        self.lst_errors = tk.Listbox(main_frame, height=5, font=("Arial", 9), fg="#721c24")
+        self.lst_errors.pack(fill="x")
+
+        btn_frame = tk.Frame(main_frame)
+        btn_frame.pack(fill="x", pady=(10, 0))
+        tk.Button(
+            btn_frame, text=JP_LABELS["dry_run"], command=self.dry_run, width=16, bg="#e2e3e5"
+        ).pack(side="left")
+        self.btn_run = tk.Button(
+            btn_frame, text=JP_LABELS["run_import"], command=self.run_import, width=12, bg="#d4edda"
+        )
+        self.btn_run.pack(side="left", padx=6)
+        tk.Button(
+            btn_frame, text=JP_LABELS["cancel"], command=self.destroy, width=10, bg="#f8d7da"
+        ).pack(side="right")
+
+        self.center_window()
+
+    def center_window(self):
+        self.update_idletasks()
+        x = (self.winfo_screenwidth() // 2) - (self.winfo_width() // 2)
+        y = (self.winfo_screenheight() // 2) - (self.winfo_height() // 2)
+        self.geometry(f"+{x}+{y}")
+
+    def get_mapping(self):
+        """Source column of every ledger column from the comboboxes"""
+        mapping = []
+        for col, cbo in enumerate(self.cbo_mapping):
+            index = self.choices.index(cbo.get()) if col not in AUTO_COLUMNS else 0
+            mapping.append(index - 1 if index > 0 else None)
+        return mapping
+
+    def dry_run(self):
+        """Validate every row with the current mapping; nothing is written"""
+        bulk = self.bulk
+        bulk.check(self.get_mapping())
+        self.lbl_summary.config(
+            text=JP_LABELS["import_summary"].format(
+                ok=len(bulk.rows), errors=len(bulk.errors), skipped=bulk.skipped, rate=bulk.rate()
+            )
+        )
+        self.preview.delete(*self.preview.get_children())
+        for values in bulk.preview():
+            self.preview.insert("", "end", values=["" if v is None else v for v in values])
+        self.lst_errors.delete(0, tk.END)
+        for line, message in bulk.errors[:500]:
+            self.lst_errors.insert(
+                tk.END, JP_LABELS["import_line"].format(line=line, message=message)
+            )
+        self.btn_run.config(state="normal" if bulk.rows else "disabled")
+
+    def run_import(self):
+        if self.bulk.mapping != self.get_mapping():
+            self.dry_run()  # Mapping changed since the last check
+        count = len(self.bulk.rows)
+        if not count or not messagebox.askyesno(
+            JP_LABELS["confirm"], JP_LABELS["confirm_import"].format(count=count), parent=self
+        ):
+            return
+        self.destroy()
+        self.callback(self.bulk)
+
+
+# ==============================
+# Batch Edit Dialog
+# ==============================
+# Columns a batch edit can set (累計/№ are always numbered) and their labels
+BATCH_EDIT_COLUMNS = [
+    (0, "hassei_month"),
+    (3, "hassei_date"),
+    (4, "koumoku"),
+    (5, "jishou"),
+    (6, "ichiji"),
+    (7, "niji"),
+    (8, "hinban"),
+    (9, "supplier"),
+    (10, "renrakusho"),
+    (11, "furyo_no"),
+]
+
+
+class BatchEditDialog(tk.Toplevel):
+    """Fields to set on all selected rows; `callback` gets {column index:
+    value} of the checked fields (None for a field left empty)"""
+
+    def __init__(self, parent, callback, count, choices):
+        super().__init__(parent)
+        self.callback = callback
+        self.choices = choices  # column index -> combobox values
+        self.title(JP_LABELS["batch_edit_title"].format(count=count))
+        self.transient(parent)
+        self.grab_set()
+        self.build_ui()
+
+    def build_ui(self):
+        main_frame = tk.Frame(self, padx=20, pady=20)
+        main_frame.pack(fill="both", expand=True)
+        tk.Label(main_frame, text=JP_LABELS["batch_edit_hint"], anchor="w").grid(
+            row=0, column=0, columnspan=2, sticky="w", pady=(0, 10)
+        )
+
+        self.fields = []
+        for r, (col, label) in enumerate(BATCH_EDIT_COLUMNS, start=1):
+            var = tk.BooleanVar(value=False)
+            tk.Checkbutton(main_frame, text=JP_LABELS[label], variable=var, anchor="w").grid(
+                row=r, column=0, sticky="w", pady=2
+            )
+            if col in self.choices:
+                widget = ttk.Combobox(main_frame, values=self.choices[col], width=30)
+                widget.bind("<<ComboboxSelected>>", lambda e, v=var: v.set(True))
+            else:
+                widget = tk.Entry(main_frame, width=32)
+            # Typing in a field checks it
+            widget.bind("<Key>", lambda e, v=var: v.set(True))
+            widget.grid(row=r, column=1, sticky="ew", pady=2)
+            self.fields.append((col, var, widget))
+
+        btn_frame = tk.Frame(main_frame)
+        btn_frame.grid(row=len(BATCH_EDIT_COLUMNS) + 1, column=0, columnspan=2, pady=(12, 0))
+        tk.Button(
+            btn_frame, text=JP_LABELS["apply"], command=self.apply, width=10, bg="#fff3cd"
+        ).pack(side="left", padx=(0, 10))
+        tk.Button(
+            btn_frame, text=JP_LABELS["cancel"], command=self.destroy, width=10, bg="#f8d7da"
+        ).pack(side="left")
+
+        self.center_window()
+
+    def center_window(self):
+        self.update_idletasks()
+        x = (self.winfo_screenwidth() // 2) - (self.winfo_width() // 2)
+        y = (self.winfo_screenheight() // 2) - (self.winfo_height() // 2)
+        self.geometry(f"+{x}+{y}")
+
+    def apply(self):
+        cells = {}
+        for col, var, widget in self.fields:
+            if var.get():
+                value = widget.get().strip()
+                if col == 10:
+                    value = to_real_path(value)
+                cells[col] = value or None
+        if not cells:
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_field_first"], parent=self)
+            return
+        self.destroy()
+        self.callback(cells)
+
+
 # ==============================
 # Tab2Entry (Master-Detail Layout with Filter)
 # ==============================
@@ -636,10 +1026,10 @@ class Tab2Entry:
             return
 
         try:
-            item_id = sel[0]
-            vals = self.tree.item(item_id, "values")
+            index = sel[0]
+            vals = self.tree.row_values(index)
             base = self.data_start_row if self.data_start_row else 2
-            self.selected_row = self.tree.index(item_id) + base
+            self.selected_row = index + base
             self.fill_form_with_data(vals)
             self.update_button_states()
         except Exception as e:
@@ -653,10 +1043,28 @@ class Tab2Entry:
         self.selected_sheet = None
         self.selected_row = None  # Excel row index
         self.history_manager = ExcelHistoryManager()  # Initialize history manager
-        self.all_data = []  # Store all Excel data for filtering
+        self.all_data = RecordStore()  # Store all Excel data for filtering
         self.header_row = None  # Dynamic header row detection
         self.data_start_row = None  # Dynamic data start row
         self.is_filter_mode = False  # Track if we're in filter mode
+        self.last_filter = None  # Previous filter and its result, for refinement
+        self.background_loading = True  # Parse workbooks on a worker thread
+        self._loader = None  # State of the running background load
+        self.sheet_cache = SheetCache()  # Parsed sheets of unchanged files
+        self.sidecar_cache = True  # Also keep them on disk for the next start
+        self.ledger_db = None  # LedgerDB when the chosen ledger is a database
+        self.numbering = None  # 累計/№ state after the last loaded row
+        self.numbering_index = None  # 累計/№ state after every row of the file
+        self.loaded_stat = None  # (mtime_ns, size) of the file all_data was read from
+        self.loaded_fingerprint = None  # Its workbook_fingerprint (None: unknown)
+        self.preview_numbered = False  # 累計/№ shown in all_data are in sequence
+        self.write_behind = True  # Journal CRUD changes and save them in batches
+        self.journal = None  # WriteJournal of the current workbook
+        self._flush = None  # Running save of journaled changes
+        self._flush_job = None  # after() id of the next scheduled save
+        self._first_pending = None  # time.monotonic() of the oldest unsaved change
+        self.flush_error = None  # Last failed save, retried on the next flush
+        self._watch = None  # Running re-read of a file saved by someone else
 
         # Root containers: left (form) and right (preview)
         root = tk.Frame(parent)
@@ -690,6 +1098,22 @@ class Tab2Entry:
         )
         self.btn_history.pack(side="left", padx=2)
 
+        # Storage: convert an Excel ledger to a database, export a database
+        db_row = tk.Frame(sec_file)
+        db_row.pack(fill="x", pady=(0, 5))
+        self.btn_import_db = tk.Button(
+            db_row, text=JP_LABELS["import_db"], command=self.import_ledger_db
+        )
+        self.btn_import_db.pack(side="left")
+        self.btn_export_excel = tk.Button(
+            db_row, text=JP_LABELS["export_excel"], command=self.export_excel
+        )
+        self.btn_export_excel.pack(side="left", padx=4)
+        self.btn_bulk_import = tk.Button(
+            db_row, text=JP_LABELS["bulk_import"], command=self.bulk_import
+        )
+        self.btn_bulk_import.pack(side="left")
+
         # Sheet selection row
         sheet_row = tk.Frame(sec_file)
         sheet_row.pack(fill="x")
@@ -908,6 +1332,10 @@ class Tab2Entry:
             sec_actions, text=JP_LABELS["clear"], command=self.clear_form
         )
         self.btn_clear.pack(side="left", padx=6)
+        self.btn_batch_edit = tk.Button(
+            sec_actions, text=JP_LABELS["batch_edit"], command=self.batch_edit, bg="#fff3cd"
+        )
+        self.btn_batch_edit.pack(side="left")
         self.btn_filter = tk.Button(
             sec_actions,
             text=JP_LABELS["filter"],
@@ -915,10 +1343,22 @@ class Tab2Entry:
             bg="#e2e3e5",
         )
         self.btn_filter.pack(side="left", padx=6)
+        # Changes waiting in the journal (write-behind mode)
+        self.lbl_pending = tk.Label(sec_actions, text="", fg="#856404")
+        self.lbl_pending.pack(side="left", padx=6)
+        # Saves of this session: lock wait and files saved by others meanwhile
+        self.lbl_lock_stats = tk.Label(sec_actions, text="", fg="#6c757d")
+        self.lbl_lock_stats.pack(side="left", padx=6)
 
         # Store UI elements for enable/disable
         self.ui_elements = {
-            "file_section": [self.btn_choose_file, self.cbo_sheet],
+            "file_section": [
+                self.btn_choose_file,
+                self.cbo_sheet,
+                self.btn_import_db,
+                self.btn_export_excel,
+                self.btn_bulk_import,
+            ],
             "form_section": [
                 self.entry_hassei_month,
                 self.btn_cal1,
@@ -938,6 +1378,7 @@ class Tab2Entry:
                 self.btn_add,
                 self.btn_update,
                 self.btn_delete,
+                self.btn_batch_edit,
                 self.btn_clear,
             ],
             "always_enabled": [
@@ -950,6 +1391,20 @@ class Tab2Entry:
         # ------------------------------
         # Right: Tabbed Preview (Excel Data + Filter Result)
         # ------------------------------
+        # Loading indicator (shown only while a sheet is being loaded)
+        self.frame_loading = tk.Frame(right)
+        self.lbl_loading = tk.Label(self.frame_loading, text="", anchor="w")
+        self.lbl_loading.pack(side="left")
+        self.progress_loading = ttk.Progressbar(self.frame_loading, length=200)
+        self.progress_loading.pack(side="left", fill="x", expand=True, padx=6)
+        self.btn_cancel_load = tk.Button(
+            self.frame_loading,
+            text=JP_LABELS["load_cancel"],
+            command=self.on_cancel_loading,
+            bg="#f8d7da",
+        )
+        self.btn_cancel_load.pack(side="right")
+
         self.notebook = ttk.Notebook(right)
         self.notebook.pack(fill="both", expand=True)
 
@@ -965,14 +1420,8 @@ class Tab2Entry:
         container1 = tk.Frame(sec_preview1)
         container1.pack(fill="both", expand=True)
 
-        self.tree = ttk.Treeview(container1, show="headings", selectmode="extended")
-        vsb1 = ttk.Scrollbar(container1, orient="vertical", command=self.tree.yview)
-        hsb1 = ttk.Scrollbar(container1, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb1.set, xscrollcommand=hsb1.set)
-
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb1.grid(row=0, column=1, sticky="ns")
-        hsb1.grid(row=1, column=0, sticky="ew")
+        # Only the visible rows become Treeview items (see VirtualTreeview)
+        self.tree = VirtualTreeview(container1, selectmode="extended")
 
         container1.grid_rowconfigure(0, weight=1)
         container1.grid_columnconfigure(0, weight=1)
@@ -981,33 +1430,31 @@ class Tab2Entry:
         tab2 = ttk.Frame(self.notebook)
         self.notebook.add(tab2, text=JP_LABELS["filter_result"])
 
-        sec_preview2 = tk.LabelFrame(
+        self.sec_filter_result = tk.LabelFrame(
             tab2, text=JP_LABELS["filter_result"], padx=8, pady=8
         )
-        sec_preview2.pack(fill="both", expand=True)
+        self.sec_filter_result.pack(fill="both", expand=True)
+
+        filter_actions = tk.Frame(self.sec_filter_result)
+        filter_actions.pack(fill="x", pady=(0, 4))
+        self.btn_export_filter = tk.Button(
+            filter_actions,
+            text=JP_LABELS["export_excel"],
+            command=self.export_filter_result,
+        )
+        self.btn_export_filter.pack(side="right")
 
-        container2 = tk.Frame(sec_preview2)
+        container2 = tk.Frame(self.sec_filter_result)
         container2.pack(fill="both", expand=True)
 
-        self.filter_tree = ttk.Treeview(container2, show="headings")
-        vsb2 = ttk.Scrollbar(
-            container2, orient="vertical", command=self.filter_tree.yview
-        )
-        hsb2 = ttk.Scrollbar(
-            container2, orient="horizontal", command=self.filter_tree.xview
-        )
-        self.filter_tree.configure(yscrollcommand=vsb2.set, xscrollcommand=hsb2.set)
-
-        self.filter_tree.grid(row=0, column=0, sticky="nsew")
-        vsb2.grid(row=0, column=1, sticky="ns")
-        hsb2.grid(row=1, column=0, sticky="ew")
+        self.filter_tree = VirtualTreeview(container2, selectmode="extended")
 
         container2.grid_rowconfigure(0, weight=1)
         container2.grid_columnconfigure(0, weight=1)
 
         # Bind select events
-        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
-        self.filter_tree.bind("<<TreeviewSelect>>", self.on_filter_tree_select)
+        self.tree.bind(ROW_SELECT_EVENT, self.on_tree_select)
+        self.filter_tree.bind(ROW_SELECT_EVENT, self.on_filter_tree_select)
 
         # Bind keyboard events for multiple delete
         self.tree.bind("<Delete>", self.on_key_delete)
@@ -1020,6 +1467,8 @@ class Tab2Entry:
         # Bind tab change event
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
 
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+
     # ==============================
     # UI State Management
     # ==============================
@@ -1051,11 +1500,16 @@ class Tab2Entry:
             self.btn_add.config(state="disabled")
             self.btn_update.config(state="normal")
             self.btn_delete.config(state="normal")
+            # Batch edit works on the preview selection, not shown in filter mode
+            self.btn_batch_edit.config(
+                state="disabled" if self.is_filter_mode else "normal"
+            )
         else:
             # No data selected - enable add button, disable update/delete
             self.btn_add.config(state="normal")
             self.btn_update.config(state="disabled")
             self.btn_delete.config(state="disabled")
+            self.btn_batch_edit.config(state="disabled")
 
     def on_tab_change(self, event):
         """Handle tab change events"""
@@ -1072,13 +1526,13 @@ class Tab2Entry:
     # ==============================
     # Dynamic Table Detection
     # ==============================
-    def find_table_position(self, ws):
-        """Dynamically find header row and data start position"""
+    def detect_table_position(self, rows):
+        """Find (header_row, data_start_row) from the first rows of a sheet.
+        `rows` is a list of row values starting at Excel row 1."""
         # Search for header indicators in first 20 rows
         header_indicators = ["発生月", "累計", "№", "発生日", "項目", "事象"]
 
-        for row_num in range(1, 21):  # Check first 20 rows
-            row_values = [cell.value for cell in ws[row_num]]
+        for row_num, row_values in enumerate(rows[:20], start=1):
             row_text = [str(val).strip() if val else "" for val in row_values]
 
             # Check if this row contains header indicators
@@ -1089,14 +1543,10 @@ class Tab2Entry:
             )
 
             if matches >= 3:  # If at least 3 indicators found
-                self.header_row = row_num
-                self.data_start_row = row_num + 1
-                return True
+                return row_num, row_num + 1
 
         # Fallback to default positions if not found
-        self.header_row = 3
-        self.data_start_row = 4
-        return False
+        return 3, 4
 
     # ==============================
     # Sheet Management
@@ -1107,26 +1557,6 @@ class Tab2Entry:
             self.selected_sheet = self.cbo_sheet.get()
             self.load_excel_to_tree()
 
-    def load_sheet_names(self):
-        """Load available sheet names into combobox"""
-        if not self.excel_path:
-            return
-
-        try:
-            wb = load_workbook(self.excel_path, read_only=True)
-            sheet_names = wb.sheetnames
-            wb.close()
-
-            self.cbo_sheet["values"] = sheet_names
-            if sheet_names:
-                self.cbo_sheet.set(sheet_names[0])  # Select first sheet by default
-                self.selected_sheet = sheet_names[0]
-
-        except Exception as e:
-            messagebox.showerror(
-                JP_LABELS["error"], f"{JP_LABELS['error_loading_sheets']} {str(e)}"
-            )
-
     # ==============================
     # Extract Unique Data for Filter
     # ==============================
@@ -1148,54 +1578,13 @@ class Tab2Entry:
         niji_col = 7  # 事象（二次）
         supplier_col = 9  # サプライヤー名
 
-        unique_data = {
-            "koumoku": set(),
-            "jishou": set(),
-            "ichiji": set(),
-            "niji": set(),
-            "suppliers": set(),
-        }
-
-        for row in self.all_data:
-            # Extract unique values, skip None and empty strings
-            if (
-                len(row) > koumoku_col
-                and row[koumoku_col]
-                and str(row[koumoku_col]).strip()
-            ):
-                unique_data["koumoku"].add(str(row[koumoku_col]).strip())
-
-            if (
-                len(row) > jishou_col
-                and row[jishou_col]
-                and str(row[jishou_col]).strip()
-            ):
-                unique_data["jishou"].add(str(row[jishou_col]).strip())
-
-            if (
-                len(row) > ichiji_col
-                and row[ichiji_col]
-                and str(row[ichiji_col]).strip()
-            ):
-                unique_data["ichiji"].add(str(row[ichiji_col]).strip())
-
-            if len(row) > niji_col and row[niji_col] and str(row[niji_col]).strip():
-                unique_data["niji"].add(str(row[niji_col]).strip())
-
-            if (
-                len(row) > supplier_col
-                and row[supplier_col]
-                and str(row[supplier_col]).strip()
-            ):
-                unique_data["suppliers"].add(str(row[supplier_col]).strip())
-
-        # Convert sets to sorted lists
+        # Sorted unique values, without empty strings
         return {
-            "koumoku": sorted(list(unique_data["koumoku"])),
-            "jishou": sorted(list(unique_data["jishou"])),
-            "ichiji": sorted(list(unique_data["ichiji"])),
-            "niji": sorted(list(unique_data["niji"])),
-            "suppliers": sorted(list(unique_data["suppliers"])),
+            "koumoku": sorted(self.all_data.distinct_text(koumoku_col)),
+            "jishou": sorted(self.all_data.distinct_text(jishou_col)),
+            "ichiji": sorted(self.all_data.distinct_text(ichiji_col)),
+            "niji": sorted(self.all_data.distinct_text(niji_col)),
+            "suppliers": sorted(self.all_data.distinct_text(supplier_col)),
         }
 
     # ==============================
@@ -1210,133 +1599,112 @@ class Tab2Entry:
         unique_data = self.extract_unique_data()
         FilterDialog(self.root, self.apply_filter, unique_data)
 
-    def apply_filter(self, filters):
+    def apply_filter(self, filters, live=False):
+        """Filter all_data. Live updates come from FilterDialog while typing:
+        they skip the result popup, and when every criterion only got narrower
+        they refine the previous result instead of scanning everything."""
         if not self.all_data:
-            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["no_data_filter"])
+            if not live:
+                messagebox.showwarning(
+                    JP_LABELS["warning"], JP_LABELS["no_data_filter"]
+                )
             return
 
-        filtered_data = []
-
-        for row_data in self.all_data:
-            match = True
-
-            # Convert row_data to strings for comparison, handle None values
-            row_str = [str(cell) if cell is not None else "" for cell in row_data]
-
-            # Date range filter (assuming date is in column 3 - 発生日)
-            if filters["date_from"] or filters["date_to"]:
-                date_val = row_str[3] if len(row_str) > 3 else ""
-                if filters["date_from"] and date_val < filters["date_from"]:
-                    match = False
-                if filters["date_to"] and date_val > filters["date_to"]:
-                    match = False
+        store = self.all_data
+        indices = range(len(store))
+        previous = self.last_filter
+        if (
+            live
+            and previous is not None
+            and previous["store"] is store
+            and previous["version"] == store.version
+            and self.is_narrower_filter(previous["filters"], filters)
+        ):
+            indices = previous["indices"]
 
-            # Specific field filters
-            if (
-                filters["koumoku"]
-                and filters["koumoku"].lower() not in row_str[4].lower()
-                if len(row_str) > 4
-                else False
-            ):
-                match = False
-            if (
-                filters["jishou"]
-                and filters["jishou"].lower() not in row_str[5].lower()
-                if len(row_str) > 5
-                else False
-            ):
-                match = False
-            if (
-                filters["ichiji"]
-                and filters["ichiji"].lower() not in row_str[6].lower()
-                if len(row_str) > 6
-                else False
-            ):
-                match = False
-            if (
-                filters["niji"] and filters["niji"].lower() not in row_str[7].lower()
-                if len(row_str) > 7
-                else False
-            ):
-                match = False
-            if (
-                filters["hinban"]
-                and filters["hinban"].lower() not in row_str[8].lower()
-                if len(row_str) > 8
-                else False
-            ):
-                match = False
-            if (
-                filters["supplier"]
-                and filters["supplier"].lower() not in row_str[9].lower()
-                if len(row_str) > 9
-                else False
-            ):
-                match = False
-            if (
-                filters["furyo_no"]
-                and filters["furyo_no"].lower() not in row_str[11].lower()
-                if len(row_str) > 11
-                else False
-            ):
-                match = False
-
-            # Free search (search in all columns)
-            if filters["free_search"]:
-                free_match = False
-                search_term = filters["free_search"].lower()
-                for cell in row_str:
-                    if search_term in cell.lower():
-                        free_match = True
-                        break
-                if not free_match:
-                    match = False
+        # Date range filter (assuming date is in column 3 - 発生日)
+        if filters["date_from"] or filters["date_to"]:
+            indices = store.filter_date_range(
+                3, filters["date_from"], filters["date_to"], indices
+            )
 
-            if match:
-                filtered_data.append(row_data)
+        # Specific field filters (substring, case-insensitive)
+        field_columns = [
+            ("koumoku", 4),
+            ("jishou", 5),
+            ("ichiji", 6),
+            ("niji", 7),
+            ("hinban", 8),
+            ("supplier", 9),
+            ("furyo_no", 11),
+        ]
+        for key, col in field_columns:
+            if filters[key]:
+                indices = store.filter_contains(col, filters[key], indices)
+
+        # Free search (search in all columns)
+        if filters["free_search"]:
+            indices = store.filter_contains_any(filters["free_search"], indices)
+
+        filtered_data = RecordView(store, list(indices))
+        self.last_filter = {
+            "store": store,
+            "version": store.version,
+            "filters": dict(filters),
+            "indices": filtered_data.indices,
+        }
 
         # Display filtered results in filter_tree
         self.display_filtered_data(filtered_data)
 
         # Switch to filter result tab
         self.notebook.select(1)
-
-        messagebox.showinfo(
-            JP_LABELS["filter_applied"],
-            f"{len(filtered_data)}{JP_LABELS['found_records']}",
+        self.sec_filter_result.config(
+            text=JP_LABELS["filter_result_count"].format(count=len(filtered_data))
         )
 
-    def display_filtered_data(self, filtered_data):
-        # Clear filter tree
-        self.filter_tree.delete(*self.filter_tree.get_children())
+        if not live:
+            messagebox.showinfo(
+                JP_LABELS["filter_applied"],
+                f"{len(filtered_data)}{JP_LABELS['found_records']}",
+            )
+
+    def is_narrower_filter(self, old, new):
+        """True if every row matching `new` also matches `old`"""
+        for key, value in new.items():
+            before = old.get(key, "")
+            if key in ("date_from", "date_to"):
+                if value == before or not before:
+                    continue
+                old_date, new_date = parse_loose_date(before), parse_loose_date(value)
+                if old_date is None or new_date is None:
+                    return False
+                if key == "date_from" and new_date < old_date:
+                    return False
+                if key == "date_to" and new_date > old_date:
+                    return False
+            # Substring criteria: a longer term containing the old one
+            elif before.lower() not in value.lower():
+                return False
+        return True
 
+    def display_filtered_data(self, filtered_data):
         if not filtered_data:
+            # Clear filter tree
+            self.filter_tree.set_rows([])
             return
 
         # Use same headers as main tree
-        headers = self.tree["columns"]
-        self.filter_tree["columns"] = headers
+        headers = self.tree.columns
+        widths = []
 
         # Set column properties
         for i, h in enumerate(headers):
-            col_values = []
-            for row in filtered_data:
-                if i < len(row) and row[i] is not None:
-                    col_values.append(str(row[i]))
-                else:
-                    col_values.append("")
+            longest = max(len(str(h)), filtered_data.display_len(i), 10)
+            widths.append(min(max(100, longest * 9), 600))
 
-            longest = max([len(str(h))] + [len(v) for v in col_values] + [10])
-            width = min(max(100, longest * 9), 600)
-
-            self.filter_tree.heading(h, text=h)
-            self.filter_tree.column(h, width=width, anchor="w", stretch=False)
-
-        # Insert filtered data
-        for row in filtered_data:
-            # Convert None to empty string
-            clean_row = [cell if cell is not None else "" for cell in row]
-            self.filter_tree.insert("", tk.END, values=clean_row)
+        self.filter_tree.set_columns(headers, widths)
+        self.filter_tree.set_rows(filtered_data)
 
     def on_filter_tree_select(self, event):
         # Handle selection in filter tree - fill form but don't change selected_row
@@ -1345,7 +1713,7 @@ class Tab2Entry:
             return
 
         try:
-            vals = self.filter_tree.item(sel[0], "values")
+            vals = self.filter_tree.row_values(sel[0])
             # Fill form with selected data but don't set selected_row (read-only mode)
             self.fill_form_with_data(vals, read_only=True)
 
@@ -1372,15 +1740,32 @@ class Tab2Entry:
             self.entry_renrakusho.insert(0, display_path)
 
             # Enable open button if path is valid
-            if is_valid_path(display_path):
-                self.btn_open_file.config(state="normal")
-            else:
-                self.btn_open_file.config(state="disabled")
+            self.check_renrakusho(display_path)
 
         FileSelectionDialog(self.root, callback)
 
+    def check_renrakusho(self, display_path):
+        """Enable the open button once `display_path` is known to be valid.
+        The check runs on path_checker's threads (cached for a while), so
+        selecting rows does not wait for a slow file server; a result that
+        arrives after the entry changed is ignored."""
+        self.btn_open_file.config(state="disabled")
+        if not display_path:
+            return
+        future = path_checker.submit(display_path)
+
+        def apply():
+            if not future.done():
+                self.root.after(PATH_CHECK_POLL_MS, apply)
+            elif future.result() and self.entry_renrakusho.get().strip() == display_path:
+                self.btn_open_file.config(state="normal")
+
+        apply()
+
     def open_renrakusho_file(self):
         """Open the selected file"""
+        import subprocess
+
         display_path = self.entry_renrakusho.get().strip()
         if not display_path:
             messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["file_not_found"])
@@ -1389,8 +1774,12 @@ class Tab2Entry:
         # Convert display path to real path
         file_path = to_real_path(display_path)
 
-        # Check if file exists and is accessible
-        if not is_valid_path(display_path):
+        # Check if file exists and is accessible (a fresh result of the
+        # background check is reused)
+        valid = path_checker.cached(display_path)
+        if valid is None:
+            valid = is_valid_path(display_path)
+        if not valid:
             messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["file_not_found"])
             return
 
@@ -1418,134 +1807,1040 @@ class Tab2Entry:
     # ==============================
     def choose_file(self):
         path = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx")], title=JP_LABELS["choose_excel"]
+            filetypes=[
+                (JP_LABELS["ledger_files"], f"*.xlsx *{LEDGER_DB_SUFFIX}"),
+                ("Excel files", "*.xlsx"),
+                (JP_LABELS["ledger_db_files"], f"*{LEDGER_DB_SUFFIX}"),
+            ],
+            title=JP_LABELS["choose_excel"],
         )
         if path:
-            self.excel_path = path
-            self.lbl_file.config(text=os.path.basename(path))
-
             # Add to history
             self.history_manager.add(path)
-
-            self.load_sheet_names()  # Load available sheets
-            self.load_excel_to_tree()
+            self.open_excel_file(path)
 
     def show_history(self):
         """Show Excel file history dialog"""
 
         def on_file_selected(file_path):
-            self.excel_path = file_path
-            self.lbl_file.config(text=os.path.basename(file_path))
-            self.load_sheet_names()
-            self.load_excel_to_tree()
+            self.open_excel_file(file_path)
 
         ExcelHistoryDialog(self.root, on_file_selected, self.history_manager)
 
+    def open_excel_file(self, path):
+        """Show the first sheet of a newly chosen workbook. The sheet names are
+        read while parsing it, so the file is opened only once."""
+        self.excel_path = path
+        self.lbl_file.config(text=os.path.basename(path))
+        self.selected_sheet = None
+        self.cbo_sheet["values"] = ()
+        self.cbo_sheet.set("")
+        self.load_excel_to_tree()
+
+    def show_sheet_names(self, sheet_info):
+        """Fill the sheet combobox from parsed data and select its sheet"""
+        self.cbo_sheet["values"] = sheet_info["sheet_names"]
+        self.cbo_sheet.set(sheet_info["sheet"])
+        self.selected_sheet = sheet_info["sheet"]
+
     def load_excel_to_tree(self):
         if not self.excel_path or not os.path.exists(self.excel_path):
             return
 
-        if not self.selected_sheet:
-            return
-
         if self.excel_path and os.path.exists(self.excel_path):
             # Add to history when successfully opened
             self.history_manager.add(self.excel_path)
 
+        # Stop any load that is still running for a previous file/sheet
+        self.cancel_loading()
+
+        # Journaled changes must be in the file before it is read again
         try:
-            wb = load_workbook(self.excel_path)
+            self.save_pending()
+            if self.journal is None or self.journal.workbook_path != os.path.abspath(
+                self.excel_path
+            ):
+                self.journal = WriteJournal(self.excel_path)
+                self.save_pending()
+        except Exception as e:
+            messagebox.showerror(JP_LABELS["error"], f"{JP_LABELS['flush_failed']} {e}")
 
-            # Select the specified sheet
-            if self.selected_sheet in wb.sheetnames:
-                ws = wb[self.selected_sheet]
-            else:
+        if is_ledger_db(self.excel_path):
+            self.load_ledger_db()
+            return
+        self.close_ledger_db()
+
+        # Switching back to a sheet that was not saved since it was parsed
+        sheet_data = self.cached_sheet(self.excel_path, self.selected_sheet)
+        if sheet_data is None and self.sidecar_cache:
+            # Parsed in an earlier session and not saved since
+            sheet_data = load_sidecar(self.excel_path, self.selected_sheet)
+            if sheet_data is not None:
+                self.cache_sheet(self.excel_path, sheet_data, persist=False)
+        if sheet_data is not None:
+            self.render_sheet_data(sheet_data)
+            return
+
+        if self.background_loading:
+            self.start_background_load(self.excel_path, self.selected_sheet)
+            return
+
+        try:
+            sheet_data = self.parse_sheet(self.excel_path, self.selected_sheet)
+            if sheet_data is None:
                 messagebox.showerror(
                     JP_LABELS["error"],
                     JP_LABELS["sheet_not_found"].format(sheet=self.selected_sheet),
                 )
                 return
 
-            # Dynamically find table position
-            self.find_table_position(ws)
+            self.cache_sheet(self.excel_path, sheet_data)
+            self.render_sheet_data(sheet_data)
+
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_loading_excel']} {str(e)}"
+            )
 
-            # Get headers from detected header row
-            headers = [cell.value for cell in ws[self.header_row]]
+    def parse_sheet(self, path, sheet_name, on_batch=None, cancel_event=None):
+        """Read a sheet in one streaming pass (read-only mode).
+        Detects the table position, formats every row and collects column widths
+        at the same time. Does not touch any widget, so it can run on a worker
+        thread: `on_batch(info, batch)` receives every LOAD_BATCH_SIZE new rows as a
+        RecordStore (the returned "rows" store then stays empty) and setting
+        `cancel_event` stops the pass early. Returns None if the sheet does not
+        exist; sheet_name None reads the first sheet. "sheet" and "sheet_names"
+        tell which sheet was read and which sheets the file has (read from the
+        same open of the file, see read_sheet_names).
+        Also runs the 累計/№ numbering over the raw values: "numbering" is the
+        state after the last row and "numbering_index" the state after every
+        row (see NumberingIndex), so changes can be renumbered without another
+        pass. "stat" is the file stat the data was read from and "fingerprint"
+        its workbook_fingerprint."""
+        from openpyxl import load_workbook
+
+        # One open of the file for its stat, the sheet names and the rows
+        f = open(path, "rb")
+        wb = None
+        try:
+            stat = os.fstat(f.fileno())
+            fingerprint = workbook_fingerprint(f)
+            sheet_names = read_sheet_names(f)
+            if sheet_name is None and sheet_names:
+                sheet_name = sheet_names[0]
+            if sheet_name not in sheet_names:
+                return None
+            wb = load_workbook(f, read_only=True)
+            ws = wb[sheet_name]
+            rows_iter = ws.iter_rows(values_only=True)
+
+            # Buffer the first 20 rows for header detection
+            head = list(itertools.islice(rows_iter, 20))
+            header_row, data_start_row = self.detect_table_position(head)
+
+            if header_row <= len(head):
+                header_values = head[header_row - 1]
+            else:
+                header_values = (None,) * (ws.max_column or 0)
             # Clean headers (remove None values)
             headers = [
                 str(h) if h is not None else f"Column_{i}"
-                for i, h in enumerate(headers)
+                for i, h in enumerate(header_values)
             ]
 
-            self.tree["columns"] = headers
-            self.tree.delete(*self.tree.get_children())
+            # Minimum width (in characters) is the header text or 10
+            longest = [max(len(h), 10) for h in headers]
+            info = {
+                "sheet": sheet_name,
+                "sheet_names": sheet_names,
+                "headers": headers,
+                "header_row": header_row,
+                "data_start_row": data_start_row,
+                # From the sheet dimension; None when the file does not declare it
+                "total_rows": (
+                    max(ws.max_row - data_start_row + 1, 0) if ws.max_row else None
+                ),
+                "widths": None,
+            }
+            rows = RecordStore()
+            batch = RecordStore()
+            cancelled = False
+            numbering = new_numbering()
+            numbering_index = NumberingIndex(path, sheet_name, data_start_row)
+            for row in itertools.chain(head[data_start_row - 1 :], rows_iter):
+                numbering_index.check_stored(row, advance_numbering(numbering, row))
+                numbering_index.append(numbering)
+                batch.append(self.format_row(row, longest))
+
+                if len(batch) >= LOAD_BATCH_SIZE:
+                    if cancel_event is not None and cancel_event.is_set():
+                        cancelled = True
+                        break
+                    if on_batch is not None:
+                        info["widths"] = self.column_widths(longest)
+                        on_batch(dict(info), batch)
+                    else:
+                        rows.extend(batch)
+                    batch = RecordStore()
 
-            # Store all data for filtering
-            self.all_data = []
+            if not cancelled and len(batch):
+                if on_batch is not None:
+                    info["widths"] = self.column_widths(longest)
+                    on_batch(dict(info), batch)
+                else:
+                    rows.extend(batch)
+        finally:
+            if wb is not None:
+                wb.close()
+            f.close()
+
+        info["rows"] = rows
+        info["widths"] = self.column_widths(longest)
+        info["cancelled"] = cancelled
+        info["numbering"] = None if cancelled else numbering
+        info["stat"] = (stat.st_mtime_ns, stat.st_size)
+        info["fingerprint"] = fingerprint
+        numbering_index.stat = info["stat"]
+        info["numbering_index"] = None if cancelled else numbering_index
+        return info
+
+    def cached_sheet(self, path, sheet_name):
+        """Parsed data of a sheet whose file did not change since it was parsed
+        (sheet_name None: the first sheet). The rows are shared with the
+        preview, so an entry whose rows were edited since (journaled changes
+        not saved yet) is not used."""
+        if sheet_name is None:
+            sheet_names = self.sheet_cache.get(path, None)
+            if not sheet_names:
+                return None
+            sheet_name = sheet_names[0]
+        sheet_data = self.sheet_cache.get(path, sheet_name)
+        if sheet_data is None:
+            return None
+        if sheet_data["rows"].version != sheet_data["version"]:
+            self.sheet_cache.discard(path, sheet_name)
+            return None
+        return sheet_data
+
+    def cache_sheet(self, path, sheet_data, persist=True):
+        """Remember a complete parse result (see cached_sheet); with `persist`
+        it is also written to the sidecar cache on a worker thread"""
+        rows = sheet_data["rows"]
+        size = rows.memory_size()
+        if sheet_data["numbering_index"] is not None:
+            size += 24 * len(sheet_data["numbering_index"])
+        sheet_data = dict(sheet_data, version=rows.version)
+        stat = sheet_data["stat"]
+        self.sheet_cache.put(path, sheet_data["sheet"], stat, sheet_data, size)
+        # Lets a reopened file find its first sheet without reading the names
+        names = sheet_data["sheet_names"]
+        self.sheet_cache.put(path, None, stat, names, 100 * len(names))
+
+        if persist and self.sidecar_cache:
+            # Serialized here: the rows are shared with the preview
+            encoded = encode_sidecar(path, sheet_data)
+
+            def worker():
+                try:
+                    write_sidecar(encoded)
+                except OSError:
+                    pass  # Only a cache; the next start parses the file
+
+            threading.Thread(target=worker, daemon=True).start()
+
+    def format_row(self, row, longest):
+        """Display strings of one row of raw cell values; grows `longest`
+        (text length per column, for column_widths) on the way"""
+        clean_row = []
+        for col_idx, cell in enumerate(row):
+            # Pass column index for specific formatting
+            formatted_value = self.format_cell_value(cell, col_idx)
+            clean_row.append(formatted_value)
+            if col_idx < len(longest):
+                text_len = self.width_text_len(cell, col_idx, formatted_value)
+                if text_len > longest[col_idx]:
+                    longest[col_idx] = text_len
+        return clean_row
+
+    def column_widths(self, longest):
+        """Convert longest text lengths (characters) to column pixel widths"""
+        return [min(max(100, n * 9), 600) for n in longest]
+
+    def width_text_len(self, value, column_index, formatted_value):
+        """Length used for column auto-width.
+        Column widths have always been measured on the generic (date) formatting
+        of each cell, so reproduce that without formatting every cell twice."""
+        if value is None:
+            return 0
+        if column_index in [0, 3]:
+            return len(formatted_value)
+        if isinstance(value, str):
+            n = len(value.strip())
+            # Only strings of these lengths can be dates ("2024/1/5" -> 10 chars)
+            return len(format_excel_date(value, column_index)) if n in DATE_TEXT_LENGTHS else n
+        if isinstance(value, datetime.date):
+            return 10
+        return len(format_excel_date(value))
+
+    def render_sheet_data(self, sheet_data):
+        """Show parsed sheet data in the preview tree"""
+        self.show_sheet_names(sheet_data)
+        self.setup_tree_columns(sheet_data)
+
+        # Store formatted data for filtering (also the dataset shown in the tree)
+        self.all_data = sheet_data["rows"]
+        self.tree.set_rows(self.all_data)
+        self.numbering = sheet_data["numbering"]
+        self.numbering_index = sheet_data["numbering_index"]
+        self.loaded_stat = sheet_data["stat"]
+        self.loaded_fingerprint = sheet_data.get("fingerprint")
+        self.preview_numbered = self.numbering_index is not None and self.numbering_index.consistent
+
+        # Update ruikei label (jumlah data)
+        data_count = len(self.all_data)
+        self.lbl_ruikei.config(text=str(data_count))
+        self.selected_row = None
+        self.update_button_states()  # Update button states
+        self.warm_search_index()
 
-            # Auto-adjust column widths based on content
-            for i, h in enumerate(headers):
-                col_values = []
-                for row in ws.iter_rows(min_row=self.data_start_row, values_only=True):
-                    if i < len(row):
-                        col_values.append(self.format_cell_value(row[i]))
-                    else:
-                        col_values.append("")
-
-                # Calculate optimal width
-                longest = max([len(str(h))] + [len(v) for v in col_values] + [10])
-                width = min(max(100, longest * 9), 600)
-
-                self.tree.heading(h, text=h)
-                self.tree.column(h, width=width, anchor="w", stretch=False)
-
-            # Load data starting from detected data row
-            for row in ws.iter_rows(min_row=self.data_start_row, values_only=True):
-                # Format each cell value for display with improved date and number handling
-                clean_row = []
-                for col_idx, cell in enumerate(row):
-                    # Pass column index for specific formatting
-                    formatted_value = self.format_cell_value(cell, col_idx)
-                    clean_row.append(formatted_value)
-
-                self.tree.insert("", tk.END, values=clean_row)
-                # Store formatted data for filtering
-                self.all_data.append(clean_row)
-
-            # Update ruikei label (jumlah data)
-            data_count = len(self.all_data)
-            self.lbl_ruikei.config(text=str(data_count))
+    # ==============================
+    # Background loading
+    # ==============================
+    def start_background_load(self, path, sheet_name):
+        """Parse the sheet on a worker thread and fill the tree batch by batch"""
+        loader = {
+            "queue": queue.Queue(),
+            "cancel": threading.Event(),
+            "loaded": 0,
+            "started": False,
+            "path": path,
+        }
+        self._loader = loader
+
+        # The tree is rebuilt from scratch, so drop the old rows and selection
+        self.all_data = RecordStore()
+        self.tree.set_rows(self.all_data)
+        self.numbering = self.numbering_index = self.loaded_stat = None
+        self.loaded_fingerprint = None
+        self.preview_numbered = False
+        self.selected_row = None
+        self.update_button_states()
+        self.show_load_progress(None)
+
+        def worker():
+            def on_batch(info, rows):
+                loader["queue"].put(("batch", info, rows))
+
+            try:
+                result = self.parse_sheet(
+                    path, sheet_name, on_batch=on_batch, cancel_event=loader["cancel"]
+                )
+                loader["queue"].put(("done", result, None))
+            except Exception as e:
+                loader["queue"].put(("error", e, None))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(LOAD_POLL_MS, self.poll_background_load, loader)
+
+    def poll_background_load(self, loader):
+        """Move parsed batches from the worker queue into the tree (UI thread)"""
+        if loader is not self._loader:
+            return  # Superseded by a newer load or cancelled
+
+        # Handle a few batches per tick so the UI keeps responding
+        for _ in range(LOAD_BATCHES_PER_TICK):
+            try:
+                kind, payload, batch = loader["queue"].get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "batch":
+                if not loader["started"]:
+                    self.show_sheet_names(payload)
+                    self.setup_tree_columns(payload)
+                    loader["started"] = True
+                self.all_data.extend(batch)
+                self.tree.refresh()
+                loader["loaded"] += len(batch)
+                self.show_load_progress(payload["total_rows"], loader["loaded"])
+
+            elif kind == "done":
+                self._loader = None
+                self.hide_load_progress()
+                if payload is None:
+                    messagebox.showerror(
+                        JP_LABELS["error"],
+                        JP_LABELS["sheet_not_found"].format(sheet=self.selected_sheet),
+                    )
+                    return
+                if not loader["started"]:
+                    self.show_sheet_names(payload)
+                    self.setup_tree_columns(payload)
+                else:
+                    # Final widths cover every row, not just the first batches
+                    self.tree.set_column_widths(payload["headers"], payload["widths"])
+                # Every row already arrived through the batches, in order
+                self.lbl_ruikei.config(text=str(len(self.all_data)))
+                self.numbering = payload["numbering"]
+                self.numbering_index = payload["numbering_index"]
+                self.loaded_stat = payload["stat"]
+                self.loaded_fingerprint = payload.get("fingerprint")
+                self.preview_numbered = (
+                    self.numbering_index is not None and self.numbering_index.consistent
+                )
+                if not payload["cancelled"]:
+                    # The rows arrived in batches; payload["rows"] is empty
+                    self.cache_sheet(loader["path"], dict(payload, rows=self.all_data))
+                self.warm_search_index()
+                return
+
+            elif kind == "error":
+                self._loader = None
+                self.hide_load_progress()
+                messagebox.showerror(
+                    JP_LABELS["error"],
+                    f"{JP_LABELS['error_loading_excel']} {str(payload)}",
+                )
+                return
+
+        self.root.after(LOAD_POLL_MS, self.poll_background_load, loader)
+
+    def warm_search_index(self):
+        """Build the free-word n-gram index on a worker thread after loading,
+        so the first search does not pay for it"""
+        store = self.all_data
+        version = store.version
+        result = {}
+
+        def worker():
+            try:
+                result["index"] = store.build_index(attach=False)
+            except Exception:
+                pass  # Rows changed while building; built on first search instead
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+        def check():
+            if thread.is_alive():
+                self.root.after(INDEX_POLL_MS, check)
+            elif "index" in result:
+                store.attach_index(result["index"], version)
+
+        self.root.after(INDEX_POLL_MS, check)
+
+    def cancel_loading(self):
+        """Stop the running background load; rows already shown are kept"""
+        loader = self._loader
+        if loader is None:
+            return
+        loader["cancel"].set()
+        self._loader = None
+        self.hide_load_progress()
+        self.lbl_ruikei.config(text=str(len(self.all_data)))
+
+    def on_cancel_loading(self):
+        if self._loader is None:
+            return
+        self.cancel_loading()
+        self.lbl_loading.config(
+            text=JP_LABELS["load_cancelled"].format(count=len(self.all_data))
+        )
+        self.frame_loading.pack(side="bottom", fill="x", pady=(4, 0))
+        self.btn_cancel_load.config(state="disabled")
+        self.progress_loading.pack_forget()
+        # Hide the notice after a while unless a new load has started
+        self.root.after(
+            3000, lambda: self._loader is None and self.hide_load_progress()
+        )
+
+    def show_load_progress(self, total, loaded=0):
+        """Show the loading bar; indeterminate when the row count is unknown"""
+        if total:
+            self.progress_loading.stop()
+            self.progress_loading.config(mode="determinate", maximum=total)
+            self.progress_loading["value"] = min(loaded, total)
+        elif loaded == 0:
+            self.progress_loading.config(mode="indeterminate")
+            self.progress_loading.start(LOAD_POLL_MS)
+        self.lbl_loading.config(text=JP_LABELS["loading"].format(count=loaded))
+        self.btn_cancel_load.config(state="normal")
+        if not self.progress_loading.winfo_manager():
+            self.progress_loading.pack(side="left", fill="x", expand=True, padx=6)
+        self.frame_loading.pack(side="bottom", fill="x", pady=(4, 0))
+
+    def hide_load_progress(self):
+        self.progress_loading.stop()
+        self.frame_loading.pack_forget()
+
+    def setup_tree_columns(self, sheet_info):
+        """Apply detected table position and column headers to the tree"""
+        self.header_row = sheet_info["header_row"]
+        self.data_start_row = sheet_info["data_start_row"]
+        self.tree.set_columns(sheet_info["headers"], sheet_info["widths"])
+
+    def format_cell_value(self, value, column_index=None):
+        """Convert Excel cell value to display-friendly string"""
+        return format_cell(value, column_index)
+
+    # ==============================
+    # Write-behind journal
+    # ==============================
+    def use_journal(self):
+        """Journal this change instead of saving the workbook right away?"""
+        return self.write_behind and self._loader is None and bool(self.data_start_row)
+
+    def record_change(self, entry):
+        """Write a change to the local journal (fsync'd); the workbook is saved
+        later by flush_pending, together with the changes that follow it"""
+        if self.journal is None or self.journal.workbook_path != os.path.abspath(
+            self.excel_path
+        ):
+            self.journal = WriteJournal(self.excel_path)
+        self.journal.append(
+            dict(entry, sheet=self.selected_sheet, start=self.data_start_row)
+        )
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        self.update_pending_label()
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        """(Re)start the idle timer of the next save"""
+        if self._flush_job is not None:
+            self.root.after_cancel(self._flush_job)
+        waited = 0
+        if self._first_pending is not None:
+            waited = (time.monotonic() - self._first_pending) * 1000
+        delay = max(0, min(FLUSH_IDLE_MS, FLUSH_MAX_DELAY_MS - waited))
+        self._flush_job = self.root.after(int(delay), self.flush_pending)
+
+    def flush_pending(self, wait=False):
+        """Save every journaled change to the workbook with one load/save
+        (a batch of new rows only is appended in place, see append_entries).
+        Runs on a worker thread; with wait=True it blocks until the journal is
+        saved. Returns False when saving failed (see flush_error); the entries
+        then stay in the journal and are retried."""
+        if self._flush_job is not None:
+            self.root.after_cancel(self._flush_job)
+            self._flush_job = None
+
+        flush = self._flush
+        if flush is not None:
+            if not wait:
+                return True  # The running save schedules the next one
+            flush["thread"].join()
+            self.finish_flush(flush, reload=False)
+
+        journal = self.journal
+        if journal is None or not len(journal):
+            return True
+
+        entries = journal.pending()
+        flush = {"journal": journal, "entries": entries, "result": None, "conflicts": []}
+        numbering_index = self.numbering_index
+
+        def worker():
+            path = journal.workbook_path
+            try:
+                with LedgerLock(path):
+                    flush["before"] = (file_stat(path), workbook_fingerprint(path))
+                    # Only new rows: written after the data without loading the workbook
+                    if append_entries(path, entries, journal.journal_id, numbering_index) is None:
+                        apply_entries(
+                            path, entries, journal.journal_id, numbering_index, flush["conflicts"]
+                        )
+                    flush["after"] = (file_stat(path), workbook_fingerprint(path))
+                journal.drop(entries[-1]["seq"])
+                flush["result"] = True
+            except Exception as e:
+                flush["result"] = e
+
+        flush["thread"] = threading.Thread(target=worker, daemon=True)
+        self._flush = flush
+        flush["thread"].start()
+        if wait:
+            flush["thread"].join()
+            return self.finish_flush(flush, reload=False)
+        self.root.after(FLUSH_POLL_MS, self.poll_flush, flush)
+        return True
+
+    def poll_flush(self, flush):
+        if flush is not self._flush:
+            return  # Already finished by a waiting flush
+        if flush["thread"].is_alive():
+            self.root.after(FLUSH_POLL_MS, self.poll_flush, flush)
+            return
+        self.finish_flush(flush, reload=True)
+
+    def finish_flush(self, flush, reload):
+        """UI side of a finished save (UI thread)"""
+        self._flush = None
+        journal = flush["journal"]
+        ok = flush["result"] is True
+        self.flush_error = None if ok else flush["result"]
+        current = journal is self.journal
+
+        if current:
+            # Changes made during the save (or a failed save) wait a full delay
+            self._first_pending = time.monotonic() if len(journal) else None
+        if ok and current:
+            saved_by_others = not self.shows_file(*flush["before"])
+            lock_stats.record_save(conflict=saved_by_others, rejected=bool(flush["conflicts"]))
+            self.update_lock_label()
+            # The preview already shows the saved changes (renumbered in place),
+            # but rows saved by someone else are not in it yet. loaded_stat then
+            # stays behind, so no change is patched in until the file is reloaded.
+            if not saved_by_others:
+                self.mark_loaded(*flush["after"])
+            elif flush["conflicts"] or (reload and not len(journal)):
+                self.load_excel_to_tree()
+            if flush["conflicts"]:
+                messagebox.showwarning(
+                    JP_LABELS["warning"],
+                    JP_LABELS["changes_conflicted"].format(count=len(flush["conflicts"])),
+                )
+
+        self.update_pending_label()
+        if current and len(journal) and self._flush_job is None:
+            self.schedule_flush()
+        return ok
+
+    def save_pending(self):
+        """Save journaled changes now; raises the save error if it fails"""
+        if not self.flush_pending(wait=True):
+            raise self.flush_error
+
+    def update_pending_label(self):
+        count = len(self.journal) if self.journal is not None else 0
+        if not count:
+            text = ""
+        elif self.flush_error is not None:
+            text = JP_LABELS["pending_failed"].format(count=count)
+        else:
+            text = JP_LABELS["pending_writes"].format(count=count)
+        self.lbl_pending.config(text=text)
+
+    @staticmethod
+    def replay_journals(journals=None):
+        """Save journal entries left by a session that ended before its flush.
+        Uses no widgets, so App runs it at startup before the tab is built."""
+        replayed = 0
+        errors = []
+        conflicts = []
+        for journal in WriteJournal.leftovers() if journals is None else journals:
+            entries = journal.pending()
+            try:
+                with LedgerLock(journal.workbook_path):
+                    replayed += apply_entries(
+                        journal.workbook_path, entries, journal.journal_id, conflicts=conflicts
+                    )
+                journal.drop(entries[-1]["seq"])
+            except Exception as e:
+                errors.append(f"{journal.workbook_path}: {e}")
+        if conflicts:
+            messagebox.showwarning(
+                JP_LABELS["warning"],
+                JP_LABELS["changes_conflicted"].format(count=len(conflicts)),
+            )
+        if errors:
+            messagebox.showerror(
+                JP_LABELS["error"], JP_LABELS["flush_failed"] + "\n" + "\n".join(errors)
+            )
+        elif replayed:
+            messagebox.showinfo(
+                JP_LABELS["success"], JP_LABELS["journal_replayed"].format(count=replayed)
+            )
+
+    def close(self):
+        """Save pending changes before the application exits.
+        Returns False when the user chose to stay because saving failed."""
+        self.cancel_loading()
+        if self.flush_pending(wait=True):
+            self.close_ledger_db()
+            return True
+        return messagebox.askyesno(
+            JP_LABELS["confirm"],
+            JP_LABELS["exit_unsaved"].format(count=len(self.journal)),
+        )
+
+    # ==============================
+    # Watching the file for saves by others
+    # ==============================
+    def watch_file(self):
+        """Check whether someone else saved the shown file (os.stat against
+        loaded_stat). If so it is re-read and diffed against all_data on a
+        worker thread, and only the rows that differ are patched into the
+        preview (see apply_watched). Not while the preview has changes of its
+        own that are not saved yet, or is being loaded or saved."""
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+        if (
+            not self.excel_path
+            or self.ledger_db is not None
+            or self.loaded_stat is None
+            or self._loader is not None
+            or self._flush is not None
+            or self._watch is not None
+            or (self.journal is not None and len(self.journal))
+        ):
+            return
+        try:
+            if file_stat(self.excel_path) == self.loaded_stat:
+                return
+        except OSError:
+            return  # Share not reachable right now; checked again next time
+
+        store = self.all_data
+        watch = {
+            "path": self.excel_path,
+            "sheet": self.selected_sheet,
+            "store": store,
+            "version": store.version,
+        }
+
+        def worker():
+            try:
+                sheet_data = self.parse_sheet(watch["path"], watch["sheet"])
+                if sheet_data is not None:
+                    watch["changes"] = diff_rows(store, sheet_data["rows"], row_key)
+                    watch["data"] = sheet_data
+            except Exception:
+                pass  # Read while being saved, or rows changed meanwhile: next time
+
+        watch["thread"] = threading.Thread(target=worker, daemon=True)
+        self._watch = watch
+        watch["thread"].start()
+        self.root.after(WATCH_POLL_MS, self.poll_watch, watch)
+
+    def poll_watch(self, watch):
+        if watch["thread"].is_alive():
+            self.root.after(WATCH_POLL_MS, self.poll_watch, watch)
+            return
+        self._watch = None
+        sheet_data = watch.get("data")
+        if (
+            sheet_data is None
+            or watch["path"] != self.excel_path
+            or watch["sheet"] != self.selected_sheet
+            or watch["store"] is not self.all_data
+            or watch["store"].version != watch["version"]
+            or self._loader is not None
+            or (self.journal is not None and len(self.journal))
+        ):
+            return  # The preview changed meanwhile; the next check starts over
+        if (
+            sheet_data["data_start_row"] != self.data_start_row
+            or list(sheet_data["headers"]) != list(self.tree.columns)
+        ):
+            self.load_excel_to_tree()  # Layout changed: show it from scratch
+            return
+        self.apply_watched(sheet_data, watch["changes"])
+
+    def apply_watched(self, sheet_data, changes):
+        """Patch the rows of a re-read file into the preview (changes as made
+        by diff_rows) and take over its numbering state and stat"""
+        store = self.all_data
+        first = None
+        count = 0
+        for kind, index, arg in changes:
+            if kind == "set":
+                store.set_row(index, arg)
+                count += 1
+            elif kind == "insert":
+                store.insert_rows(index, arg)
+                count += len(arg)
+            else:
+                store.delete_rows(range(index, index + arg))
+                count += arg
+            first = index if first is None else min(first, index)
+        self.numbering = sheet_data["numbering"]
+        self.numbering_index = sheet_data["numbering_index"]
+        self.loaded_stat = sheet_data["stat"]
+        self.loaded_fingerprint = sheet_data.get("fingerprint")
+        self.preview_numbered = self.numbering_index is not None and self.numbering_index.consistent
+        if first is None:
+            return
+
+        # A selection at or below the first changed row may point elsewhere now
+        selected = self.tree.selection()
+        if (selected and selected[-1] >= first) or (
+            self.selected_row is not None and self.selected_row - self.data_start_row >= first
+        ):
+            self.tree.clear_selection()
             self.selected_row = None
-            self.update_button_states()  # Update button states
+            self.update_button_states()
+        self.tree.refresh()
+        self.lbl_ruikei.config(text=str(len(store)))
+        self.lbl_pending.config(text=JP_LABELS["watch_patched"].format(count=count))
+        self.root.after(WATCH_INTERVAL_MS, self.update_pending_label)
 
+    # ==============================
+    # Ledger database (SQLite storage)
+    # ==============================
+    def load_ledger_db(self):
+        """Show a ledger stored in a database (see ledger_db.LedgerDB)"""
+        try:
+            db = self.ledger_db
+            if db is None or db.path != os.path.abspath(self.excel_path):
+                self.close_ledger_db()
+                db = self.ledger_db = LedgerDB(self.excel_path)
+            sheet_data = self.read_ledger_db(db)
+        except LedgerDBNetworkPath:
+            self.close_ledger_db()
+            messagebox.showerror(
+                JP_LABELS["error"], JP_LABELS["db_network_path"].format(path=self.excel_path)
+            )
+            return
+        except LedgerDBInUse:
+            self.close_ledger_db()
+            messagebox.showerror(
+                JP_LABELS["error"], JP_LABELS["db_in_use"].format(path=self.excel_path)
+            )
+            return
         except Exception as e:
+            self.close_ledger_db()
             messagebox.showerror(
                 JP_LABELS["error"], f"{JP_LABELS['error_loading_excel']} {str(e)}"
             )
+            return
+        self.render_sheet_data(sheet_data)
+
+    def read_ledger_db(self, db):
+        """Database records as parse_sheet data, in the layout export_xlsx
+        writes (header on row 3, data from row 4)"""
+        headers = list(LEDGER_HEADERS)
+        longest = [max(len(h), 10) for h in headers]
+        rows = RecordStore()
+        numbering = new_numbering()
+        for values in db.records():
+            advance_numbering(numbering, values)
+            rows.append(self.format_row(values, longest))
+        return {
+            "sheet": LEDGER_SHEET,
+            "sheet_names": [LEDGER_SHEET],
+            "headers": headers,
+            "header_row": LEDGER_HEADER_ROW,
+            "data_start_row": LEDGER_DATA_ROW,
+            "total_rows": len(rows),
+            "widths": self.column_widths(longest),
+            "rows": rows,
+            "cancelled": False,
+            "numbering": numbering,
+            "stat": None,
+            "numbering_index": None,
+        }
 
-    def format_cell_value(self, value, column_index=None):
-        """Convert Excel cell value to display-friendly string"""
-        if value is None:
-            return ""
-
-        # Handle specific column formatting
-        # Column indices: 0=発生月, 1=累計, 2=№, 3=発生日, 4=項目, etc.
-        if column_index is not None:
-            # 累計 (column 1) and № (column 2) should be formatted as integers
-            if column_index in [1, 2]:  # 累計 and № columns
-                return format_number(value)
-            # 発生月 (column 0) and 発生日 (column 3) should be formatted as dates
-            elif column_index in [0, 3]:  # 発生月 and 発生日 columns
-                return format_excel_date(value)
-            else:
-                # For other specific columns, return as string
-                return str(value)
+    def close_ledger_db(self):
+        if self.ledger_db is not None:
+            self.ledger_db.close()
+            self.ledger_db = None
+
+    def show_renumbered(self, changed):
+        """Put 累計/№ renumbered by the database into the preview rows"""
+        for index, total, monthly in changed:
+            row = self.all_data[index]
+            row += [""] * (3 - len(row))
+            row[1] = self.format_cell_value(total, 1)
+            row[2] = self.format_cell_value(monthly, 2)
+            self.all_data.set_row(index, row)
+        self.tree.refresh()
+
+    def import_ledger_db(self):
+        """Convert the current Excel sheet to a ledger database and open it"""
+        from openpyxl import load_workbook
+
+        if not self.excel_path or not self.selected_sheet or self.ledger_db is not None:
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_excel_sheet"])
+            return
+        base = os.path.splitext(self.excel_path)[0]
+        path = filedialog.asksaveasfilename(
+            title=JP_LABELS["import_db"],
+            initialdir=os.path.dirname(base),
+            initialfile=os.path.basename(base) + LEDGER_DB_SUFFIX,
+            defaultextension=LEDGER_DB_SUFFIX,
+            filetypes=[(JP_LABELS["ledger_db_files"], f"*{LEDGER_DB_SUFFIX}")],
+        )
+        if not path:
+            return
+        if is_network_path(path):
+            messagebox.showerror(
+                JP_LABELS["error"], JP_LABELS["db_network_path"].format(path=path)
+            )
+            return
+
+        try:
+            self.save_pending()
+            tmp_path = path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            wb = load_workbook(self.excel_path, read_only=True)
+            db = LedgerDB(tmp_path)
+            try:
+                rows_iter = wb[self.selected_sheet].iter_rows(values_only=True)
+                head = list(itertools.islice(rows_iter, 20))
+                header_row, data_start_row = self.detect_table_position(head)
+                # 月間期間 / 作成者 line of the template (A2, C2)
+                info = head[1] if header_row == 3 and len(head) > 1 else ()
+                count = db.import_rows(
+                    itertools.chain(head[data_start_row - 1 :], rows_iter),
+                    info[0] if len(info) > 0 else None,
+                    info[2] if len(info) > 2 else None,
+                )
+            finally:
+                db.close()
+                wb.close()
+            os.replace(tmp_path, path)
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_import_db']} {str(e)}"
+            )
+            return
+
+        messagebox.showinfo(
+            JP_LABELS["success"], JP_LABELS["imported_ok"].format(count=count, path=path)
+        )
+        self.history_manager.add(path)
+        self.open_excel_file(path)
+
+    # ==============================
+    # Excel export
+    # ==============================
+    def export_excel(self):
+        """Write the whole ledger as an Excel file (不具合品一覧表 layout).
+        A database is exported from its records, an Excel ledger from the
+        preview."""
+        if self.ledger_db is not None:
+            db = self.ledger_db
+            self.export_to_excel(db.path, db.export_xlsx)
+        else:
+            self.export_rows(self.all_data)
 
-        # For other columns or when column_index is not specified, use date formatter
-        # This will handle Excel serial dates, datetime objects, date objects, and string dates
-        formatted = format_excel_date(value)
+    def export_filter_result(self):
+        """Write the rows shown in the filter result tab as an Excel file"""
+        self.export_rows(self.filter_tree.rows, JP_LABELS["filter_result"])
+
+    def export_rows(self, rows, suffix=None):
+        """Export preview rows (display strings); 累計/№ are written as numbers"""
+        if not self.excel_path or not len(rows):
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["no_data_export"])
+            return
+        headers = list(self.tree.columns)
 
-        # If format_excel_date couldn't parse it as a date, it returns the original value
-        return formatted
+        def write(path):
+            values = (
+                [self.export_value(text, col) for col, text in enumerate(row)]
+                for row in rows
+            )
+            return write_ledger_xlsx(path, values, headers=headers)
+
+        self.export_to_excel(self.excel_path, write, suffix)
+
+    def export_value(self, text, col):
+        """Cell value for a display string (empty cells stay empty)"""
+        if col in (1, 2):
+            number = text_to_int(text)
+            if number is not None:
+                return number
+        return text or None
+
+    def export_to_excel(self, source_path, write, suffix=None):
+        """Ask for the xlsx path (named after `source_path`) and call write(path)"""
+        base = os.path.splitext(source_path)[0]
+        name = os.path.basename(base) + (f"_{suffix}" if suffix else "")
+        path = filedialog.asksaveasfilename(
+            title=JP_LABELS["export_excel"],
+            initialdir=os.path.dirname(base),
+            initialfile=name + ".xlsx",
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx")],
+        )
+        if not path:
+            return
+        if os.path.abspath(path) == os.path.abspath(self.excel_path):
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["export_same_file"])
+            return
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            write(path)
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_export_excel']} {str(e)}"
+            )
+            return
+        finally:
+            self.root.config(cursor="")
+        messagebox.showinfo(JP_LABELS["success"], JP_LABELS["exported_ok"].format(path=path))
+
+    # ==============================
+    # Bulk import (CSV / xlsx)
+    # ==============================
+    def bulk_import(self):
+        """Pick a CSV/xlsx list and open the mapping / dry-run dialog"""
+        if not self.excel_path or not self.selected_sheet:
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_excel_first"])
+            return
+        path = filedialog.askopenfilename(
+            title=JP_LABELS["bulk_import"],
+            filetypes=[(JP_LABELS["import_files"], "*.csv *.xlsx"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            bulk = BulkImport(path)
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_bulk_import']} {str(e)}"
+            )
+            return
+        BulkImportDialog(self.root, self.append_rows, bulk)
+
+    def append_rows(self, bulk):
+        """Append the checked rows of a BulkImport: one transaction for a
+        database, else one load, one renumbering pass from the first new row
+        and one save; the new rows are then appended to the preview"""
+        rows = bulk.rows
+        start = time.perf_counter()
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            if self.ledger_db is not None:
+                self.ledger_db.add_many(rows)
+                self.load_ledger_db()
+            else:
+                self.save_pending()
+
+                def edit(ws, _):
+                    first_row = ws.max_row + 1
+                    for offset, values in enumerate(rows):
+                        write_row_values(ws, first_row + offset, values)
+                    last_row = first_row + len(rows) - 1
+                    self.reindex_excel(ws, from_row=first_row, last_changed=last_row)
+                    return first_row
+
+                patch, first_row = self.locked_save(edit)
+                first = len(self.all_data)
+                if patch and first_row == self.data_start_row + first:
+                    for values in rows:
+                        self.all_data.append(self.display_row(values))
+                    self.renumber_preview(first, last_changed=len(self.all_data) - 1)
+                    self.lbl_ruikei.config(text=str(len(self.all_data)))
+                else:
+                    self.load_excel_to_tree()
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_bulk_import']} {str(e)}"
+            )
+            return
+        finally:
+            self.root.config(cursor="")
+        elapsed = time.perf_counter() - start
+        messagebox.showinfo(
+            JP_LABELS["success"],
+            JP_LABELS["bulk_imported_ok"].format(
+                count=len(rows), seconds=elapsed, rate=bulk.rate(len(rows), elapsed)
+            ),
+        )
 
     # ==============================
     # Date Picker helpers
@@ -1616,10 +2911,7 @@ class Tab2Entry:
         self.entry_renrakusho.insert(0, display_path)
 
         # Enable/disable open button based on path validity
-        if is_valid_path(display_path):
-            self.btn_open_file.config(state="normal")
-        else:
-            self.btn_open_file.config(state="disabled")
+        self.check_renrakusho(display_path)
 
         self.entry_furyo_no.delete(0, tk.END)
         self.entry_furyo_no.insert(0, vals[11] if len(vals) > 11 else "")
@@ -1628,55 +2920,149 @@ class Tab2Entry:
         # CRUD ops on Excel
         # ==============================
 
+    def form_values(self):
+        """Raw cell values of the form, in sheet column order (累計 left empty)"""
+        # Get path from entry (display format with ¥) and convert to real path
+        display_path = self.entry_renrakusho.get().strip()
+        actual_path = to_real_path(display_path) if display_path else ""
+        return [
+            self.entry_hassei_month.get().strip(),
+            None,
+            self.entry_no.get().strip(),
+            self.entry_date.get().strip(),
+            self.cbo_koumoku.get() or "",
+            self.entry_jishou.get() or "",
+            self.cbo_ichiji.get() or "",
+            self.cbo_niji.get() or "",
+            self.entry_hinban.get() or "",
+            self.cbo_supplier.get() or "",
+            actual_path,
+            self.entry_furyo_no.get() or "",
+        ]
+
     def add_row(self):
         if not self.excel_path or not self.selected_sheet:
             messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_excel_first"])
             return
 
         try:
-            from openpyxl.styles import Font
+            values = self.form_values()
+            if self.ledger_db is not None:
+                self.ledger_db.add(values)
+                self.show_added_row(values)
+                messagebox.showinfo(JP_LABELS["success"], JP_LABELS["added_ok"])
+                return
+
+            if self.use_journal():
+                row = self.data_start_row + len(self.all_data)
+                self.record_change({"op": "add", "row": row, "values": values})
+                self.show_added_row(values)
+                messagebox.showinfo(JP_LABELS["success"], JP_LABELS["added_ok"])
+                return
 
-            wb = load_workbook(self.excel_path)
-            ws = wb[self.selected_sheet]
+            self.save_pending()
+            if self.append_row_fast(values):
+                messagebox.showinfo(JP_LABELS["success"], JP_LABELS["added_ok"])
+                return
 
-            # Get path from entry (display format with ¥) and convert to real path
-            display_path = self.entry_renrakusho.get().strip()
-            actual_path = to_real_path(display_path) if display_path else ""
+            def edit(ws, _):
+                # Find next empty row
+                next_row = ws.max_row + 1
+                write_row_values(ws, next_row, values)
 
-            # Find next empty row
-            next_row = ws.max_row + 1
+                # Only the new row needs a number
+                self.reindex_excel(ws, from_row=next_row, last_changed=next_row)
+                return next_row
 
-            ws.cell(row=next_row, column=1).value = (
-                self.entry_hassei_month.get().strip()
-            )
-            ws.cell(row=next_row, column=3).value = self.entry_no.get().strip()
-            ws.cell(row=next_row, column=4).value = self.entry_date.get().strip()
-            ws.cell(row=next_row, column=5).value = self.cbo_koumoku.get() or ""
-            ws.cell(row=next_row, column=6).value = self.entry_jishou.get() or ""
-            ws.cell(row=next_row, column=7).value = self.cbo_ichiji.get() or ""
-            ws.cell(row=next_row, column=8).value = self.cbo_niji.get() or ""
-            ws.cell(row=next_row, column=9).value = self.entry_hinban.get() or ""
-            ws.cell(row=next_row, column=10).value = self.cbo_supplier.get() or ""
-
-            # Save path as hyperlink in column 11
-            path_cell = ws.cell(row=next_row, column=11)
-            path_cell.value = actual_path
-            if actual_path:  # Only create hyperlink if path exists
-                path_cell.hyperlink = actual_path
-                path_cell.font = Font(color="0000FF", underline="single")
-
-            ws.cell(row=next_row, column=12).value = self.entry_furyo_no.get() or ""
-
-            # reindex all
-            self.reindex_excel(ws)
-            wb.save(self.excel_path)
-            self.load_excel_to_tree()
+            patch, next_row = self.locked_save(edit)
+            if patch and next_row == self.data_start_row + len(self.all_data):
+                self.show_added_row(values)
+            else:
+                self.load_excel_to_tree()
             messagebox.showinfo(JP_LABELS["success"], JP_LABELS["added_ok"])
 
         except Exception as e:
             messagebox.showerror(
-                JP_LABELS["error"], f"{JP_LABELS['error_adding_row']} {str(e)}"
+                JP_LABELS["error"], f"{JP_LABELS['error_add_row']} {str(e)}"
+            )
+
+    def append_row_fast(self, values):
+        """Append a new row without loading or reindexing the whole workbook.
+        累計/№ continue from the numbering state of the loaded data, only the
+        new row is written to the file and the preview gets the row appended
+        in memory. Returns False when the full path has to be used instead
+        (load still running, file changed since it was read, unusual layout).
+        The ledger lock is held from the check to the end of the write."""
+        if self._loader is not None or self.numbering is None or not self.data_start_row:
+            return False
+
+        numbering = dict(self.numbering)
+        numbers = advance_numbering(numbering, values)
+        values = list(values)
+        values[1], values[2] = numbers if numbers else (None, None)
+
+        row_number = self.data_start_row + len(self.all_data)
+        lock = LedgerLock(self.excel_path)
+        try:
+            lock.acquire()
+        except LockTimeout as e:
+            raise LockTimeout(JP_LABELS["ledger_locked"].format(holder=e)) from None
+        try:
+            if not self.can_patch_preview():
+                return False  # Saved by someone else; reload and reindex everything
+            try:
+                append_sheet_row(
+                    self.excel_path, self.selected_sheet, row_number, values, hyperlink_col=10
+                )
+            except XlsxPatchError:
+                return False
+
+            index = self.numbering_index
+            if (
+                index is not None
+                and index.stat == self.loaded_stat
+                and index.start_row + len(index) == row_number
+            ):
+                index.append(numbering)
+            else:
+                index = None
+            self.mark_loaded()
+        finally:
+            lock.release()
+        if index is not None:
+            index.stat = self.loaded_stat
+        lock_stats.record_save()
+        self.update_lock_label()
+        self.show_added_row(values)
+        return True
+
+    def show_added_row(self, values):
+        """Append a new row to the preview (no reload). 累計/№ are numbered from
+        the state of the loaded data when it is known."""
+        values = list(values)
+        if self.numbering is not None:
+            numbers = advance_numbering(self.numbering, values)
+            values[1], values[2] = numbers if numbers else (None, None)
+            self.all_data.append(self.display_row(values))
+        else:
+            values[1] = values[2] = None
+            self.all_data.append(self.display_row(values))
+            last = len(self.all_data) - 1
+            self.renumber_preview(last, last_changed=last)
+        self.tree.clear_selection()
+        self.lbl_ruikei.config(text=str(len(self.all_data)))
+        self.selected_row = None
+        self.update_button_states()
+
+    def display_row(self, values):
+        """Display strings for raw cell values, as a reload would show them"""
+        width = max(len(self.tree.columns), len(values))
+        return [
+            self.format_cell_value(
+                values[i] if i < len(values) and values[i] != "" else None, i
             )
+            for i in range(width)
+        ]
 
     def update_row(self):
         if not self.excel_path or not self.selected_sheet or not self.selected_row:
@@ -1684,39 +3070,39 @@ class Tab2Entry:
             return
 
         try:
-            from openpyxl.styles import Font
-
-            wb = load_workbook(self.excel_path)
-            ws = wb[self.selected_sheet]
+            values = self.form_values()
             row = self.selected_row
+            if self.ledger_db is not None:
+                index = row - self.data_start_row
+                changed = self.ledger_db.update(index, values)
+                self.all_data.set_row(index, self.display_row(values))
+                self.show_renumbered(changed)
+                self.numbering = self.ledger_db.end_state()
+                self.tree.clear_selection()
+                self.selected_row = None
+                self.update_button_states()
+                messagebox.showinfo(JP_LABELS["success"], JP_LABELS["updated_ok"])
+                return
 
-            # Get path from entry (display format with ¥) and convert to real path
-            display_path = self.entry_renrakusho.get().strip()
-            actual_path = to_real_path(display_path) if display_path else ""
-
-            ws.cell(row=row, column=1).value = self.entry_hassei_month.get().strip()
-            ws.cell(row=row, column=3).value = self.entry_no.get().strip()
-            ws.cell(row=row, column=4).value = self.entry_date.get().strip()
-            ws.cell(row=row, column=5).value = self.cbo_koumoku.get() or ""
-            ws.cell(row=row, column=6).value = self.entry_jishou.get() or ""
-            ws.cell(row=row, column=7).value = self.cbo_ichiji.get() or ""
-            ws.cell(row=row, column=8).value = self.cbo_niji.get() or ""
-            ws.cell(row=row, column=9).value = self.entry_hinban.get() or ""
-            ws.cell(row=row, column=10).value = self.cbo_supplier.get() or ""
-
-            # Save path as hyperlink in column 11
-            path_cell = ws.cell(row=row, column=11)
-            path_cell.value = actual_path
-            if actual_path:  # Only create hyperlink if path exists
-                path_cell.hyperlink = actual_path
-                path_cell.font = Font(color="0000FF", underline="single")
-
-            ws.cell(row=row, column=12).value = self.entry_furyo_no.get() or ""
-
-            # reindex all
-            self.reindex_excel(ws)
-            wb.save(self.excel_path)
-            self.load_excel_to_tree()
+            if self.use_journal():
+                base = [self.all_data[row - self.data_start_row]]
+                self.record_change({"op": "update", "row": row, "values": values, "base": base})
+                self.show_updated_row(row - self.data_start_row, values)
+                messagebox.showinfo(JP_LABELS["success"], JP_LABELS["updated_ok"])
+                return
+
+            self.save_pending()
+
+            def edit(ws, rows):
+                write_row_values(ws, rows[0], values)
+                # Renumber from the edited row down (stops once numbers are unchanged)
+                self.reindex_excel(ws, from_row=rows[0], last_changed=rows[0])
+
+            patch, _ = self.locked_save(edit, [row])
+            if patch:
+                self.show_updated_row(row - self.data_start_row, values)
+            else:
+                self.load_excel_to_tree()
             messagebox.showinfo(JP_LABELS["success"], JP_LABELS["updated_ok"])
 
         except Exception as e:
@@ -1724,6 +3110,103 @@ class Tab2Entry:
                 JP_LABELS["error"], f"{JP_LABELS['error_select_row']} {str(e)}"
             )
 
+    def show_updated_row(self, index, values):
+        """Put an updated row into the preview and renumber the rows below it"""
+        values = list(values)
+        values[1] = values[2] = None
+        self.all_data.set_row(index, self.display_row(values))
+        self.renumber_preview(index, last_changed=index)
+        self.tree.clear_selection()
+        self.selected_row = None
+        self.update_button_states()
+
+    def batch_edit(self):
+        """Set the same fields on every selected row"""
+        if not self.excel_path or not self.selected_sheet:
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_excel_first"])
+            return
+        indices = sorted(self.tree.selection())
+        if not indices:
+            messagebox.showwarning(JP_LABELS["warning"], JP_LABELS["pick_row_first"])
+            return
+        choices = {
+            4: list(self.cbo_koumoku.cget("values")),
+            6: list(self.cbo_ichiji.cget("values")),
+            7: list(self.cbo_niji.cget("values")),
+            9: list(self.cbo_supplier.cget("values")),
+        }
+        BatchEditDialog(
+            self.root,
+            lambda cells: self.apply_batch_edit(indices, cells),
+            len(indices),
+            choices,
+        )
+
+    def apply_batch_edit(self, indices, cells):
+        """Write `cells` ({column index: value}) to the rows at `indices` with one
+        save and at most one renumbering pass, then patch the preview rows in
+        place instead of reloading the sheet"""
+        rows = [self.data_start_row + index for index in indices]
+        renumber = changes_numbering(cells)
+        try:
+            if self.ledger_db is not None:
+                changed = self.ledger_db.update_many(indices, cells)
+                self.show_edited_cells(indices, cells)
+                self.show_renumbered(changed)
+                self.numbering = self.ledger_db.end_state()
+            elif self.use_journal():
+                self.record_change(
+                    {
+                        "op": "edit",
+                        "rows": rows,
+                        "cells": sorted(cells.items()),
+                        "renumber": renumber,
+                        "base": [self.all_data[index] for index in indices],
+                    }
+                )
+                self.show_edited_cells(indices, cells)
+                if renumber:
+                    self.renumber_preview(indices[0], last_changed=indices[-1])
+            else:
+                self.save_pending()
+
+                def edit(ws, rows):
+                    for row in rows:
+                        write_cell_values(ws, row, cells)
+                    if renumber:
+                        self.reindex_excel(ws, from_row=min(rows), last_changed=max(rows))
+
+                patch, _ = self.locked_save(edit, rows)
+                if patch:
+                    self.show_edited_cells(indices, cells)
+                    if renumber:
+                        self.renumber_preview(indices[0], last_changed=indices[-1])
+                else:
+                    self.load_excel_to_tree()
+        except Exception as e:
+            messagebox.showerror(
+                JP_LABELS["error"], f"{JP_LABELS['error_update_row']} {str(e)}"
+            )
+            return
+
+        self.tree.clear_selection()
+        self.clear_form()
+        messagebox.showinfo(
+            JP_LABELS["success"], JP_LABELS["batch_updated_ok"].format(count=len(indices))
+        )
+
+    def show_edited_cells(self, indices, cells):
+        """Put batch-edited values into the preview rows"""
+        width = len(self.tree.columns)
+        for index in indices:
+            row = self.all_data[index]
+            row += [""] * (width - len(row))
+            for col, value in cells.items():
+                if col < len(row):
+                    row[col] = self.format_cell_value(value, col)
+            self.all_data.set_row(index, row)
+        self.tree.refresh()
+
     def on_key_delete(self, event):
         """Handle Delete key press for multiple selection delete"""
         if self.is_filter_mode:
@@ -1750,30 +3233,49 @@ class Tab2Entry:
             return
 
         try:
-            wb = load_workbook(self.excel_path)
-            ws = wb[self.selected_sheet]
-
             # Convert selected items to Excel row indices and sort in descending order
             # (to avoid index shifting when deleting)
             base = self.data_start_row if self.data_start_row else 2
             excel_rows = []
 
-            for item_id in selected_items:
-                row_index = self.tree.index(item_id) + base
+            for index in selected_items:
+                row_index = index + base
                 excel_rows.append(row_index)
 
             # Sort in descending order to delete from bottom to top
             excel_rows.sort(reverse=True)
 
-            # Delete rows
-            for row in excel_rows:
-                ws.delete_rows(row, 1)
+            if self.ledger_db is not None:
+                self.delete_ledger_rows(selected_items)
+                messagebox.showinfo(JP_LABELS["deleted"], f"{len(excel_rows)} 件のデータを削除しました。")
+                return
+
+            if self.use_journal():
+                shown = [self.all_data[row - base] for row in excel_rows]
+                self.record_change({"op": "delete", "rows": excel_rows, "base": shown})
+                self.all_data.delete_rows(selected_items)
+                self.show_deleted_rows(min(selected_items))
+                messagebox.showinfo(JP_LABELS["deleted"], f"{len(excel_rows)} 件のデータを削除しました。")
+                return
+
+            self.save_pending()
 
-            # Reindex all remaining rows
-            self.reindex_excel(ws)
-            wb.save(self.excel_path)
-            self.load_excel_to_tree()
-            self.clear_form()
+            def edit(ws, rows):
+                # Delete all rows in one pass (keeps the column 11 hyperlinks in place)
+                first_row = delete_sheet_rows(ws, rows)
+
+                # Reindex the rows below the first deleted one
+                if first_row is not None:
+                    self.reindex_excel(ws, from_row=first_row)
+
+            # Rows already deleted by someone else are skipped
+            patch, _ = self.locked_save(edit, excel_rows, missing_ok=True)
+            if patch:
+                self.all_data.delete_rows(selected_items)
+                self.show_deleted_rows(min(selected_items))
+            else:
+                self.load_excel_to_tree()
+                self.clear_form()
             messagebox.showinfo(JP_LABELS["deleted"], f"{len(excel_rows)} 件のデータを削除しました。")
 
         except Exception as e:
@@ -1790,13 +3292,35 @@ class Tab2Entry:
             return
 
         try:
-            wb = load_workbook(self.excel_path)
-            ws = wb[self.selected_sheet]
-            ws.delete_rows(self.selected_row, 1)
-            self.reindex_excel(ws)
-            wb.save(self.excel_path)
-            self.load_excel_to_tree()
-            self.clear_form()
+            if self.ledger_db is not None:
+                self.delete_ledger_rows([self.selected_row - self.data_start_row])
+                messagebox.showinfo(JP_LABELS["deleted"], JP_LABELS["deleted_ok"])
+                return
+
+            index = self.selected_row - self.data_start_row
+            if self.use_journal():
+                self.record_change(
+                    {"op": "delete", "rows": [self.selected_row], "base": [self.all_data[index]]}
+                )
+                self.all_data.delete_rows([index])
+                self.show_deleted_rows(index)
+                messagebox.showinfo(JP_LABELS["deleted"], JP_LABELS["deleted_ok"])
+                return
+
+            self.save_pending()
+
+            def edit(ws, rows):
+                first_row = delete_sheet_rows(ws, rows)
+                if first_row is not None:
+                    self.reindex_excel(ws, from_row=first_row)
+
+            patch, _ = self.locked_save(edit, [self.selected_row], missing_ok=True)
+            if patch:
+                self.all_data.delete_rows([index])
+                self.show_deleted_rows(index)
+            else:
+                self.load_excel_to_tree()
+                self.clear_form()
             messagebox.showinfo(JP_LABELS["deleted"], JP_LABELS["deleted_ok"])
 
         except Exception as e:
@@ -1804,96 +3328,180 @@ class Tab2Entry:
                 JP_LABELS["error"], f"{JP_LABELS['error_delete_row']} {str(e)}"
             )
 
-    def reindex_excel(self, ws):
+    def delete_ledger_rows(self, indices):
+        """Delete rows of a ledger database; the rows below are renumbered in
+        the database and patched in the preview"""
+        changed = self.ledger_db.delete(indices)
+        self.all_data.delete_rows(indices)
+        self.show_renumbered(changed)
+        self.show_deleted_rows()
+        self.numbering = self.ledger_db.end_state()
+
+    def show_deleted_rows(self, first=None):
+        """Preview after rows were removed from all_data in memory; the rows
+        from `first` (the first deleted position) down are renumbered"""
+        if first is not None:
+            self.renumber_preview(first)
+        self.tree.clear_selection()
+        self.tree.refresh()
+        self.clear_form()
+        self.lbl_ruikei.config(text=str(len(self.all_data)))
+
+    # ==============================
+    # Preview patching (instead of reloading after a change)
+    # ==============================
+    def can_patch_preview(self):
+        """True when the preview shows the file as it is on disk, so a change
+        saved now can be patched into it. Otherwise someone else saved the
+        file since it was read (or it is still loading) and it is reloaded."""
+        return (
+            self._loader is None
+            and self.loaded_stat is not None
+            and self.shows_file(file_stat(self.excel_path))
+        )
+
+    def shows_file(self, stat, fingerprint=None):
+        """Was all_data read from the file with this stat? The fingerprint
+        (read when not given) catches saves within the mtime resolution."""
+        if stat != self.loaded_stat:
+            return False
+        if self.loaded_fingerprint is None:
+            return True
+        if fingerprint is None:
+            fingerprint = workbook_fingerprint(self.excel_path)
+        return fingerprint == self.loaded_fingerprint
+
+    def mark_loaded(self, stat=None, fingerprint=None):
+        """The preview shows the file as saved now (by this app)"""
+        self.loaded_stat = stat or file_stat(self.excel_path)
+        self.loaded_fingerprint = fingerprint or workbook_fingerprint(self.excel_path)
+
+    def locked_save(self, edit, rows=(), missing_ok=False):
+        """Load the workbook, run edit(ws, rows) and save it, holding the
+        ledger lock only for this window. `rows` are the sheet rows the change
+        was made on in the preview: when someone else saved the file since it
+        was read, they are found again by the data shown in them (rebased).
+        A row that was changed or deleted meanwhile raises RebaseConflict
+        (after reloading the preview), unless `missing_ok` (deletes) lets it
+        be skipped. Returns (patch, edit's result); patch is True when the
+        preview showed the file as it was, so the change can be patched in
+        instead of reloading."""
+        from openpyxl import load_workbook
+
+        expected = [(row, self.all_data[row - self.data_start_row]) for row in rows]
+        try:
+            with LedgerLock(self.excel_path):
+                patch = self.can_patch_preview()
+                if not patch:
+                    self.numbering_index = None  # Renumber with a full pass
+                wb = load_workbook(self.excel_path)
+                ws = wb[self.selected_sheet]
+                if not patch:
+                    rows = rebase_rows(ws, self.data_start_row, expected, missing_ok)
+                result = edit(ws, list(rows))
+                self.save_workbook(wb)
+                if patch:
+                    self.mark_loaded()
+        except LockTimeout as e:
+            raise LockTimeout(JP_LABELS["ledger_locked"].format(holder=e)) from None
+        except RebaseConflict:
+            lock_stats.record_save(conflict=True, rejected=True)
+            self.update_lock_label()
+            self.load_excel_to_tree()
+            raise RebaseConflict(JP_LABELS["row_conflict"]) from None
+        lock_stats.record_save(conflict=not patch)
+        self.update_lock_label()
+        return patch, result
+
+    def update_lock_label(self):
+        stats = lock_stats.snapshot()
+        if not stats["saves"]:
+            return
+        self.lbl_lock_stats.config(
+            text=JP_LABELS["lock_stats"].format(
+                saves=stats["saves"],
+                wait_avg=stats["wait_avg"] * 1000,
+                wait_max=stats["wait_max"] * 1000,
+                conflicts=stats["conflicts"],
+                rate=stats["conflict_rate"],
+            )
+        )
+
+    def preview_state_before(self, position):
+        """Numbering state after the preview rows above `position`, taken from
+        the 累計/№ they show (like LedgerDB._state_before, without a pass
+        from the top)"""
+        state = new_numbering()
+        found = False
+        for index in range(position - 1, -1, -1):
+            row = self.all_data[index]
+            if not found:
+                total = text_to_int(row[1]) if len(row) > 1 else None
+                if total is None:
+                    continue  # Row without data
+                state["total"] = total
+                state["monthly"] = (text_to_int(row[2]) if len(row) > 2 else None) or 0
+                found = True
+            # A row without 発生月 keeps the month of the rows above it
+            month = month_key(row[0]) if row else None
+            if month is not None:
+                state["month"] = month
+                break
+        return state
+
+    def renumber_preview(self, from_position, last_changed=None):
+        """Show the 累計/№ reindex_excel gives the rows from `from_position`
+        down, like renumber_sheet does in the file: with `last_changed` the
+        pass stops below that row at the first data row whose numbers and
+        month are unchanged. Until the shown numbers are known to be in
+        sequence, every row is renumbered once."""
+        if not self.preview_numbered:
+            from_position, last_changed = 0, None
+        rows = self.all_data
+        state = self.preview_state_before(from_position)
+        for position in range(from_position, len(rows)):
+            row = rows[position]
+            numbers = advance_numbering(state, row)
+            shown = ["", ""]
+            if numbers:
+                shown = [self.format_cell_value(numbers[0], 1), self.format_cell_value(numbers[1], 2)]
+            row += [""] * (3 - len(row))
+            if row[1:3] != shown:
+                row[1:3] = shown
+                rows.set_row(position, row)
+            elif (
+                last_changed is not None
+                and position > last_changed
+                and numbers
+                and month_key(row[0]) is not None
+            ):
+                break  # Rows below keep their numbers
+        else:
+            self.numbering = state
+        if self.numbering is None:
+            self.numbering = self.preview_state_before(len(rows))
+        self.preview_numbered = True
+        self.tree.refresh()
+
+    def reindex_excel(self, ws, from_row=None, last_changed=None):
         """Set ulang 累計 (col 2) dan № (col 3)
         - 累計: berurutan berdasarkan total semua data seperti sebelumnya
         - №: reset ke 1 setiap bulan
         Hanya menghitung baris yang benar-benar berisi data untuk menghindari bug
-        dengan tabel kosong yang terhitung"""
-        total_count = 0  # Counter untuk 累計 (total semua data)
-        monthly_count = 0  # Counter untuk № per bulan
-        current_month = None  # Track current month for № numbering
-
-        for row in ws.iter_rows(min_row=self.data_start_row, values_only=False):
-            # Cek apakah baris ini berisi data
-            has_data = False
-
-            # Cek beberapa kolom kunci untuk menentukan apakah baris ini berisi data
-            # Kolom yang dicek: 発生月 (1), № (3), 発生日 (4), 項目 (5)
-            key_columns = [0, 2, 3, 4]  # Index kolom (0-based)
-
-            for col_idx in key_columns:
-                if col_idx < len(row):
-                    cell_value = row[col_idx].value
-                    if cell_value is not None and str(cell_value).strip() != "":
-                        has_data = True
-                        break
-
-            # Jika baris berisi data, update 累計 dan №
-            if has_data:
-                # Get month from 発生月 column (column 1, index 0)
-                month_value = None
-                if len(row) > 0 and row[0].value:
-                    month_value = row[0].value
-
-                    # Handle different date formats
-                    if isinstance(month_value, (int, float)):
-                        # Excel serial date
-                        try:
-                            if 1 <= month_value <= 73050:
-                                if month_value > 59:
-                                    excel_date = datetime.datetime(1899, 12, 30) + datetime.timedelta(days=month_value)
-                                else:
-                                    excel_date = datetime.datetime(1899, 12, 31) + datetime.timedelta(days=month_value-1)
-                                month_value = excel_date.month
-                            else:
-                                month_value = None
-                        except (ValueError, TypeError, OverflowError):
-                            month_value = None
-                    elif isinstance(month_value, str):
-                        # Try to extract month from string date
-                        try:
-                            # Handle YYYY-MM-DD format
-                            if '-' in month_value:
-                                parts = month_value.split('-')
-                                if len(parts) >= 2:
-                                    month_value = int(parts[1])
-                            # Handle other formats
-                            else:
-                                # Try to parse as date
-                                for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y"]:
-                                    try:
-                                        parsed_date = datetime.datetime.strptime(month_value.strip(), fmt)
-                                        month_value = parsed_date.month
-                                        break
-                                    except ValueError:
-                                        continue
-                        except (ValueError, TypeError):
-                            month_value = None
-                    elif isinstance(month_value, datetime.datetime):
-                        month_value = month_value.month
-                    elif isinstance(month_value, datetime.date):
-                        month_value = month_value.month
-
-                # Check if month changed, reset monthly counter if needed
-                if month_value is not None and month_value != current_month:
-                    current_month = month_value
-                    monthly_count = 0  # Reset counter for new month
-
-                # Increment counters
-                total_count += 1  # Always increment for total
-                monthly_count += 1  # Increment for monthly
-
-                # Update 累計 with total count
-                if len(row) > 1:  # 累計 (B column, index 1)
-                    row[1].value = total_count
-
-                # Update № with monthly count
-                if len(row) > 2:  # № (C column, index 2)
-                    row[2].value = monthly_count
-            else:
-                # Jika baris kosong, kosongkan juga 累計 dan №
-                if len(row) > 1:
-                    row[1].value = None
-                if len(row) > 2:
-                    row[2].value = None
+        dengan tabel kosong yang terhitung.
+        Dengan `from_row` hanya baris mulai dari baris itu yang dihitung ulang,
+        memakai state per baris dari numbering_index (lihat renumber_sheet)."""
+        index = self.numbering_index
+        if index is None or index.sheet != self.selected_sheet:
+            index = None
+        elif not index.matches(self.excel_path):
+            from_row = None  # File changed since it was read: full pass
+        renumber_sheet(ws, self.data_start_row, index, from_row, last_changed)
+
+    def save_workbook(self, wb):
+        """Save the workbook and keep numbering_index in step with the file"""
+        wb.save(self.excel_path)
+        index = self.numbering_index
+        # stat is None when reindex_excel just brought the index up to date
+        if index is not None and index.stat is None and index.path == os.path.abspath(self.excel_path):
+            index.mark_saved(self.excel_path)
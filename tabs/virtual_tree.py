@@ -0,0 +1,231 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+# Virtual event generated when the user changes the selection
+ROW_SELECT_EVENT = "<<RowSelect>>"
+
+
+# ==============================
+# Virtual scrolling Treeview
+# ==============================
+class VirtualTreeview:
+    """Treeview that only creates items for the rows currently on screen.
+
+    Rows live in a plain Python list (`set_rows`); the widget keeps the
+    selection as row indices into that list, so scrolling and selecting cost
+    the same for 100 rows or 100k rows. Item ids of the inner Treeview are the
+    row indices as strings."""
+
+    def __init__(self, parent, selectmode="extended"):
+        self.selectmode = selectmode
+        self.rows = []
+        self.columns = []
+        self.offset = 0  # Index of the first visible row
+        self.visible = 20  # Number of rows that fit in the widget
+        self.selected = set()  # Selected row indices
+        self.anchor = None  # Start row of shift-selection
+        self.cursor = None  # Row with keyboard focus
+        self.measured = False  # Row height measured from a real item yet?
+
+        self.tree = ttk.Treeview(parent, show="headings", selectmode="none")
+        self.vsb = ttk.Scrollbar(parent, orient="vertical", command=self.on_scrollbar)
+        self.hsb = ttk.Scrollbar(parent, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.hsb.grid(row=1, column=0, sticky="ew")
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Button-1>", lambda e: self.on_click(e, "set"))
+        self.tree.bind("<Shift-Button-1>", lambda e: self.on_click(e, "range"))
+        self.tree.bind("<Control-Button-1>", lambda e: self.on_click(e, "toggle"))
+        if self.tree.tk.call("tk", "windowingsystem") == "aqua":
+            self.tree.bind("<Command-Button-1>", lambda e: self.on_click(e, "toggle"))
+        self.tree.bind("<Up>", lambda e: self.move_cursor(-1, e))
+        self.tree.bind("<Down>", lambda e: self.move_cursor(1, e))
+        self.tree.bind("<Prior>", lambda e: self.move_cursor(-self.visible, e))
+        self.tree.bind("<Next>", lambda e: self.move_cursor(self.visible, e))
+        self.tree.bind("<Home>", lambda e: self.move_cursor(-len(self.rows), e))
+        self.tree.bind("<End>", lambda e: self.move_cursor(len(self.rows), e))
+        self.tree.bind("<Shift-Up>", lambda e: self.move_cursor(-1, e, extend=True))
+        self.tree.bind("<Shift-Down>", lambda e: self.move_cursor(1, e, extend=True))
+
+    def bind(self, sequence, func):
+        """Bind an event handler on the inner Treeview (keys, ROW_SELECT_EVENT)"""
+        return self.tree.bind(sequence, func, add="+")
+
+    # ------------------------------
+    # Data
+    # ------------------------------
+    def set_columns(self, headers, widths):
+        self.columns = list(headers)
+        self.tree["columns"] = self.columns
+        self.set_column_widths(headers, widths)
+
+    def set_column_widths(self, headers, widths):
+        for h, width in zip(headers, widths):
+            self.tree.heading(h, text=h)
+            self.tree.column(h, width=width, anchor="w", stretch=False)
+
+    def set_rows(self, rows):
+        """Show a new dataset (the list is kept by reference, not copied)"""
+        self.rows = rows
+        self.offset = 0
+        self.selected = set()
+        self.anchor = self.cursor = None
+        self.render()
+
+    def refresh(self):
+        """Redraw after rows were appended to or changed in the dataset"""
+        self.selected = {i for i in self.selected if i < len(self.rows)}
+        self.render()
+
+    def row_values(self, index):
+        return self.rows[index]
+
+    # ------------------------------
+    # Selection
+    # ------------------------------
+    def selection(self):
+        """Selected row indices in dataset order"""
+        return sorted(self.selected)
+
+    def selection_set(self, indices):
+        self.selected = {i for i in indices if 0 <= i < len(self.rows)}
+        self.anchor = self.cursor = min(self.selected) if self.selected else None
+        self.render()
+
+    def clear_selection(self):
+        self.selected = set()
+        self.anchor = self.cursor = None
+        self.render()
+
+    def see(self, index):
+        """Scroll so that row `index` is visible"""
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self.render()
+
+    def on_click(self, event, mode):
+        # Let the Treeview handle heading clicks and column resizing
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None
+        item = self.tree.identify_row(event.y)
+        self.tree.focus_set()
+        if not item:
+            return "break"
+        index = int(item)
+
+        if self.selectmode == "browse" or mode == "set" or self.anchor is None:
+            self.selected = {index}
+            self.anchor = index
+        elif mode == "toggle":
+            self.selected ^= {index}
+            self.anchor = index
+        else:  # range
+            lo, hi = sorted((self.anchor, index))
+            self.selected = set(range(lo, hi + 1))
+        self.cursor = index
+
+        self.render()
+        self.tree.event_generate(ROW_SELECT_EVENT)
+        return "break"
+
+    def move_cursor(self, step, event=None, extend=False):
+        if not self.rows:
+            return "break"
+        current = self.cursor if self.cursor is not None else self.offset - step
+        index = max(0, min(len(self.rows) - 1, current + step))
+
+        if extend and self.selectmode != "browse" and self.anchor is not None:
+            lo, hi = sorted((self.anchor, index))
+            self.selected = set(range(lo, hi + 1))
+        else:
+            self.selected = {index}
+            self.anchor = index
+        self.cursor = index
+
+        self.see(index)
+        self.tree.event_generate(ROW_SELECT_EVENT)
+        return "break"
+
+    # ------------------------------
+    # Scrolling
+    # ------------------------------
+    def max_offset(self):
+        return max(0, len(self.rows) - self.visible)
+
+    def scroll(self, rows):
+        self.offset = max(0, min(self.max_offset(), self.offset + rows))
+        self.render()
+        return "break"
+
+    def on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-delta * 3)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = max(
+                0, min(self.max_offset(), int(float(amount) * len(self.rows)))
+            )
+            self.render()
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def on_configure(self, event):
+        visible = self.fit_rows(event.height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = min(self.offset, self.max_offset())
+            self.render()
+
+    def fit_rows(self, height):
+        """Number of rows that fit in `height` pixels below the heading"""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else ""
+        if bbox:
+            heading_height, row_height = bbox[1], bbox[3]
+        else:
+            style = ttk.Style(self.tree)
+            row_height = int(style.lookup("Treeview", "rowheight") or 20)
+            heading_height = row_height + 4
+        return max(1, (height - heading_height) // max(row_height, 1))
+
+    # ------------------------------
+    # Rendering
+    # ------------------------------
+    def render(self):
+        """Materialize only the visible window of rows"""
+        self.offset = max(0, min(self.offset, self.max_offset()))
+        self.tree.delete(*self.tree.get_children())
+
+        end = min(len(self.rows), self.offset + self.visible)
+        for index in range(self.offset, end):
+            self.tree.insert("", tk.END, iid=str(index), values=self.rows[index])
+
+        visible_selected = [str(i) for i in range(self.offset, end) if i in self.selected]
+        self.tree.selection_set(visible_selected)
+
+        # The first estimate of the row height is a guess; measure a real item once
+        if not self.measured and end > self.offset and self.tree.winfo_height() > 1:
+            self.measured = True
+            visible = self.fit_rows(self.tree.winfo_height())
+            if visible != self.visible:
+                self.visible = visible
+                self.render()
+                return
+
+        if self.rows:
+            self.vsb.set(self.offset / len(self.rows), end / len(self.rows))
+        else:
+            self.vsb.set(0, 1)
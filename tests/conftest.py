@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+# Modules of the app are top-level modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_utils import (  # noqa: E402
+    LEDGER_HEADER_ROW,
+    NumberingIndex,
+    format_cell,
+    new_ledger_workbook,
+    renumber_sheet,
+    write_row_values,
+)
+
+DATA_START_ROW = LEDGER_HEADER_ROW + 1
+COLUMNS = 12
+
+
+@pytest.fixture(autouse=True)
+def config_dir(tmp_path, monkeypatch):
+    """History, journals and caches of the tests stay out of the user's config"""
+    directory = tmp_path / "config"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(directory))
+    monkeypatch.setenv("APPDATA", str(directory))
+    return directory
+
+
+def make_ledger(path, rows):
+    """Ledger workbook with `rows` (form values) numbered like a save does"""
+    wb = new_ledger_workbook("2024-01", "test")
+    ws = wb.active
+    for offset, values in enumerate(rows):
+        write_row_values(ws, DATA_START_ROW + offset, values)
+    renumber_sheet(ws, DATA_START_ROW)
+    wb.save(path)
+    return path
+
+
+def numbering_index(path, sheet="Sheet1"):
+    """NumberingIndex of a saved ledger, as parse_sheet builds it on load"""
+    from openpyxl import load_workbook
+
+    ws = load_workbook(path)[sheet]
+    index = NumberingIndex(path, sheet, DATA_START_ROW)
+    renumber_sheet(ws, DATA_START_ROW, index)
+    index.mark_saved(path)
+    return index
+
+
+def sheet_rows(path, sheet="Sheet1"):
+    """Display strings of every data row plus the hyperlink of column 11"""
+    from openpyxl import load_workbook
+
+    ws = load_workbook(path)[sheet]
+    rows = []
+    for row in range(DATA_START_ROW, ws.max_row + 1):
+        shown = [format_cell(ws.cell(row, col + 1).value, col) for col in range(COLUMNS)]
+        link = ws.cell(row, 11).hyperlink
+        rows.append((shown, link.target if link is not None else None))
+    while rows and not any(rows[-1][0]) and rows[-1][1] is None:
+        rows.pop()
+    return rows
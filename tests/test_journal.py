@@ -0,0 +1,230 @@
+import json
+import random
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from conftest import DATA_START_ROW, make_ledger, numbering_index, sheet_rows
+from excel_utils import (
+    delete_sheet_rows,
+    read_custom_properties,
+    renumber_sheet,
+    write_cell_values,
+    write_row_values,
+)
+from journal import APPLIED_PROPERTY, WriteJournal, append_entries, apply_entries
+
+
+def form_values(rng, serial):
+    """Form values of a new row (sheet column order)"""
+    month = rng.choice(["2024-01-05", "2024-02-05", "2024-03-05"])
+    return [
+        month,
+        None,
+        "",
+        rng.choice([month, "2024-04-01"]),
+        rng.choice(["外観不良", "寸法不良"]),
+        "event",
+        "",
+        "",
+        f"H{rng.randint(0, 9)}",
+        rng.choice(["S1", "S2"]),
+        rng.choice(["", "/share/report.pdf"]),
+        f"F{serial}",
+    ]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    rng = random.Random(0)
+    return make_ledger(tmp_path / "ledger.xlsx", [form_values(rng, i) for i in range(6)])
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return tmp_path / "journal"
+
+
+def add_entry(rows, values):
+    return {"op": "add", "sheet": "Sheet1", "start": DATA_START_ROW,
+            "row": DATA_START_ROW + len(rows), "values": values}
+
+
+def update_entry(rows, index, values):
+    return {"op": "update", "sheet": "Sheet1", "start": DATA_START_ROW,
+            "row": DATA_START_ROW + index, "values": values, "base": [rows[index]]}
+
+
+# ==============================
+# Journal file
+# ==============================
+def test_torn_last_line_is_dropped_on_load(ledger, journal_dir):
+    rng = random.Random(1)
+    journal = WriteJournal(ledger, journal_dir)
+    journal.append(add_entry([], form_values(rng, 10)))
+    journal.append(add_entry([None], form_values(rng, 11)))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 3, "op": "add", "sheet": "Sh')  # Crash while writing
+
+    reopened = WriteJournal(ledger, journal_dir)
+    assert [e["seq"] for e in reopened.pending()] == [1, 2]
+    assert reopened.journal_id == journal.journal_id
+    with open(reopened.path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3 and all(json.loads(line) for line in lines)
+    assert reopened.append(add_entry([None, None], form_values(rng, 12))) == 3
+
+
+def test_drop_keeps_journal_id_and_sequence(ledger, journal_dir):
+    rng = random.Random(2)
+    journal = WriteJournal(ledger, journal_dir)
+    journal.append(add_entry([], form_values(rng, 10)))
+    journal.append(add_entry([None], form_values(rng, 11)))
+    journal.drop(2)
+
+    reopened = WriteJournal(ledger, journal_dir)
+    assert reopened.pending() == []
+    assert reopened.journal_id == journal.journal_id
+    assert reopened.append(add_entry([], form_values(rng, 12))) == 3
+    assert WriteJournal.leftovers(str(journal_dir))[0].journal_id == journal.journal_id
+
+
+# ==============================
+# apply_entries
+# ==============================
+def test_replay_after_crash_before_drop_skips_applied_entries(ledger, journal_dir):
+    rng = random.Random(3)
+    shown = [row for row, _ in sheet_rows(ledger)]
+    journal = WriteJournal(ledger, journal_dir)
+    journal.append(add_entry(shown, form_values(rng, 10)))
+    journal.append(update_entry(shown, 2, form_values(rng, 11)))
+    assert apply_entries(ledger, journal.pending(), journal.journal_id) == 2
+    saved = sheet_rows(ledger)
+    # Crash between wb.save and drop: the journal still has both entries
+
+    reopened = WriteJournal(ledger, journal_dir)
+    assert len(reopened) == 2
+    assert apply_entries(ledger, reopened.pending(), reopened.journal_id) == 0
+    assert sheet_rows(ledger) == saved
+
+    reopened.append(add_entry(saved, form_values(rng, 12)))
+    assert apply_entries(ledger, reopened.pending(), reopened.journal_id) == 1
+    assert len(sheet_rows(ledger)) == len(saved) + 1
+    props = read_custom_properties(ledger)
+    assert props[APPLIED_PROPERTY.format(id=journal.journal_id)] == "3"
+
+
+def test_conflicting_base_row_goes_to_conflicts(ledger):
+    rng = random.Random(4)
+    shown = [row for row, _ in sheet_rows(ledger)]
+    update = update_entry(shown, 1, form_values(rng, 10))
+    delete = {"op": "delete", "sheet": "Sheet1", "start": DATA_START_ROW,
+              "rows": [DATA_START_ROW + 3], "base": [shown[3]]}
+
+    # Someone else changes the updated row and deletes the deleted one
+    wb = load_workbook(ledger)
+    ws = wb["Sheet1"]
+    write_cell_values(ws, DATA_START_ROW + 1, {5: "changed elsewhere"})
+    delete_sheet_rows(ws, [DATA_START_ROW + 3])
+    renumber_sheet(ws, DATA_START_ROW)
+    wb.save(ledger)
+    before = sheet_rows(ledger)
+
+    conflicts = []
+    assert apply_entries(ledger, [dict(update, seq=1), dict(delete, seq=2)], "j", None, conflicts) == 1
+    assert conflicts == [dict(update, seq=1)]
+    assert sheet_rows(ledger) == before  # The delete found its row gone
+
+
+def save_change(path, entry):
+    """What saving right after a change does (one load/save per change)"""
+    wb = load_workbook(path)
+    ws = wb[entry["sheet"]]
+    if entry["op"] in ("add", "update"):
+        write_row_values(ws, entry["row"], entry["values"])
+    elif entry["op"] == "delete":
+        delete_sheet_rows(ws, entry["rows"])
+    else:
+        for row in entry["rows"]:
+            write_cell_values(ws, row, dict(entry["cells"]))
+    renumber_sheet(ws, DATA_START_ROW)
+    wb.save(path)
+
+
+def random_entry(rng, shown, serial):
+    kind = rng.choice(["add", "add", "update", "delete", "edit"]) if shown else "add"
+    if kind == "add":
+        return add_entry(shown, form_values(rng, serial))
+    if kind == "update":
+        return update_entry(shown, rng.randrange(len(shown)), form_values(rng, serial))
+    indices = sorted(rng.sample(range(len(shown)), rng.randint(1, min(len(shown), 4))))
+    entry = {"sheet": "Sheet1", "start": DATA_START_ROW,
+             "rows": [DATA_START_ROW + i for i in indices], "base": [shown[i] for i in indices]}
+    if kind == "delete":
+        return dict(entry, op="delete", rows=entry["rows"][::-1], base=entry["base"][::-1])
+    cells = rng.choice([{0: "2024-03-03"}, {9: "S3"}, {4: None}, {10: "/share/other.pdf"}, {10: ""}])
+    return dict(entry, op="edit", cells=sorted(cells.items()), renumber=True)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_batch_matches_saving_after_each_change(tmp_path, seed):
+    rng = random.Random(seed)
+    each = make_ledger(tmp_path / "each.xlsx", [form_values(rng, i) for i in range(rng.randint(0, 12))])
+    batch = tmp_path / "batch.xlsx"
+    shutil.copy(each, batch)
+    index = numbering_index(batch)
+
+    entries = []
+    for seq in range(1, 16):
+        shown = [row for row, _ in sheet_rows(each)]
+        entry = dict(random_entry(rng, shown, 100 + seq), seq=seq)
+        entries.append(entry)
+        save_change(each, entry)
+
+    conflicts = []
+    assert apply_entries(batch, entries, "j", index, conflicts) == len(entries)
+    assert conflicts == []
+    assert sheet_rows(batch) == sheet_rows(each)
+    assert index.matches(batch)
+
+
+# ==============================
+# append_entries (adds only, no load)
+# ==============================
+def test_append_entries_matches_apply_entries(tmp_path, ledger):
+    rng = random.Random(5)
+    shown = [row for row, _ in sheet_rows(ledger)]
+    # A first flush puts the applied property in the file
+    apply_entries(ledger, [dict(update_entry(shown, 0, form_values(rng, 10)), seq=1)], "j")
+    copy = tmp_path / "copy.xlsx"
+    shutil.copy(ledger, copy)
+    index = numbering_index(ledger)
+
+    seq = 1
+    for _ in range(3):
+        shown = [row for row, _ in sheet_rows(copy)]
+        entries = []
+        for _ in range(rng.randint(1, 4)):
+            seq += 1
+            entries.append(dict(add_entry(shown + [None] * len(entries), form_values(rng, seq)), seq=seq))
+        assert append_entries(ledger, entries, "j", index) == len(entries)
+        assert apply_entries(copy, entries, "j") == len(entries)
+        assert sheet_rows(ledger) == sheet_rows(copy)
+        assert read_custom_properties(ledger) == read_custom_properties(copy)
+        assert index.matches(ledger)
+    # Replaying the last batch applies nothing
+    assert append_entries(ledger, entries, "j", index) == 0
+
+
+def test_append_entries_leaves_other_batches_to_apply_entries(ledger):
+    rng = random.Random(6)
+    shown = [row for row, _ in sheet_rows(ledger)]
+    apply_entries(ledger, [dict(update_entry(shown, 0, form_values(rng, 10)), seq=1)], "j")
+    index = numbering_index(ledger)
+    add = dict(add_entry(shown, form_values(rng, 11)), seq=2)
+
+    assert append_entries(ledger, [add, dict(update_entry(shown, 1, form_values(rng, 12)), seq=3)], "j", index) is None
+    assert append_entries(ledger, [add], "other journal", index) is None  # No property yet
+    save_change(ledger, dict(update_entry(shown, 1, form_values(rng, 13))))  # Saved by someone else
+    assert append_entries(ledger, [add], "j", index) is None
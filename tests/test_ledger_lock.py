@@ -0,0 +1,211 @@
+import glob
+import os
+import threading
+import time
+
+import pytest
+
+import ledger_lock
+from conftest import COLUMNS, DATA_START_ROW
+from excel_utils import delete_sheet_rows, format_cell, new_ledger_workbook, write_row_values
+from ledger_lock import (
+    LOCK_STALE_SECONDS,
+    LedgerLock,
+    LockTimeout,
+    RebaseConflict,
+    lock_token,
+    rebase_rows,
+    restore_lock,
+)
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    return str(tmp_path / "ledger.xlsx")
+
+
+def leave_stale_lock(path, token="crashed"):
+    """Lock file of an app that died while saving"""
+    lock = LedgerLock(path).path
+    with open(lock, "w", encoding="utf-8") as f:
+        f.write('{"token": "%s", "user": "someone"}' % token)
+    old = time.time() - LOCK_STALE_SECONDS - 60
+    os.utime(lock, (old, old))
+    return lock
+
+
+# ==============================
+# Lock file
+# ==============================
+def test_stale_lock_is_broken(workbook_path):
+    lock_file = leave_stale_lock(workbook_path)
+    with LedgerLock(workbook_path, timeout=1.0) as lock:
+        assert lock_token(lock_file) == lock.token
+    assert not os.path.exists(lock_file)
+
+
+def test_two_waiters_break_the_same_stale_lock(workbook_path, monkeypatch):
+    """Both waiters see the stale lock; B breaks it between A's age check
+    and A's rename. A's rename fails, and only one of them gets the lock."""
+    lock_file = leave_stale_lock(workbook_path)
+    waiter_a = LedgerLock(workbook_path, timeout=0.2)
+    waiter_b = LedgerLock(workbook_path, timeout=0.2)
+    getmtime = os.path.getmtime
+    broken_by_b = []
+
+    def getmtime_then_b_breaks(path):
+        mtime = getmtime(path)
+        if path == lock_file and not broken_by_b:
+            broken_by_b.append(None)
+            broken_by_b[0] = waiter_b.remove_stale()
+        return mtime
+
+    monkeypatch.setattr(ledger_lock.os.path, "getmtime", getmtime_then_b_breaks)
+    assert waiter_a.remove_stale() is True
+    monkeypatch.undo()
+    assert broken_by_b == [True]
+    assert not os.path.exists(lock_file)
+    assert glob.glob(lock_file + ".*.stale") == []
+
+    waiter_b.acquire()
+    try:
+        with pytest.raises(LockTimeout):
+            waiter_a.acquire()
+    finally:
+        waiter_b.release()
+
+
+def test_fresh_lock_taken_in_between_is_put_back(workbook_path, monkeypatch):
+    """Waiter A sees the stale lock; before A renames it away, waiter B breaks
+    it and takes a fresh lock. A renames B's lock, finds it is not the stale
+    one and puts it back."""
+    lock_file = leave_stale_lock(workbook_path)
+    waiter_a = LedgerLock(workbook_path, timeout=1.0)
+    waiter_b = LedgerLock(workbook_path, timeout=1.0)
+    getmtime = os.path.getmtime
+    interleaved = []
+
+    def getmtime_then_b_wins(path):
+        mtime = getmtime(path)
+        if path == lock_file and not interleaved:
+            interleaved.append(True)
+            waiter_b.acquire()  # Between A's age check and A's rename
+        return mtime
+
+    monkeypatch.setattr(ledger_lock.os.path, "getmtime", getmtime_then_b_wins)
+    try:
+        assert waiter_a.remove_stale() is False
+        assert interleaved
+        assert lock_token(lock_file) == waiter_b.token
+        assert glob.glob(lock_file + ".*.stale") == []
+    finally:
+        monkeypatch.undo()
+        waiter_b.release()
+    assert not os.path.exists(lock_file)
+
+
+def test_restore_lock_keeps_a_newer_lock(tmp_path):
+    broken = str(tmp_path / "ledger.xlsx.lock.1.stale")
+    path = str(tmp_path / "ledger.xlsx.lock")
+    for name, token in ((broken, "old"), (path, "new")):
+        with open(name, "w", encoding="utf-8") as f:
+            f.write('{"token": "%s"}' % token)
+    restore_lock(broken, path)
+    assert lock_token(path) == "new"
+    assert not os.path.exists(broken)
+
+
+def test_waiters_on_a_stale_lock_hold_it_one_at_a_time(workbook_path):
+    leave_stale_lock(workbook_path)
+    holders = []
+    peak = []
+    guard = threading.Lock()
+    start = threading.Barrier(6)
+    errors = []
+
+    def waiter():
+        start.wait()
+        try:
+            for _ in range(5):
+                with LedgerLock(workbook_path, timeout=10.0):
+                    with guard:
+                        holders.append(1)
+                        peak.append(len(holders))
+                    time.sleep(0.005)
+                    with guard:
+                        holders.pop()
+        except Exception as exc:  # Reported below, not lost in the thread
+            errors.append(exc)
+
+    threads = [threading.Thread(target=waiter) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(peak) == 30 and max(peak) == 1
+    assert glob.glob(workbook_path + ".lock*") == []
+
+
+def test_held_lock_is_kept_fresh(workbook_path, monkeypatch):
+    monkeypatch.setattr(ledger_lock, "LOCK_REFRESH_SECONDS", 0.02)
+    with LedgerLock(workbook_path) as lock:
+        old = time.time() - LOCK_STALE_SECONDS - 60
+        os.utime(lock.path, (old, old))
+        time.sleep(0.2)
+        assert time.time() - os.path.getmtime(lock.path) < LOCK_STALE_SECONDS
+        assert LedgerLock(workbook_path).remove_stale() is False
+
+
+# ==============================
+# Rebase
+# ==============================
+def ledger_sheet(rows):
+    ws = new_ledger_workbook("2024-01", "test").active
+    for offset, values in enumerate(rows):
+        write_row_values(ws, DATA_START_ROW + offset, values)
+    return ws
+
+
+def row_values(name, month="2024-01-05"):
+    return [month, None, "", month, "外観不良", name, "", "", "H1", "S1", "", ""]
+
+
+def shown(ws, row):
+    """Display strings of a row, as the preview shows them"""
+    return [format_cell(ws.cell(row, col + 1).value, col) for col in range(COLUMNS)]
+
+
+def test_rebase_finds_rows_after_inserts_above():
+    ws = ledger_sheet([row_values(name) for name in "abcd"])
+    expected = [(row, shown(ws, row)) for row in (DATA_START_ROW + 1, DATA_START_ROW + 3)]
+    ws.insert_rows(DATA_START_ROW, 2)
+    write_row_values(ws, DATA_START_ROW, row_values("x"))
+    write_row_values(ws, DATA_START_ROW + 1, row_values("y"))
+    assert rebase_rows(ws, DATA_START_ROW, expected) == [DATA_START_ROW + 3, DATA_START_ROW + 5]
+
+
+def test_rebase_finds_rows_after_deletes_above():
+    ws = ledger_sheet([row_values(name) for name in "abcde"])
+    expected = [(DATA_START_ROW + 4, shown(ws, DATA_START_ROW + 4))]
+    delete_sheet_rows(ws, [DATA_START_ROW, DATA_START_ROW + 2])
+    assert rebase_rows(ws, DATA_START_ROW, expected) == [DATA_START_ROW + 2]
+
+
+def test_rebase_matches_duplicate_rows_once_each():
+    ws = ledger_sheet([row_values("a"), row_values("dup"), row_values("b"), row_values("dup")])
+    expected = [
+        (DATA_START_ROW + 1, shown(ws, DATA_START_ROW + 1)),
+        (DATA_START_ROW + 3, shown(ws, DATA_START_ROW + 3)),
+    ]
+    delete_sheet_rows(ws, [DATA_START_ROW])
+    assert rebase_rows(ws, DATA_START_ROW, expected) == [DATA_START_ROW, DATA_START_ROW + 2]
+
+
+def test_rebase_of_a_row_deleted_elsewhere():
+    ws = ledger_sheet([row_values(name) for name in "abc"])
+    expected = [(row, shown(ws, row)) for row in (DATA_START_ROW, DATA_START_ROW + 1)]
+    delete_sheet_rows(ws, [DATA_START_ROW + 1])
+    with pytest.raises(RebaseConflict):
+        rebase_rows(ws, DATA_START_ROW, expected)
+    assert rebase_rows(ws, DATA_START_ROW, expected, missing_ok=True) == [DATA_START_ROW]
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from conftest import DATA_START_ROW
+from excel_utils import (
+    NumberingIndex,
+    advance_numbering,
+    delete_sheet_rows,
+    new_ledger_workbook,
+    new_numbering,
+    renumber_sheet,
+    write_row_values,
+)
+
+
+def random_values(rng):
+    """Form values; some rows have no data (no 累計/№) or no 発生月"""
+    if rng.random() < 0.1:
+        return [""] * 12
+    month = rng.choice(["2024-01-05", "2024-02-05", "2024-03-05", ""])
+    koumoku = rng.choice(["外観不良", "寸法不良", ""])
+    return [month, None, "", rng.choice([month, "2024-04-01", ""]), koumoku, "e", "", "", "H", "S", "", ""]
+
+
+def loaded_sheet(rng, rows, wrong_numbers):
+    """Sheet as saved, and its NumberingIndex as parse_sheet builds it"""
+    ws = new_ledger_workbook("2024-01", "test").active
+    for offset in range(rows):
+        write_row_values(ws, DATA_START_ROW + offset, random_values(rng))
+    renumber_sheet(ws, DATA_START_ROW)
+    if wrong_numbers and rows:
+        for _ in range(rng.randint(1, 3)):
+            ws.cell(DATA_START_ROW + rng.randrange(rows), rng.choice([2, 3])).value = rng.randint(1, 99)
+
+    index = NumberingIndex("ledger.xlsx", "Sheet1", DATA_START_ROW)
+    numbering = new_numbering()
+    for values in ws.iter_rows(min_row=DATA_START_ROW, values_only=True):
+        index.check_stored(values, advance_numbering(numbering, values))
+        index.append(numbering)
+    return ws, index
+
+
+def assert_full_pass(ws, index):
+    """Stored numbers and index states equal a renumber from the top"""
+    numbering = new_numbering()
+    for row in range(DATA_START_ROW, ws.max_row + 1):
+        values = [ws.cell(row, col).value for col in range(1, 6)]
+        numbers = advance_numbering(numbering, values) or (None, None)
+        assert (ws.cell(row, 2).value, ws.cell(row, 3).value) == numbers, row
+        assert index.state_after(row) == numbering, row
+    assert len(index) == max(ws.max_row - DATA_START_ROW + 1, 0)
+    assert index.consistent
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_renumber_from_changed_row_matches_full_pass(seed):
+    rng = random.Random(seed)
+    ws, index = loaded_sheet(rng, rng.randint(0, 40), wrong_numbers=seed % 3 == 0)
+    for _ in range(30):
+        data_rows = max(ws.max_row - DATA_START_ROW + 1, 0)
+        kind = rng.choice(["add", "update", "delete"]) if data_rows else "add"
+        if kind == "add":
+            row = DATA_START_ROW + data_rows
+            write_row_values(ws, row, random_values(rng))
+            renumber_sheet(ws, DATA_START_ROW, index, from_row=row, last_changed=row)
+        elif kind == "update":
+            row = DATA_START_ROW + rng.randrange(data_rows)
+            write_row_values(ws, row, random_values(rng))
+            renumber_sheet(ws, DATA_START_ROW, index, from_row=row, last_changed=row)
+        else:
+            rows = [DATA_START_ROW + i for i in rng.sample(range(data_rows), rng.randint(1, min(data_rows, 3)))]
+            first = delete_sheet_rows(ws, rows)
+            renumber_sheet(ws, DATA_START_ROW, index, from_row=first)
+        assert_full_pass(ws, index)
@@ -0,0 +1,152 @@
+import random
+
+import pytest
+
+import tabs.tab2_entry as tab2
+from conftest import make_ledger
+from excel_utils import SheetCache
+
+
+class Widget:
+    """Labels, buttons and root of the tab (no display in the tests)"""
+
+    def config(self, **kwargs):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+    def after(self, ms, func, *args):
+        return 1
+
+    def after_cancel(self, job):
+        pass
+
+
+class Tree:
+    columns = list(range(12))
+
+    def set_rows(self, rows):
+        pass
+
+    def refresh(self):
+        pass
+
+    def clear_selection(self):
+        pass
+
+    def selection(self):
+        return []
+
+
+def random_values(rng):
+    month = rng.choice(["2024-01-05", "2024-01-05", "2024-02-05", "2024-03-05", ""])
+    return [
+        month,
+        None,
+        "",
+        rng.choice([month, "2024-04-01", ""]),
+        rng.choice(["外観不良", "", "寸法不良"]),
+        "e",
+        "",
+        "",
+        f"H{rng.randint(0, 99)}",
+        "S",
+        rng.choice(["", "/share/report.pdf"]),
+        "",
+    ]
+
+
+def entry_tab(path, write_behind):
+    """Tab2Entry without widgets, with the sheet of `path` loaded"""
+    tab = tab2.Tab2Entry.__new__(tab2.Tab2Entry)
+    state = dict(
+        root=Widget(), tree=Tree(), lbl_ruikei=Widget(), lbl_pending=Widget(),
+        lbl_lock_stats=Widget(), btn_add=Widget(), btn_update=Widget(),
+        btn_delete=Widget(), btn_batch_edit=Widget(), excel_path=str(path),
+        selected_sheet="Sheet1", _loader=None, _watch=None, ledger_db=None,
+        journal=None, _flush=None, _flush_job=None, _first_pending=None,
+        flush_error=None, write_behind=write_behind, selected_row=None,
+        numbering=None, numbering_index=None, loaded_stat=None,
+        loaded_fingerprint=None, preview_numbered=False, is_filter_mode=False,
+        sheet_cache=SheetCache(), sidecar_cache=False,
+    )
+    for name, value in state.items():
+        setattr(tab, name, value)
+    tab.show_sheet_names = lambda *args: None
+    tab.setup_tree_columns = lambda *args: None
+    tab.warm_search_index = lambda: None
+    tab.clear_form = lambda: setattr(tab, "selected_row", None)
+    tab.load_excel_to_tree = lambda: pytest.fail("the preview was reloaded")
+    data = tab.parse_sheet(tab.excel_path, "Sheet1")
+    tab.data_start_row = data["data_start_row"]
+    tab.render_sheet_data(data)
+    return tab
+
+
+@pytest.fixture(autouse=True)
+def no_dialogs(monkeypatch):
+    monkeypatch.setattr(tab2.messagebox, "showinfo", lambda *args, **kwargs: None)
+    monkeypatch.setattr(tab2.messagebox, "askyesno", lambda *args, **kwargs: True)
+
+    def showerror(*args, **kwargs):
+        pytest.fail(f"error shown: {args}")
+
+    monkeypatch.setattr(tab2.messagebox, "showerror", showerror)
+
+
+@pytest.fixture
+def appended(monkeypatch):
+    """Flushes saved by append_entries (new rows only, no load)"""
+    calls = []
+
+    def append_entries(*args):
+        applied = original(*args)
+        calls.append(applied)
+        return applied
+
+    original = tab2.append_entries
+    monkeypatch.setattr(tab2, "append_entries", append_entries)
+    return calls
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_patched_preview_matches_saved_file(tmp_path, appended, seed, write_behind):
+    """After every change the preview and its numbering equal a fresh parse
+    of the saved file, without reloading the sheet"""
+    rng = random.Random(seed)
+    path = make_ledger(tmp_path / "ledger.xlsx", [random_values(rng) for _ in range(rng.randint(0, 40))])
+    tab = entry_tab(path, write_behind)
+    for _ in range(25):
+        count = len(tab.all_data)
+        kind = rng.choice(["add", "add", "update", "delete", "multi", "edit"]) if count else "add"
+        if kind == "add":
+            values = random_values(rng)
+            tab.form_values = lambda values=values: list(values)
+            tab.selected_row = None
+            tab.add_row()
+        elif kind == "update":
+            values = random_values(rng)
+            tab.form_values = lambda values=values: list(values)
+            tab.selected_row = tab.data_start_row + rng.randrange(count)
+            tab.update_row()
+        elif kind == "delete":
+            tab.selected_row = tab.data_start_row + rng.randrange(count)
+            tab.delete_row()
+        elif kind == "multi":
+            tab.delete_multiple_rows(rng.sample(range(count), rng.randint(1, min(count, 8))))
+        else:
+            indices = sorted(rng.sample(range(count), rng.randint(1, min(count, 8))))
+            cells = rng.choice([{0: "2024-03-03"}, {9: "W"}, {0: None, 3: None, 4: None}, {4: "外観不良"}])
+            tab.apply_batch_edit(indices, cells)
+        assert tab.flush_pending(wait=True)
+
+        saved = tab.parse_sheet(tab.excel_path, "Sheet1")
+        assert list(saved["rows"]) == list(tab.all_data), kind
+        assert saved["numbering"] == tab.numbering, kind
+    if write_behind:
+        # New rows after the first full save are appended in place
+        assert any(appended)
+    else:
+        assert appended == []